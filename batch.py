@@ -0,0 +1,92 @@
+from datetime import datetime
+from src.config import MAX_CONCURRENT_SESSIONS, JOB_QUEUE_DB
+from src.certificate_registry import get_certificate_registry
+from src.engine import ConcurrentLoginEngine
+from src.job_queue import JobQueue
+from src.logger import setup_logging
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+
+def parse_deadline(value):
+    """Epoch seconds or an ISO 8601 date/time (local time unless it has an offset)"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def add_jobs(queue, args):
+    default_deadline = time.time() + args.deadline_hours * 3600 if args.deadline_hours else None
+    specs = []
+    if args.jobs:
+        # One JSON object per line: {"certificate": ..., "target_url": ..., "deadline": ..., "password_env": ...}
+        with open(args.jobs, 'r', encoding='utf-8') as f:
+            specs.extend(json.loads(line) for line in f if line.strip())
+    if args.certificates:
+        specs.extend({'certificate': path} for path in get_certificate_registry().list_directory(args.certificates))
+    specs.extend({'certificate': path} for path in args.certificate)
+
+    for spec in specs:
+        queue.add(
+            args.batch, spec['certificate'],
+            target_url=spec.get('target_url') or args.target_url,
+            deadline=parse_deadline(spec.get('deadline')) or default_deadline,
+            password_env=spec.get('password_env') or args.password_env,
+        )
+    print(f"✅ Added {len(specs)} job(s) to batch '{args.batch}'")
+
+
+async def run_batch(queue, args):
+    summary = await ConcurrentLoginEngine(max_concurrency=args.workers).run_queue(queue, args.batch)
+    print(json.dumps(summary, indent=2))
+    return 0 if not summary['statuses'].get('pending') else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Queue and run login jobs in batches (resumable)")
+    parser.add_argument('--db', default=JOB_QUEUE_DB, help="SQLite job queue / result store")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="Queue login jobs")
+    add.add_argument('--batch', required=True)
+    add.add_argument('--jobs', help="JSONL file, one job per line")
+    add.add_argument('--certificates', help="Queue every .pfx/.p12 file of this directory")
+    add.add_argument('certificate', nargs='*', help="Certificate files to queue")
+    add.add_argument('--target-url', help="Login URL (default TARGET_URL)")
+    add.add_argument('--deadline-hours', type=float, help="Jobs not started within this many hours expire")
+    add.add_argument('--password-env', help="Environment variable with the certificate password "
+                                            "(default CERTIFICATE_PASSWORD)")
+
+    run = commands.add_parser('run', help="Work through a batch; an interrupted run resumes where it stopped")
+    run.add_argument('--batch', required=True)
+    run.add_argument('--workers', type=int, default=MAX_CONCURRENT_SESSIONS)
+
+    status = commands.add_parser('status', help="Job counts and failure classes of a batch")
+    status.add_argument('--batch', required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+    queue = JobQueue(args.db)
+    try:
+        if args.command == 'add':
+            add_jobs(queue, args)
+            return 0
+        if args.command == 'run':
+            return asyncio.run(run_batch(queue, args))
+        print(json.dumps(queue.summary(args.batch), indent=2))
+        return 0
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
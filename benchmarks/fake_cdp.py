@@ -0,0 +1,101 @@
+"""Fake Bright Data CDP domains (Captcha.*, Browser.addCertificate) for offline runs"""
+import asyncio
+import json
+import random
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Same shape as real hCaptcha tokens as far as the automation checks (prefix, >3000 chars)
+TOKEN_LENGTH = 3200
+
+TOKEN_INJECTION_SCRIPT = """
+    (token => {
+        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        if (textarea) textarea.value = token;
+        return !!textarea;
+    })(%s)
+"""
+
+
+def make_token() -> str:
+    """Token that carries its issue time so the stub server can enforce a validation lag"""
+    prefix = f"P1_{int(time.time() * 1000)}_"
+    return prefix + secrets.token_urlsafe(TOKEN_LENGTH)[:TOKEN_LENGTH - len(prefix)]
+
+
+class FakeCDPSession:
+    """Answers Bright Data's custom CDP methods locally and delegates the rest.
+
+    solve_latency is a (min, max) range in seconds for Captcha.waitForSolve;
+    solve_outcomes maps statuses to weights, e.g. {'solve_finished': 0.9, 'solve_failed': 0.1}.
+    On a finished solve a fresh token is written into the page's textarea, like
+    Bright Data does. delegate is the real page CDP session (None for
+    browserless micro-benchmarks, where only the fake methods are available).
+    """
+    def __init__(self, delegate=None, solve_latency: Tuple[float, float] = (1.0, 3.0),
+                 solve_outcomes: Optional[Dict[str, float]] = None, configure_latency: float = 0.05,
+                 certificate_latency: float = 0.1, certificate_ok: bool = True, seed: Optional[int] = None):
+        self.delegate = delegate
+        self.solve_latency = solve_latency
+        self.solve_outcomes = solve_outcomes or {'solve_finished': 1.0}
+        self.configure_latency = configure_latency
+        self.certificate_latency = certificate_latency
+        self.certificate_ok = certificate_ok
+        self.rng = random.Random(seed)
+        # (method, seconds) for every call answered here
+        self.calls: List[Tuple[str, float]] = []
+
+    async def send(self, method: str, params: Optional[dict] = None):
+        start_time = time.monotonic()
+        try:
+            if method == 'Captcha.waitForSolve':
+                return await self._wait_for_solve(params or {})
+            if method == 'Captcha.configure':
+                await asyncio.sleep(self.configure_latency)
+                return {}
+            if method == 'Browser.addCertificate':
+                await asyncio.sleep(self.certificate_latency)
+                if not self.certificate_ok:
+                    raise Exception("Browser.addCertificate: certificate rejected (fake)")
+                return {}
+            if self.delegate is None:
+                raise Exception(f"{method} is not available without a browser")
+            return await self.delegate.send(method, params or {})
+        finally:
+            if method.startswith(('Captcha.', 'Browser.addCertificate')):
+                self.calls.append((method, time.monotonic() - start_time))
+
+    async def _wait_for_solve(self, params: dict) -> dict:
+        latency = self.rng.uniform(*self.solve_latency)
+        timeout = params.get('detectTimeout', 30000) / 1000
+        if latency > timeout:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError()
+
+        await asyncio.sleep(latency)
+        statuses, weights = zip(*self.solve_outcomes.items())
+        status = self.rng.choices(statuses, weights=weights)[0]
+        if status == 'solve_finished' and self.delegate is not None:
+            await self.delegate.send('Runtime.evaluate', {
+                'expression': TOKEN_INJECTION_SCRIPT % json.dumps(make_token()),
+            })
+        return {'status': status}
+
+    async def detach(self):
+        if self.delegate is not None:
+            await self.delegate.detach()
+
+    def __getattr__(self, name):
+        # on()/remove_listener() etc. go to the real session
+        if self.delegate is None:
+            raise AttributeError(name)
+        return getattr(self.delegate, name)
+
+
+def fake_cdp_session_factory(**options):
+    """cdp_session_factory for BrightDataFullAutomation that wraps the real page session"""
+    async def factory(context, page):
+        return FakeCDPSession(await context.new_cdp_session(page), **options)
+    return factory
@@ -0,0 +1,236 @@
+"""Network-free benchmarks: python -m benchmarks.run_benchmark [solver|e2e] --logins N --concurrency C"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+# Keep benchmark runs away from the real caches, calibration history and metrics
+os.environ.setdefault('SA_DATA_DIR', tempfile.mkdtemp(prefix='sa-bench-'))
+os.environ.setdefault('SESSION_CACHE_ENABLED', '0')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from playwright.async_api import async_playwright  # noqa: E402
+from src.automation import BrightDataFullAutomation  # noqa: E402
+from src.browser_pool import CDPBrowserPool  # noqa: E402
+from src.captcha_solver import BrightDataCaptchaSolver, MockCaptchaSolver, RacingCaptchaSolver  # noqa: E402
+from src.solve_stats import get_solve_stats  # noqa: E402
+from src.metrics import Histogram, PHASES  # noqa: E402
+from src.logger import setup_logging  # noqa: E402
+from benchmarks.fake_cdp import FakeCDPSession, fake_cdp_session_factory  # noqa: E402
+from benchmarks.stub_sso import StubSSOServer  # noqa: E402
+
+
+CERTIFICATE_PASSWORD = 'benchmark'
+
+
+def write_test_certificate(directory: str) -> str:
+    """Self-signed .pfx for the run (random bytes when cryptography is not installed)"""
+    path = os.path.join(directory, 'benchmark.pfx')
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, pkcs12
+        from cryptography.x509.oid import NameOID
+    except ImportError:
+        with open(path, 'wb') as f:
+            f.write(os.urandom(2048))
+        return path
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'SA Benchmark')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=30))
+            .sign(key, hashes.SHA256()))
+    with open(path, 'wb') as f:
+        f.write(pkcs12.serialize_key_and_certificates(
+            b'benchmark', key, cert, None, BestAvailableEncryption(CERTIFICATE_PASSWORD.encode('utf-8'))
+        ))
+    return path
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def summarize(samples) -> dict:
+    histogram = Histogram()
+    for value in samples:
+        histogram.observe(value)
+    return {
+        'n': histogram.count,
+        'mean': round(histogram.sum / histogram.count, 3) if histogram.count else None,
+        'p50': histogram.quantile(0.50),
+        'p95': histogram.quantile(0.95),
+        'p99': histogram.quantile(0.99),
+    }
+
+
+def print_row(label: str, stats: dict):
+    if not stats['n']:
+        return
+    print(f"   {label:<22} n={stats['n']:<4} mean {stats['mean']:7.2f}  "
+          f"p50 {stats['p50']:7.2f}  p95 {stats['p95']:7.2f}  p99 {stats['p99']:7.2f}")
+
+
+async def bench_solver(args) -> dict:
+    """solve_with_retry against the fake Captcha domain only - no browser needed"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    durations, outcomes = [], []
+
+    async def one(index):
+        async with semaphore:
+            session = FakeCDPSession(solve_latency=(args.solve_min, args.solve_max),
+                                     solve_outcomes={'solve_finished': 1 - args.solve_fail_rate,
+                                                     'solve_failed': args.solve_fail_rate},
+                                     seed=args.seed + index)
+            backends = []
+            if args.backend in ('brightdata', 'race'):
+                backends.append(BrightDataCaptchaSolver(session, post_timeout_wait=0))
+            if args.backend in ('mock', 'race'):
+                backends.append(MockCaptchaSolver(latency=args.mock_latency, seed=args.seed + index))
+            solver = backends[0] if len(backends) == 1 else RacingCaptchaSolver(backends)
+            start_time = time.monotonic()
+            outcomes.append(await solver.solve_with_retry(max_retries=2))
+            durations.append(time.monotonic() - start_time)
+
+    start_time = time.monotonic()
+    await asyncio.gather(*[one(i) for i in range(args.logins)])
+    wall = time.monotonic() - start_time
+    return {
+        'suite': 'solver',
+        'backend': args.backend,
+        'solved': sum(1 for ok in outcomes if ok),
+        'total': len(outcomes),
+        'wall_seconds': round(wall, 3),
+        'throughput_per_hour': round(len(outcomes) / wall * 3600, 1) if wall else None,
+        'solve_with_retry': summarize(durations),
+        'solve_stats': get_solve_stats().summary('brightdata'),
+    }
+
+
+async def bench_e2e(args) -> dict:
+    """Full run_with_playwright against the stub SSO through a locally launched Chromium over CDP"""
+    work_dir = os.environ['SA_DATA_DIR']
+    certificate_path = write_test_certificate(work_dir)
+    port = free_port()
+
+    with StubSSOServer(min_token_age=args.min_token_age, reject_rate=args.reject_rate,
+                       page_latency=args.page_latency, seed=args.seed) as server:
+        async with async_playwright() as playwright:
+            chromium = await playwright.chromium.launch(args=[f'--remote-debugging-port={port}'])
+            pool = CDPBrowserPool(playwright, endpoint_url=f'http://127.0.0.1:{port}', size=args.concurrency)
+            semaphore = asyncio.Semaphore(args.concurrency)
+            results = []
+
+            async def one(index):
+                async with semaphore:
+                    automation = BrightDataFullAutomation(
+                        certificate_path=certificate_path,
+                        certificate_password=CERTIFICATE_PASSWORD,
+                        session_id=f'bench-{index + 1}',
+                        interactive=False,
+                        browser_pool=pool,
+                        target_url=server.login_url,
+                        services_url=server.services_url,
+                        cdp_session_factory=fake_cdp_session_factory(
+                            solve_latency=(args.solve_min, args.solve_max),
+                            solve_outcomes={'solve_finished': 1 - args.solve_fail_rate,
+                                            'solve_failed': args.solve_fail_rate},
+                            seed=args.seed + index,
+                        ),
+                    )
+                    results.append(await automation.run_with_playwright(playwright))
+
+            start_time = time.monotonic()
+            try:
+                await pool.warm_up(min(args.logins, args.concurrency))
+                await asyncio.gather(*[one(i) for i in range(args.logins)])
+            finally:
+                await pool.close()
+                await chromium.close()
+            wall = time.monotonic() - start_time
+
+        failures = {}
+        for result in results:
+            if not result.success:
+                failures[result.failure_class] = failures.get(result.failure_class, 0) + 1
+        return {
+            'suite': 'e2e',
+            'succeeded': sum(1 for r in results if r.success),
+            'total': len(results),
+            'failures': failures,
+            'wall_seconds': round(wall, 3),
+            'throughput_per_hour': round(len(results) / wall * 3600, 1) if wall else None,
+            'end_to_end': summarize([r.elapsed for r in results]),
+            'phases': {
+                phase: summarize([r.timings[phase] for r in results if phase in r.timings])
+                for phase in PHASES
+            },
+            'server': dict(server.stats),
+        }
+
+
+def print_report(report: dict):
+    print(f"\n📊 BENCHMARK: {report['suite']}")
+    print(f"   Wall time: {report['wall_seconds']:.1f}s, throughput: {report['throughput_per_hour']} per hour")
+    if report['suite'] == 'solver':
+        print(f"   Solved: {report['solved']}/{report['total']}")
+        print_row('solve_with_retry', report['solve_with_retry'])
+        stats = report['solve_stats']
+        print(f"   Solve history: {stats['samples']} solves, success rate {stats['success_rate']}, "
+              f"detect timeout {stats['detect_timeout_ms']}ms")
+        for status, row in stats['statuses'].items():
+            print(f"      {status:15s} n={row['count']:<4d} p50 {row['p50']}  p95 {row['p95']}")
+        return
+    print(f"   Succeeded: {report['succeeded']}/{report['total']} {report['failures'] or ''}")
+    print_row('end_to_end', report['end_to_end'])
+    for phase, stats in report['phases'].items():
+        print_row(phase, stats)
+    print(f"   Stub server: {report['server']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline login benchmarks (stub SSO + fake Bright Data CDP)")
+    parser.add_argument('suite', nargs='?', choices=['solver', 'e2e'], default='e2e')
+    parser.add_argument('--logins', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--solve-min', type=float, default=1.0, help="Fastest fake solve (seconds)")
+    parser.add_argument('--solve-max', type=float, default=3.0, help="Slowest fake solve (seconds)")
+    parser.add_argument('--solve-fail-rate', type=float, default=0.0)
+    parser.add_argument('--backend', choices=['brightdata', 'mock', 'race'], default='brightdata',
+                        help="Solver suite backend; race runs the fake Bright Data solver against the mock")
+    parser.add_argument('--mock-latency', type=float, default=1.0, help="Mock backend solve time (seconds)")
+    parser.add_argument('--min-token-age', type=float, default=0.0, help="Server rejects younger tokens")
+    parser.add_argument('--reject-rate', type=float, default=0.0, help="Random server-side captcha rejections")
+    parser.add_argument('--page-latency', type=float, default=0.0, help="Added to every stub page response")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+    suite = bench_solver if args.suite == 'solver' else bench_e2e
+    report = asyncio.run(suite(args))
+    report['args'] = vars(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"   💾 Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Offline stand-in for sso.acesso.gov.br: login form, hCaptcha-like widget, "Captcha inválido" and services pages"""
+import random
+import secrets
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head><meta charset="utf-8"><title>Acesso gov.br</title></head>
+<body>
+  <h1>Acesso gov.br</h1>
+  {error}
+  <button type="button" id="cert-login">Seu certificado digital</button>
+  <form method="post" action="/login">
+    <input type="hidden" name="_csrf" value="{csrf}">
+    <input type="hidden" name="authorization_id" value="{authorization_id}">
+    <div class="h-captcha" data-sitekey="00000000-0000-0000-0000-000000000000" data-hcaptcha-widget-id="w0">
+      <iframe src="/hcaptcha/checkbox" title="Widget containing checkbox for hCaptcha security challenge"
+              width="300" height="78" style="border:0"></iframe>
+      <textarea name="h-captcha-response" style="display:none"></textarea>
+    </div>
+    <button type="submit">Entrar</button>
+  </form>
+  <script>
+    // Minimal hCaptcha API surface used by the automation
+    window.hcaptcha = {{
+      getResponse: () => document.querySelector('textarea[name="h-captcha-response"]').value,
+      setResponse: (id, token) => {{ document.querySelector('textarea[name="h-captcha-response"]').value = token; }},
+      reset: () => {{ document.querySelector('textarea[name="h-captcha-response"]').value = ''; }},
+      execute: () => {{}},
+    }};
+  </script>
+</body>
+</html>"""
+
+CHECKBOX_FRAME = """<!DOCTYPE html><html><body style="margin:0">
+<div style="width:300px;height:78px;background:#f9f9f9;border:1px solid #ddd">hCaptcha</div>
+</body></html>"""
+
+SERVICES_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Serviços gov.br</title></head>
+<body><h1>Bem-vindo</h1><p>Usuário autenticado com sucesso.</p></body></html>"""
+
+CAPTCHA_INVALID = '<div class="error">Captcha inválido</div>'
+
+
+def parse_token_issued_at(token: str) -> Optional[float]:
+    """Tokens from FakeCDPSession look like 'P1_<issued_ms>_<padding>'"""
+    parts = token.split('_', 2)
+    if len(parts) < 3 or parts[0] != 'P1':
+        return None
+    try:
+        return int(parts[1]) / 1000.0
+    except ValueError:
+        return None
+
+
+class StubSSOServer:
+    """Threaded local HTTP server playing the SSO login, captcha validation and services page.
+
+    min_token_age: tokens younger than this (seconds) are rejected as "Captcha inválido".
+    reject_rate: share of otherwise valid submissions rejected at random.
+    page_latency: seconds added to every page response.
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, min_token_age: float = 0.0,
+                 reject_rate: float = 0.0, page_latency: float = 0.0, seed: Optional[int] = None):
+        self.min_token_age = min_token_age
+        self.reject_rate = reject_rate
+        self.page_latency = page_latency
+        self.rng = random.Random(seed)
+        self.stats = {'pages': 0, 'submissions': 0, 'accepted': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def login_url(self) -> str:
+        return f"{self.base_url}/login"
+
+    @property
+    def services_url(self) -> str:
+        return f"{self.base_url}/servicos"
+
+    def start(self) -> 'StubSSOServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-sso', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _validate(self, form: dict) -> bool:
+        token = form.get('h-captcha-response', [''])[0]
+        if len(token) < 1000 or not form.get('_csrf', [''])[0]:
+            return False
+        issued_at = parse_token_issued_at(token)
+        if issued_at is not None and time.time() - issued_at < self.min_token_age:
+            return False
+        with self._lock:
+            return self.rng.random() >= self.reject_rate
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: str = '', headers: Optional[dict] = None):
+                if server.page_latency:
+                    time.sleep(server.page_latency)
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _login_page(self, status: int = 200, error: str = ''):
+                server._count('pages')
+                self._send(status, LOGIN_PAGE.format(
+                    error=error, csrf=secrets.token_hex(16), authorization_id=secrets.token_hex(8),
+                ))
+
+            def do_GET(self):
+                path = urllib.parse.urlparse(self.path).path
+                if path == '/login':
+                    self._login_page()
+                elif path == '/hcaptcha/checkbox':
+                    self._send(200, CHECKBOX_FRAME)
+                elif path == '/servicos':
+                    self._send(200, SERVICES_PAGE)
+                else:
+                    self._send(404, 'not found')
+
+            def do_POST(self):
+                path = urllib.parse.urlparse(self.path).path
+                if path != '/login':
+                    self._send(404, 'not found')
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+                server._count('submissions')
+                if server._validate(form):
+                    server._count('accepted')
+                    self._send(302, '', {'Location': '/servicos'})
+                else:
+                    server._count('rejected')
+                    self._login_page(400, CAPTCHA_INVALID)
+
+        return Handler
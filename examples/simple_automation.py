@@ -1,12 +1,15 @@
 from playwright.async_api import async_playwright, Page
 import asyncio
+import sys
 from config import TARGET_URL
 
 
 class SimpleGovBrAutomation:
-    def __init__(self):
+    def __init__(self, interactive=True):
         self.page: Page = None
         self.browser = None
+        # False = close the browser as soon as the run ends and return the final URL
+        self.interactive = interactive
         
     async def run(self):
         async with async_playwright() as playwright:
@@ -140,22 +143,26 @@ class SimpleGovBrAutomation:
                 print(f"   URL: {self.page.url}")
                 print(f"   Title: {await self.page.title()}")
                 
-                print("\n\nBrowser will stay open for inspection.")
-                print("Press Enter to close...")
-                input()
+                if self.interactive:
+                    print("\n\nBrowser will stay open for inspection.")
+                    print("Press Enter to close...")
+                    input()
+                return self.page.url
                 
             except Exception as e:
                 print(f"\n❌ ERROR: {e}")
                 import traceback
                 traceback.print_exc()
-                input("\nPress Enter to close...")
+                if self.interactive:
+                    input("\nPress Enter to close...")
+                return None
             finally:
                 if self.browser:
                     await self.browser.close()
 
 
 async def main():
-    automation = SimpleGovBrAutomation()
+    automation = SimpleGovBrAutomation(interactive='--no-wait' not in sys.argv)
     await automation.run()
 
 
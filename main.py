@@ -1,11 +1,20 @@
 ﻿from src.automation import BrightDataFullAutomation
+from src.logger import setup_logging
 import asyncio
+import json
+import sys
 
 
 async def main():
-    automation = BrightDataFullAutomation()
-    await automation.run()
+    # --service: no Enter prompts, release the browser at once and print the result as JSON
+    service_mode = '--service' in sys.argv
+    setup_logging()
+    automation = BrightDataFullAutomation(interactive=not service_mode)
+    result = await automation.run()
+    if service_mode:
+        print(json.dumps(result.to_dict()))
+    return 0 if result else 1
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
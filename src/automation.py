@@ -1,20 +1,150 @@
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import asyncio
-from src.config import TARGET_URL, BRIGHT_DATA_USERNAME, BRIGHT_DATA_PASSWORD, TIMEOUT, CERTIFICATE_PATH, CERTIFICATE_PASSWORD, CAPTCHA_POST_SOLVE_WAIT, CAPTCHA_SUBMIT_DELAY
-from src.captcha_solver import BrightDataCaptchaSolver
-import base64
-import os
+from src.config import TARGET_URL, SERVICES_URL, TIMEOUT, CERTIFICATE_PATH, CERTIFICATE_PASSWORD, CAPTCHA_POST_SOLVE_WAIT, CAPTCHA_SUBMIT_DELAY, CAPTCHA_DETECTION_MODE
+from src.config import ADAPTIVE_WAITS, AUTO_SUBMIT_WAIT, SERVER_VALIDATION_WAIT, SOLVE_TIMEOUT_VALIDATION_WAIT, SOLVE_TOKEN_GRACE, BROWSER_POOL_ENABLED
+from src.config import SESSION_CACHE_ENABLED
+from src.browser_pool import CDPBrowserPool, bright_data_endpoint_url
+from src.session_cache import apply_storage_state, get_session_cache, probe_session
+from src.certificate_registry import CertificateError, get_certificate_registry
+from src.config import INTERCEPT_MODE, TOKEN_CAPTURE_MODE, TOKEN_REUSE, PIPELINED_SOLVE, PAGE_FLOW_MODE
+from src.network_profile import SUBMIT_ROUTE_REGEX, is_submit_url, apply_block_profile
+from src.captcha_solver import create_captcha_solver
+from src.cdp_pipeline import CDPPipeline
+from src.page_snapshot import take_snapshot, button_locator
+from src.page_helpers import install_helpers, call_helper, cdp_call_helper
+from src.login_state_machine import LoginStateMachine
+from src.form_submit import (
+    submit_form, classify_submission, is_login_url, SUBMIT_ACCEPTED, SUBMIT_CAPTCHA_REJECTED, SUBMIT_CERTIFICATE_NOT_FOUND,
+    SUBMIT_NOT_SENT, SUBMIT_UNKNOWN,
+)
+from src.token_capture import TokenCapture
+from src.token_manager import TokenManager
+from src.event_dispatcher import EventDispatcher
+from src.upstream_health import UPSTREAM_CDP, UPSTREAM_CAPTCHA, get_upstream_health
+from src.wait_calibrator import get_wait_calibrator
+from src.config import METRICS_ENABLED, HEDGE_ENABLED, SUBMIT_MODE, HTTP_SUBMIT_TIMEOUT, CIRCUIT_MAX_WAIT
+from src.metrics import PhaseTimer, get_metrics
+from src.hedging import LOGIN_PHASE, run_hedged
+from src.logger import get_logger, session_id_var, debug_enabled, flush_logging
+from src.result import (
+    LoginResult, STATUS_SUCCESS, STATUS_SESSION_REUSED,
+    FAILURE_CERTIFICATE_INVALID, FAILURE_CERTIFICATE_REJECTED, FAILURE_CERTIFICATE_NOT_RECOGNIZED,
+    FAILURE_CAPTCHA_UNSOLVED, FAILURE_CAPTCHA_REJECTED, FAILURE_PAGE_ERROR, FAILURE_TIMEOUT, FAILURE_EXCEPTION,
+    FAILURE_UPSTREAM_UNAVAILABLE,
+)
+import time
+from urllib.parse import urljoin
 
 
-class BrightDataFullAutomation:
-    def __init__(self):
+# In-page predicate: true once any hCaptcha iframe (by src or title) is rendered and visible.
+# Evaluated inside the browser so a whole wait costs one CDP round trip.
+CAPTCHA_VISIBLE_PREDICATE = """
+    () => {
+        for (const iframe of document.querySelectorAll('iframe')) {
+            const src = (iframe.getAttribute('src') || '').toLowerCase();
+            const title = (iframe.getAttribute('title') || '').toLowerCase();
+            if (!src.includes('hcaptcha') && !title.includes('hcaptcha')) continue;
+            const rect = iframe.getBoundingClientRect();
+            const style = window.getComputedStyle(iframe);
+            if (rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none') {
+                return true;
+            }
+        }
+        return false;
+    }
+"""
+
+# In-page predicate: true once the login form carries the server-issued fields the POST needs
+FORM_READY_PREDICATE = """
+    () => {
+        const csrf = document.querySelector('input[name="_csrf"]');
+        return !!(csrf && csrf.value) && !!document.querySelector('textarea[name="h-captcha-response"]');
+    }
+"""
+
+
+def _ignore_task_result(task):
+    """Done-callback for background tasks nobody may await (avoids 'exception never retrieved')"""
+    if not task.cancelled():
+        task.exception()
+
+
+class LoginSessionState:
+    """Mutable state for one login attempt - never shared between sessions"""
+    def __init__(self, metrics=None):
         self.ready_to_submit = False
         self.blocked_requests = []
+        self.captured_token_from_request = None
+        self.form_submitted = False
+        self.first_submission_delayed = False
+        # Track validation failures reported by the server
+        self.validation_state = {"failed": False, "reason": "", "timestamp": 0}
+        # Token age bookkeeping for the wait calibrator (monotonic seconds)
+        self.token_solved_at = None
+        self.submitted_token_age = None
+        self.wait_outcome_recorded = False
+        # Requests that went through the Python route handler
+        self.route_events = 0
+        # Monotonic per-phase spans of this attempt
+        self.timer = PhaseTimer(metrics)
+        # Why handle_page_elements gave up (one of the FAILURE_* classes)
+        self.failure_class = None
+        # Page-binding token receiver (TOKEN_CAPTURE_MODE=push), installed per page
+        self.token_capture = None
+        # Pipelined flow (PIPELINED_SOLVE): solve started at frame attach, and the form-field wait
+        self.early_solve_started = False
+        self.solve_task = None
+        self.solve_finished_at = None
+        self.form_ready_task = None
+        # Browser.addCertificate, sent together with the other setup commands
+        self.certificate_task = None
+        # Page-event handler tasks and parsed POST bodies of this attempt
+        self.events = EventDispatcher()
+
+
+class BrightDataFullAutomation:
+    def __init__(self, certificate_path=None, certificate_password=None, session_id=None, interactive=True,
+                 wait_calibrator=None, adaptive_waits=ADAPTIVE_WAITS, browser_pool=None, session_cache=None,
+                 certificate_registry=None, metrics=None, target_url=None, services_url=None,
+                 cdp_session_factory=None):
+        self.certificate_path = certificate_path or CERTIFICATE_PATH
+        self.certificate_password = certificate_password or CERTIFICATE_PASSWORD
+        self.session_id = session_id or "main"
+        self.target_url = target_url or TARGET_URL
+        self.services_url = services_url or SERVICES_URL
+        # async (context, page) -> CDP session; lets benchmarks put a fake Captcha domain in front
+        self.cdp_session_factory = cdp_session_factory
+        # Bound to the session so records from Playwright callbacks keep their correlation id
+        self.log = get_logger(__name__, self.session_id)
+        # Interactive runs keep the browser open until Enter is pressed
+        self.interactive = interactive
+        # Outcomes are always recorded; adaptive_waits decides whether the learned delay is used
+        self.wait_calibrator = wait_calibrator or get_wait_calibrator()
+        self.adaptive_waits = adaptive_waits
+        # Shared CDPBrowserPool (e.g. from the engine); None = private pool per run
+        self.browser_pool = browser_pool
+        self._pool = None
+        self._lease = None
+        self._browser = None
+        # Authenticated storage_state per certificate fingerprint
+        self.session_cache = session_cache or (get_session_cache() if SESSION_CACHE_ENABLED else None)
+        self.certificate_fingerprint = None
+        # Parsed/encoded .pfx payloads shared by every session in the process
+        self.certificate_registry = certificate_registry or get_certificate_registry()
+        # Per-phase latency histograms (shared by every session in the process)
+        self.metrics = metrics or (get_metrics() if METRICS_ENABLED else None)
+        # Solved tokens of this session, kept across widget resets and attempts
+        self.token_manager = TokenManager()
+        # Bright Data health shared by every session: circuit breaker and retry backoff
+        self.cdp_health = get_upstream_health(UPSTREAM_CDP)
+        self.captcha_health = get_upstream_health(UPSTREAM_CAPTCHA)
+        self.state = LoginSessionState(self.metrics)
+        self._running = False
     
     async def verify_certificate(self, cdp_session, cert_base64, cert_password):
         """Verify that the certificate is valid before attempting to use it"""
         try:
-            print("   🔍 Verifying certificate validity...")
+            self.log.info("   🔍 Verifying certificate validity...")
             
             # Try to add the certificate - if it fails, it's likely invalid
             result = await cdp_session.send('Browser.addCertificate', {
@@ -22,30 +152,69 @@ class BrightDataFullAutomation:
                 'pass': cert_password
             })
             
-            print(f"   ✅ Certificate is valid and injected successfully")
-            print(f"   📋 Result: {result}")
+            self.log.info(f"   ✅ Certificate is valid and injected successfully")
+            self.log.info(f"   📋 Result: {result}")
             return True
             
         except Exception as e:
             error_msg = str(e).lower()
             
             if 'password' in error_msg or 'decrypt' in error_msg:
-                print(f"   ❌ Certificate password is incorrect!")
-                print(f"   💡 Check CERTIFICATE_PASSWORD in your .env file")
+                self.log.error(f"   ❌ Certificate password is incorrect!")
+                self.log.info(f"   💡 Check CERTIFICATE_PASSWORD in your .env file")
             elif 'expired' in error_msg:
-                print(f"   ❌ Certificate has expired!")
-                print(f"   💡 You need to obtain a new certificate")
+                self.log.error(f"   ❌ Certificate has expired!")
+                self.log.info(f"   💡 You need to obtain a new certificate")
             elif 'invalid' in error_msg or 'malformed' in error_msg:
-                print(f"   ❌ Certificate file is invalid or corrupted!")
-                print(f"   💡 Check the .pfx file integrity")
+                self.log.error(f"   ❌ Certificate file is invalid or corrupted!")
+                self.log.info(f"   💡 Check the .pfx file integrity")
             else:
-                print(f"   ❌ Certificate verification failed: {e}")
+                self.log.error(f"   ❌ Certificate verification failed: {e}")
             
             return False
     
-    async def wait_for_captcha_with_debug(self, page, max_wait_seconds=30):
+    async def wait_for_captcha_event_driven(self, page, max_wait_seconds=30):
+        """Wait for the hCaptcha iframe to become visible using frame events and one in-page wait"""
+        self.log.info("   🔍 Waiting for captcha (event-driven)...")
+        
+        start_time = asyncio.get_event_loop().time()
+        frame_attached_at = []
+        
+        def on_frame(frame):
+            # frameattached fires before the iframe has a URL, framenavigated once it loads
+            if not frame_attached_at and 'hcaptcha' in (frame.url or '').lower():
+                frame_attached_at.append(asyncio.get_event_loop().time() - start_time)
+        
+        page.on("frameattached", on_frame)
+        page.on("framenavigated", on_frame)
+        try:
+            # The predicate is re-checked inside the browser every 50ms - no CDP traffic until it resolves
+            await page.wait_for_function(CAPTCHA_VISIBLE_PREDICATE, polling=50, timeout=max_wait_seconds * 1000)
+            elapsed = asyncio.get_event_loop().time() - start_time
+            if frame_attached_at:
+                self.log.info(f"   ✅ Captcha visible after {elapsed:.2f}s (frame loaded at {frame_attached_at[0]:.2f}s)")
+            else:
+                self.log.info(f"   ✅ Captcha visible after {elapsed:.2f}s")
+            return True
+        except PlaywrightTimeoutError:
+            if frame_attached_at:
+                self.log.warning(f"   ⚠️ hCaptcha frame loaded but did not become visible after {max_wait_seconds}s")
+            else:
+                self.log.warning(f"   ⚠️ Captcha did not become visible after {max_wait_seconds}s")
+            return False
+        except Exception as e:
+            self.log.warning(f"   ⚠️ Event-driven captcha detection failed: {e}")
+            return False
+        finally:
+            page.remove_listener("frameattached", on_frame)
+            page.remove_listener("framenavigated", on_frame)
+    
+    async def wait_for_captcha_with_debug(self, page, max_wait_seconds=30, mode=None):
         """Wait for captcha to appear with detailed debugging"""
-        print("   🔍 Waiting for captcha with enhanced detection...")
+        if (mode or CAPTCHA_DETECTION_MODE) == "event":
+            return await self.wait_for_captcha_event_driven(page, max_wait_seconds)
+        
+        self.log.info("   🔍 Waiting for captcha with enhanced detection...")
         
         start_time = asyncio.get_event_loop().time()
         check_interval = 0.5  # Check every 500ms for faster detection
@@ -63,10 +232,10 @@ class BrightDataFullAutomation:
                 if count > 0:
                     is_visible = await hcaptcha_iframe.first.is_visible()
                     if is_visible:
-                        print(f"   ✅ Captcha detected via iframe[src*='hcaptcha'] after {elapsed:.1f}s!")
+                        self.log.info(f"   ✅ Captcha detected via iframe[src*='hcaptcha'] after {elapsed:.1f}s!")
                         return True
                     else:
-                        print(f"   � [{elapsed:.1f}s] hCaptcha iframe exists but not visible yet...")
+                        self.log.debug(f"   � [{elapsed:.1f}s] hCaptcha iframe exists but not visible yet...")
                         captcha_found = True
             except Exception as e:
                 pass
@@ -83,7 +252,7 @@ class BrightDataFullAutomation:
                         if 'hcaptcha' in src.lower() or 'hcaptcha' in title.lower():
                             is_visible = await iframe.is_visible()
                             if is_visible:
-                                print(f"   ✅ Captcha detected via iframe #{i} after {elapsed:.1f}s!")
+                                self.log.info(f"   ✅ Captcha detected via iframe #{i} after {elapsed:.1f}s!")
                                 return True
                             else:
                                 captcha_found = True
@@ -94,7 +263,7 @@ class BrightDataFullAutomation:
             try:
                 hcaptcha_div = page.locator('div.h-captcha, [data-hcaptcha-widget-id]')
                 if await hcaptcha_div.count() > 0:
-                    print(f"   🔍 [{elapsed:.1f}s] hCaptcha container found, checking for iframe...")
+                    self.log.debug(f"   🔍 [{elapsed:.1f}s] hCaptcha container found, checking for iframe...")
                     captcha_found = True
             except Exception as e:
                 pass
@@ -104,7 +273,7 @@ class BrightDataFullAutomation:
                 try:
                     page_html = await page.content()
                     if 'hcaptcha' in page_html.lower():
-                        print(f"   🔍 [{elapsed:.1f}s] hCaptcha code present in HTML...")
+                        self.log.debug(f"   🔍 [{elapsed:.1f}s] hCaptcha code present in HTML...")
                         captcha_found = True
                 except Exception as e:
                     pass
@@ -112,301 +281,250 @@ class BrightDataFullAutomation:
             # Progress indicator
             if int(elapsed * 2) % 4 == 0:  # Every 2 seconds
                 status = "🔍 Captcha elements found, waiting for visibility..." if captcha_found else "⏳ Waiting for captcha..."
-                print(f"   [{elapsed:.1f}s] {status}")
+                self.log.debug(f"   [{elapsed:.1f}s] {status}")
             
             await asyncio.sleep(check_interval)
         
-        print(f"   ⚠️ Captcha did not become visible after {max_wait_seconds}s")
+        self.log.warning(f"   ⚠️ Captcha did not become visible after {max_wait_seconds}s")
         return False
     
     async def debug_page_state(self, page):
         """Print detailed debug information about current page state"""
-        print("\n   🐛 DEBUG INFO:")
-        print(f"   📍 URL: {page.url}")
-        try:
-            print(f"   📄 Title: {await page.title()}")
-        except:
-            print(f"   📄 Title: [Unable to get]")
+        self.log.info("\n   🐛 DEBUG INFO:")
+        snapshot = await take_snapshot(page)
+        if snapshot is None:
+            self.log.info(f"   📍 URL: {page.url}")
+            return
         
-        # Check for iframes
-        try:
-            all_iframes = page.locator('iframe')
-            iframe_count = await all_iframes.count()
-            print(f"   🖼️  Total iframes: {iframe_count}")
-            
-            if iframe_count > 0:
-                for i in range(min(iframe_count, 5)):  # Show first 5
-                    iframe = all_iframes.nth(i)
-                    src = await iframe.get_attribute('src') or '[no src]'
-                    title = await iframe.get_attribute('title') or '[no title]'
-                    is_visible = await iframe.is_visible()
-                    print(f"      Iframe {i}: visible={is_visible}, src={src[:80]}")
-        except Exception as e:
-            print(f"   ⚠️ Error checking iframes: {e}")
+        self.log.info(f"   📍 URL: {snapshot.url}")
+        self.log.info(f"   📄 Title: {snapshot.title or '[Unable to get]'}")
+        
+        # Check for captcha iframes
+        self.log.info(f"   🖼️  hCaptcha iframes: {len(snapshot.captcha_frames)}")
+        for i, frame in enumerate(snapshot.captcha_frames[:5]):  # Show first 5
+            self.log.info(f"      Iframe {i}: visible={frame.visible}, src={(frame.src or '[no src]')[:80]}")
         
         # Check page content for keywords
+        keywords = []
+        if snapshot.mentions_certificate:
+            keywords.append('certificado')
+        if snapshot.captcha_invalid:
+            keywords.append('captcha inválido')
+        if snapshot.mentions_error:
+            keywords.append('erro')
+        keywords.extend(snapshot.success_keywords)
+        if keywords:
+            self.log.info(f"   🔑 Keywords found: {', '.join(keywords)}")
+
+
+    def _maybe_start_early_solve(self, frame, captcha_solver):
+        """framenavigated listener: start the solve once per attempt, the moment an hCaptcha frame loads"""
+        state = self.state
+        if state.early_solve_started or 'hcaptcha' not in (frame.url or '').lower():
+            return
+        if TOKEN_REUSE and self.token_manager.fresh() is not None:
+            # handle_page_elements will reuse that token - don't pay for another solve
+            return
+        state.early_solve_started = True
+        state.timer.stop('captcha_detection')
+        if state.token_capture is not None:
+            state.token_capture.reset()
+        self.log.info("   ⚡ hCaptcha frame attached - solving while the page finishes loading")
+        state.solve_task = asyncio.ensure_future(self._early_solve(state, captcha_solver))
+        state.solve_task.add_done_callback(_ignore_task_result)
+
+    async def _early_solve(self, state, captcha_solver):
+        """Captcha.waitForSolve overlapping the page-load waits; joined by handle_page_elements"""
+        with state.timer.span('solve'):
+            success = await captcha_solver.solve_with_retry(max_retries=2)
+        state.solve_finished_at = time.monotonic()
+        return success
+
+    async def _wait_for_network_idle(self, page, timeout=15000):
+        """networkidle, cut short when an early solve finishes first (the page is usable by then)"""
+        solve_task = self.state.solve_task
+        if solve_task is None:
+            await page.wait_for_load_state('networkidle', timeout=timeout)
+            return
+        idle = asyncio.ensure_future(page.wait_for_load_state('networkidle', timeout=timeout))
+        idle.add_done_callback(_ignore_task_result)
+        done, _ = await asyncio.wait([idle, solve_task], return_when=asyncio.FIRST_COMPLETED)
+        if idle in done:
+            idle.result()
+        else:
+            idle.cancel()
+
+    async def _submit_via_http(self, page, token_value=None):
+        """POST the login form in one in-page request and classify the server's reply"""
+        self.log.info("   📨 Submitting form over HTTP (one request, reply classified directly)...")
+        with self.state.timer.span('submit'):
+            submission = await submit_form(page, token_value, timeout=HTTP_SUBMIT_TIMEOUT)
+        if not submission.sent:
+            self.log.warning(f"   ⚠️ HTTP submit not sent: {submission.error}")
+            return submission
+        
+        self.log.info(f"   📬 HTTP {submission.status} -> {submission.url} ({submission.outcome})")
+        if submission.outcome == SUBMIT_UNKNOWN and submission.opaque_redirect and not submission.url:
+            # Where the redirect pointed is unknown: the services portal tells whether the session is logged in
+            with self.state.timer.span('redirect'):
+                await page.goto(self.services_url, wait_until='domcontentloaded', timeout=30000)
+            if not is_login_url(page.url):
+                submission.outcome, submission.url = SUBMIT_ACCEPTED, page.url
+            else:
+                self.log.warning("   ⚠️ Redirected back to the login page - not logged in")
+        if submission.outcome == SUBMIT_ACCEPTED:
+            self.log.info("   🎉 Authentication succeeded!")
+            if page.url != submission.url:
+                with self.state.timer.span('redirect'):
+                    # Session cookies are already in the browser - just show the landing page
+                    await page.goto(submission.url, wait_until='domcontentloaded', timeout=30000)
+            self.log.info(f"   📍 URL: {page.url}")
+        elif submission.outcome == SUBMIT_CAPTCHA_REJECTED:
+            self.log.warning("   🚨 Server rejected captcha ('Captcha inválido')")
+            if token_value:
+                self.token_manager.mark_rejected(token_value)
+        elif submission.outcome == SUBMIT_CERTIFICATE_NOT_FOUND:
+            self.log.error("   ❌ Server did not find the digital certificate")
+        else:
+            self.log.warning(f"   ⚠️ Unrecognised reply: {submission.body[:200]!r}")
+        return submission
+    
+    async def _join_form_ready(self):
+        """Wait for the form-field task started after navigation (no-op outside the pipelined flow)"""
+        task, self.state.form_ready_task = self.state.form_ready_task, None
+        if task is None:
+            return
         try:
-            page_text = await page.evaluate("() => document.body.innerText")
-            keywords = ['captcha', 'certificado', 'inválido', 'erro', 'sucesso']
-            found_keywords = [kw for kw in keywords if kw in page_text.lower()]
-            if found_keywords:
-                print(f"   🔑 Keywords found: {', '.join(found_keywords)}")
+            await task
         except Exception as e:
-            print(f"   ⚠️ Error checking page text: {e}")
-        
-        print()
+            self.log.warning(f"   ⚠️ Form fields not confirmed before submit: {e}")
 
     async def extract_captcha_config(self, page):
         """Extract hCaptcha configuration (sitekey, rqdata) for Enterprise solving"""
         try:
-            config = await page.evaluate("""
-                () => {
-                    const el = document.querySelector('.h-captcha, [data-hcaptcha-widget-id], [data-sitekey]');
-                    return {
-                        sitekey: el?.getAttribute('data-sitekey') || null,
-                        rqdata: el?.getAttribute('data-rqdata') || null,
-                        isEnterprise: !!el?.getAttribute('data-rqdata')
-                    };
-                }
-            """)
+            config = await call_helper(page, 'captchaConfig')
             if config['sitekey']:
-                print(f"   🔑 Sitekey: {config['sitekey']}")
-                print(f"   🏢 Enterprise: {config['isEnterprise']}")
+                self.log.info(f"   🔑 Sitekey: {config['sitekey']}")
+                self.log.info(f"   🏢 Enterprise: {config['isEnterprise']}")
                 if config['rqdata']:
-                    print(f"   📦 RQData length: {len(config['rqdata'])}")
+                    self.log.info(f"   📦 RQData length: {len(config['rqdata'])}")
             return config
         except Exception as e:
-            print(f"   ⚠️ Could not extract captcha config: {e}")
+            self.log.warning(f"   ⚠️ Could not extract captcha config: {e}")
             return {'sitekey': None, 'rqdata': None, 'isEnterprise': False}
     
     async def verify_token_ready(self, page):
         """Verify hCaptcha token is present and valid before submission"""
         try:
-            validation = await page.evaluate("""
-                () => {
-                    const tokenEl = document.querySelector('textarea[name="h-captcha-response"]');
-                    const token = tokenEl?.value || '';
-                    const csrfEl = document.querySelector('input[name="_csrf"]');
-                    const csrf = csrfEl?.value || '';
-                    const authzEl = document.querySelector('input[name="authorization_id"]');
-                    const authz = authzEl?.value || '';
-                    
-                    // Get all form inputs to debug
-                    const form = document.querySelector('form');
-                    const allInputs = form ? Array.from(form.querySelectorAll('input, textarea')).map(el => ({
-                        name: el.name,
-                        type: el.type || 'textarea',
-                        hasValue: !!el.value,
-                        valueLength: (el.value || '').length
-                    })) : [];
-                    
-                    return {
-                        hasToken: token.length > 1000,
-                        tokenLength: token.length,
-                        hasCsrf: csrf.length > 0,
-                        hasAuthz: authz.length > 0,
-                        csrfValue: csrf.substring(0, 20),
-                        authzValue: authz.substring(0, 20),
-                        formAction: document.querySelector('form')?.action || 'none',
-                        allInputs: allInputs
-                    };
-                }
-            """)
+            validation = await call_helper(page, 'verify')
             
-            print(f"   🔐 Token ready: {validation['hasToken']} (length: {validation['tokenLength']})")
-            print(f"   🎫 CSRF: {validation['hasCsrf']} ({validation['csrfValue']}...)")
-            print(f"   🆔 Authorization: {validation['hasAuthz']} ({validation['authzValue']}...)")
-            print(f"   📍 Form action: {validation['formAction']}")
+            self.log.info(f"   🔐 Token ready: {validation['hasToken']} (length: {validation['tokenLength']})")
+            self.log.debug(f"   🎫 CSRF: {validation['hasCsrf']} ({validation['csrfValue']}...)")
+            self.log.info(f"   🆔 Authorization: {validation['hasAuthz']} ({validation['authzValue']}...)")
+            self.log.info(f"   📍 Form action: {validation['formAction']}")
             
             # Show all form fields for debugging
             if validation.get('allInputs'):
-                print(f"   📋 All form fields ({len(validation['allInputs'])} total):")
+                self.log.info(f"   📋 All form fields ({len(validation['allInputs'])} total):")
                 for inp in validation['allInputs'][:10]:  # Show first 10
-                    print(f"      - {inp['name'] or '[no name]'} ({inp['type']}): {'✓' if inp['hasValue'] else '✗'} ({inp['valueLength']} chars)")
+                    self.log.info(f"      - {inp['name'] or '[no name]'} ({inp['type']}): {'✓' if inp['hasValue'] else '✗'} ({inp['valueLength']} chars)")
             
             # Token and CSRF are critical; authorization_id might not always be present
             is_ready = validation['hasToken'] and validation['hasCsrf']
             
             if not is_ready:
                 if not validation['hasToken']:
-                    print(f"   ❌ Token missing or too short (need >1000 chars, got {validation['tokenLength']})")
+                    self.log.error(f"   ❌ Token missing or too short (need >1000 chars, got {validation['tokenLength']})")
                 if not validation['hasCsrf']:
-                    print(f"   ❌ CSRF token missing")
+                    self.log.error(f"   ❌ CSRF token missing")
             
             return is_ready
         except Exception as e:
-            print(f"   ⚠️ Token verification failed: {e}")
-            import traceback
-            traceback.print_exc()
+            self.log.warning(f"   ⚠️ Token verification failed: {e}", exc_info=True)
             return False
     
     async def get_captcha_response_from_cdp(self, cdp_session):
         """Get hCaptcha response token from Bright Data CDP"""
         try:
             # Try to get the solved token from Bright Data
-            result = await cdp_session.send('Runtime.evaluate', {
-                'expression': '''
-                    (() => {
-                        // Try multiple methods to get the token
-                        let token = null;
-                        
-                        // Method 1: Check if hcaptcha has getResponse
-                        if (window.hcaptcha && window.hcaptcha.getResponse) {
-                            try {
-                                token = window.hcaptcha.getResponse();
-                                if (token) return token;
-                            } catch(e) {}
-                        }
-                        
-                        // Method 2: Check the textarea directly
-                        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
-                        if (textarea && textarea.value) {
-                            return textarea.value;
-                        }
-                        
-                        // Method 3: Check g-recaptcha-response (fallback)
-                        const gTextarea = document.querySelector('textarea[name="g-recaptcha-response"]');
-                        if (gTextarea && gTextarea.value) {
-                            return gTextarea.value;
-                        }
-                        
-                        return null;
-                    })()
-                '''
-            })
-            
-            token = result.get('result', {}).get('value')
+            token = await cdp_call_helper(cdp_session, 'findToken')
             if token and len(token) > 100:
-                print(f"   ✅ Retrieved token from CDP (length: {len(token)})")
+                self.log.info(f"   ✅ Retrieved token from CDP (length: {len(token)})")
                 return token
             else:
-                print(f"   ⚠️ No valid token found in CDP")
+                self.log.warning(f"   ⚠️ No valid token found in CDP")
                 return None
                 
         except Exception as e:
-            print(f"   ⚠️ Error getting token from CDP: {e}")
+            self.log.warning(f"   ⚠️ Error getting token from CDP: {e}")
             return None
     
     async def inject_captcha_token(self, page, token):
         """Manually inject hCaptcha token into the page with enhanced detection"""
         try:
-            print(f"   💉 Injecting token into page (length: {len(token)})...")
+            self.log.info(f"   💉 Injecting token into page (length: {len(token)})...")
             
             # Strategy 1: Try to find existing form and inject there
-            result = await page.evaluate("""
-                (token) => {
-                    // Method 1: Direct h-captcha-response textarea (if exists)
-                    let textarea = document.querySelector('textarea[name="h-captcha-response"]');
-                    if (textarea) {
-                        textarea.value = token;
-                        textarea.style.display = 'block';  // Make visible for debugging
-                        
-                        // Trigger all possible events
-                        textarea.dispatchEvent(new Event('input', { bubbles: true }));
-                        textarea.dispatchEvent(new Event('change', { bubbles: true }));
-                        textarea.dispatchEvent(new Event('blur', { bubbles: true }));
-                        
-                        return { success: true, method: 'h-captcha-response', length: textarea.value.length };
-                    }
-                    
-                    // Method 2: Find form and create textarea in it
-                    const form = document.querySelector('form');
-                    if (form) {
-                        // Create textarea if needed
-                        textarea = document.createElement('textarea');
-                        textarea.name = 'h-captcha-response';
-                        textarea.style.display = 'none';
-                        textarea.value = token;
-                        form.appendChild(textarea);
-                        
-                        console.log('✅ Created textarea in form, length:', token.length);
-                        return { success: true, method: 'created-in-form', length: token.length };
-                    }
-                    
-                    // Method 3: Find hCaptcha container and create textarea
-                    const hcaptchaDiv = document.querySelector('.h-captcha, [data-sitekey], [data-hcaptcha-widget-id]');
-                    if (hcaptchaDiv) {
-                        textarea = document.createElement('textarea');
-                        textarea.name = 'h-captcha-response';
-                        textarea.style.display = 'none';
-                        textarea.value = token;
-                        
-                        // Try to add to parent form if exists
-                        let parentForm = hcaptchaDiv.closest('form');
-                        if (parentForm) {
-                            parentForm.appendChild(textarea);
-                            console.log('✅ Created textarea in parent form');
-                        } else {
-                            hcaptchaDiv.appendChild(textarea);
-                            console.log('✅ Created textarea in hCaptcha div');
-                        }
-                        
-                        return { success: true, method: 'created-textarea', length: token.length };
-                    }
-                    
-                    // Method 4: Try g-recaptcha-response as fallback
-                    const gTextarea = document.querySelector('textarea[name="g-recaptcha-response"]');
-                    if (gTextarea) {
-                        gTextarea.value = token;
-                        gTextarea.dispatchEvent(new Event('input', { bubbles: true }));
-                        gTextarea.dispatchEvent(new Event('change', { bubbles: true }));
-                        return { success: true, method: 'g-recaptcha-response', length: token.length };
-                    }
-                    
-                    return { success: false, method: 'none', error: 'No form or hCaptcha container found' };
-                }
-            """, token)
+            result = await call_helper(page, 'inject', token)
             
             if result.get('success'):
-                print(f"   ✅ Token injected via {result['method']} ({result.get('length', 0)} chars)")
+                self.log.info(f"   ✅ Token injected via {result['method']} ({result.get('length', 0)} chars)")
                 
                 # Verify injection worked
                 await asyncio.sleep(0.3)
-                verify_len = await page.evaluate("() => document.querySelector('textarea[name=\"h-captcha-response\"]')?.value.length || 0")
+                verify_len = await call_helper(page, 'tokenLength')
                 if verify_len > 0:
-                    print(f"   ✅ Injection verified: {verify_len} chars in textarea")
+                    self.log.info(f"   ✅ Injection verified: {verify_len} chars in textarea")
                     return True
                 else:
-                    print(f"   ⚠️ Verification shows {verify_len} chars (may still work)")
+                    self.log.warning(f"   ⚠️ Verification shows {verify_len} chars (may still work)")
                     return result.get('success', False)  # Return original success even if verify is 0
             else:
-                print(f"   ⚠️ Could not inject token: {result.get('error', 'unknown')}")
+                self.log.warning(f"   ⚠️ Could not inject token: {result.get('error', 'unknown')}")
                 return False
                 
         except Exception as e:
-            print(f"   ⚠️ Token injection failed: {e}")
+            self.log.warning(f"   ⚠️ Token injection failed: {e}")
             return False
     
+    async def record_wait_outcome(self, response):
+        """Feed the wait calibrator with the server's answer to the first captcha submission"""
+        if self.state.submitted_token_age is None or self.state.wait_outcome_recorded:
+            return
+        try:
+            if response.request.method != "POST":
+                return
+            if not is_submit_url(response.url):
+                return
+            
+            self.state.wait_outcome_recorded = True
+            if 300 <= response.status < 400:
+                location = urljoin(response.url, response.headers.get('location', ''))
+                outcome = classify_submission(response.status, location, '', True)
+            else:
+                outcome = classify_submission(response.status, response.url, await response.text(), False)
+            if outcome not in (SUBMIT_ACCEPTED, SUBMIT_CAPTCHA_REJECTED):
+                # Nothing learned about the token age (e.g. a redirect back to the login page)
+                self.log.info(f"   📈 Calibration: token age {self.state.submitted_token_age:.1f}s -> {outcome}, not recorded")
+                return
+            rejected = outcome == SUBMIT_CAPTCHA_REJECTED
+            
+            self.wait_calibrator.record(self.state.submitted_token_age, rejected, session_id=self.session_id)
+            verdict = "REJECTED" if rejected else "accepted"
+            self.log.info(f"   📈 Calibration: token age {self.state.submitted_token_age:.1f}s -> {verdict}")
+        except Exception as e:
+            self.log.warning(f"   ⚠️ Could not record wait calibration outcome: {e}")
+    
     async def reset_captcha_widget(self, page):
         """Reset hCaptcha widget without reloading the page"""
         try:
-            print("   🔄 Resetting hCaptcha widget...")
-            await page.evaluate("""
-                () => {
-                    if (window.hcaptcha) {
-                        try {
-                            // Try to reset all widgets
-                            const widgets = document.querySelectorAll('[data-hcaptcha-widget-id]');
-                            widgets.forEach(w => {
-                                const id = w.getAttribute('data-hcaptcha-widget-id');
-                                if (id) window.hcaptcha.reset(id);
-                            });
-                            
-                            // Fallback: reset first widget
-                            if (window.hcaptcha.reset) {
-                                window.hcaptcha.reset();
-                            }
-                        } catch (e) {
-                            console.error('Reset failed:', e);
-                        }
-                    }
-                }
-            """)
+            self.log.info("   🔄 Resetting hCaptcha widget...")
+            await call_helper(page, 'resetWidget')
             await asyncio.sleep(2)  # Let widget reinitialize
-            print("   ✅ Widget reset complete")
+            self.log.info("   ✅ Widget reset complete")
             return True
         except Exception as e:
-            print(f"   ⚠️ Widget reset failed: {e}")
+            self.log.warning(f"   ⚠️ Widget reset failed: {e}")
             return False
     
     async def handle_page_elements(self, page, captcha_solver):
@@ -419,374 +537,280 @@ class BrightDataFullAutomation:
         for step in range(15):  # Increased to 15 steps for more thorough handling
             # Show attempt number if we've had to retry
             attempt_info = f" [Attempt {captcha_solve_attempts + 1}/{max_captcha_attempts}]" if captcha_solve_attempts > 0 else ""
-            print(f"\n🔍 Step {step + 1}{attempt_info}: Checking for elements to interact with...")
+            self.log.info(f"\n🔍 Step {step + 1}{attempt_info}: Checking for elements to interact with...")
+            
+            # One round trip for everything this step looks at
+            snapshot = await take_snapshot(page)
+            if snapshot is None:
+                await asyncio.sleep(2)
+                continue
             
             # Check for certificate button (DON'T click - certificate auto-injected)
-            if not cert_button_clicked:
-                try:
-                    cert_button = page.locator('#login-certificate')
-                    if await cert_button.is_visible(timeout=2000):
-                        print("   ℹ️ Certificate button detected - SKIPPING")
-                        print("   💡 Certificate auto-injected via Browser.addCertificate")
-                        print("   💡 Using regular login flow with automatic certificate")
-                        cert_button_clicked = True  # Mark as handled
-                        # Don't click it - let certificate work automatically
-                        continue
-                except Exception as e:
-                    print(f"   ⚠️ Error checking certificate button: {e}")
-                    pass
+            if not cert_button_clicked and snapshot.cert_button_visible:
+                self.log.info("   ℹ️ Certificate button detected - SKIPPING")
+                self.log.info("   💡 Certificate auto-injected via Browser.addCertificate")
+                self.log.info("   💡 Using regular login flow with automatic certificate")
+                cert_button_clicked = True  # Mark as handled
+                # Don't click it - let certificate work automatically
+                continue
             
-            # Check for captcha iframe with multiple methods
-            captcha_detected = False
+            # Check for captcha iframe (src or title mentions hcaptcha, and visible)
+            captcha_detected = snapshot.captcha_visible
             try:
-                # Method 1: Standard hCaptcha iframe
-                captcha_iframe = page.locator('iframe[src*="hcaptcha"]')
-                if await captcha_iframe.count() > 0 and await captcha_iframe.first.is_visible(timeout=1000):
-                    captcha_detected = True
-                
-                # Method 2: Any iframe with hcaptcha in attributes
-                if not captcha_detected:
-                    all_iframes = page.locator('iframe')
-                    iframe_count = await all_iframes.count()
-                    for i in range(iframe_count):
-                        iframe = all_iframes.nth(i)
-                        src = await iframe.get_attribute('src') or ''
-                        title = await iframe.get_attribute('title') or ''
-                        if ('hcaptcha' in src.lower() or 'hcaptcha' in title.lower()) and await iframe.is_visible():
-                            captcha_detected = True
-                            break
-                
                 if captcha_detected and captcha_solve_attempts < max_captcha_attempts:
+                    self.state.timer.stop('captcha_detection')
                     captcha_solve_attempts += 1
-                    print(f"   🤖 Found hCaptcha - solving (attempt {captcha_solve_attempts}/{max_captcha_attempts})...")
-                    
+                    self.log.info(f"   🤖 Found hCaptcha - solving (attempt {captcha_solve_attempts}/{max_captcha_attempts})...")
+
+                    # A solve started when the captcha frame attached is consumed by the first attempt only
+                    early_solve, self.state.solve_task = self.state.solve_task, None
+                    # From here on solves happen in this loop; widget reloads must not start another
+                    self.state.early_solve_started = True
+
                     # Extract enterprise config BEFORE solving
-                    await asyncio.sleep(1)
+                    if early_solve is None:
+                        await asyncio.sleep(1)
                     captcha_config = await self.extract_captcha_config(page)
+
+                    if self.state.token_capture is not None:
+                        # Push mode: the page binding reports the token - only forget older ones
+                        # (an early solve may already have delivered this attempt's token)
+                        if early_solve is None:
+                            self.state.token_capture.reset()
+                    else:
+                        # 🚨 CRITICAL: Set up token observer BEFORE solving
+                        self.log.info("   🔍 Setting up token observer to catch token during solve...")
+                        await call_helper(page, 'watchToken')
                     
-                    # 🚨 CRITICAL: Set up token observer BEFORE solving
-                    print("   🔍 Setting up token observer to catch token during solve...")
-                    await page.evaluate("""
-                        () => {
-                            window.__captcha_token_captured = null;
-                            window.__token_observer_active = true;
-                            
-                            // Method 0: Intercept hCaptcha callback
-                            if (window.hcaptcha) {
-                                const originalSetResponse = window.hcaptcha.setResponse || (() => {});
-                                window.hcaptcha.setResponse = function(widgetId, token) {
-                                    if (token && token.length > 1000) {
-                                        console.log('🎯 TOKEN CAPTURED from hcaptcha.setResponse:', token.length, 'chars');
-                                        window.__captcha_token_captured = token;
-                                        window.__token_observer_active = false;
-                                    }
-                                    return originalSetResponse.apply(this, arguments);
-                                };
-                            }
-                            
-                            // Method 1: MutationObserver on textarea
-                            const observer = new MutationObserver(() => {
-                                if (!window.__token_observer_active) return;
-                                const textarea = document.querySelector('textarea[name="h-captcha-response"]');
-                                if (textarea && textarea.value && textarea.value.length > 1000) {
-                                    console.log('🎯 TOKEN CAPTURED from textarea:', textarea.value.length, 'chars');
-                                    window.__captcha_token_captured = textarea.value;
-                                    window.__token_observer_active = false;
-                                }
-                            });
-                            observer.observe(document.body, { 
-                                childList: true, 
-                                subtree: true, 
-                                attributes: true,
-                                attributeFilter: ['value']
-                            });
-                            
-                            // Method 2: Poll for token every 100ms
-                            const pollInterval = setInterval(() => {
-                                if (!window.__token_observer_active) {
-                                    clearInterval(pollInterval);
-                                    return;
-                                }
-                                
-                                // Check textarea
-                                const textarea = document.querySelector('textarea[name="h-captcha-response"]');
-                                if (textarea && textarea.value && textarea.value.length > 1000) {
-                                    console.log('🎯 TOKEN CAPTURED (poll):', textarea.value.length, 'chars');
-                                    window.__captcha_token_captured = textarea.value;
-                                    window.__token_observer_active = false;
-                                    clearInterval(pollInterval);
-                                    return;
-                                }
-                                
-                                // Check hCaptcha API
-                                if (window.hcaptcha && window.hcaptcha.getResponse) {
-                                    try {
-                                        const token = window.hcaptcha.getResponse();
-                                        if (token && token.length > 1000) {
-                                            console.log('🎯 TOKEN CAPTURED from API (poll):', token.length, 'chars');
-                                            window.__captcha_token_captured = token;
-                                            window.__token_observer_active = false;
-                                            clearInterval(pollInterval);
-                                        }
-                                    } catch(e) {}
-                                }
-                            }, 100);
-                            
-                            console.log('✅ Token observer activated (3 methods)');
-                        }
-                    """)
-                    
-                    # Give Bright Data some time to detect the captcha
-                    await asyncio.sleep(2)
-                    
-                    success = await captcha_solver.solve_with_retry(max_retries=2)
+                    # A solved token that never reached the server is still good - don't pay for another
+                    reused = self.token_manager.fresh() if TOKEN_REUSE and early_solve is None else None
+                    solved_at = None
+                    if reused is not None:
+                        self.log.info(f"   ♻️ Reusing unsubmitted token from {reused.source} "
+                                      f"(age {reused.age:.1f}s) - skipping Captcha.waitForSolve")
+                        success = True
+                        solved_at = reused.solved_at
+                    elif early_solve is not None:
+                        self.log.info("   ⚡ Joining the solve started when the captcha frame attached...")
+                        try:
+                            success = await early_solve
+                        except Exception as e:
+                            self.log.warning(f"   ⚠️ Early solve failed: {e}")
+                            success = False
+                        solved_at = self.state.solve_finished_at
+                    else:
+                        # Give Bright Data some time to detect the captcha
+                        await asyncio.sleep(2)
+                        
+                        with self.state.timer.span('solve'):
+                            success = await captcha_solver.solve_with_retry(max_retries=2)
                     if success:
-                        print("   ✅ Captcha solved, waiting for token...")
+                        self.log.info("   ✅ Captcha solved, waiting for token...")
+                        self.state.token_solved_at = solved_at or time.monotonic()
+                        self.state.timer.start('token_capture')
                         
-                        # CRITICAL: Increased wait time for hCaptcha backend validation
-                        print(f"   ⏳ Waiting {CAPTCHA_POST_SOLVE_WAIT} seconds for hCaptcha to fully validate token on their servers...")
-                        await asyncio.sleep(CAPTCHA_POST_SOLVE_WAIT)  # Configurable from .env
-                        print("   ✅ Validation period complete")
+                        if self.adaptive_waits or reused is not None:
+                            # The token-age gate on the first POST replaces the fixed validation wait
+                            self.log.info("   ⏱️ Adaptive waits: token age will be gated at submission time")
+                        else:
+                            # CRITICAL: Increased wait time for hCaptcha backend validation
+                            self.log.info(f"   ⏳ Waiting {CAPTCHA_POST_SOLVE_WAIT} seconds for hCaptcha to fully validate token on their servers...")
+                            await asyncio.sleep(CAPTCHA_POST_SOLVE_WAIT)  # Configurable from .env
+                            self.log.info("   ✅ Validation period complete")
                         
-                        # CRITICAL: Wait for Bright Data to attempt auto-submit (which we'll block and capture)
-                        print("   ⏳ Waiting for auto-submit attempt (which we'll block)...")
-                        await asyncio.sleep(5)  # Additional wait for token propagation
+                        if reused is not None:
+                            captured = None
+                        elif self.state.token_capture is not None:
+                            # Resolves the moment the page pushes the token; AUTO_SUBMIT_WAIT is only the upper bound
+                            captured = await self.state.token_capture.wait(AUTO_SUBMIT_WAIT)
+                        else:
+                            captured = None
+                            # CRITICAL: Wait for Bright Data to attempt auto-submit (which we'll block and capture)
+                            self.log.info("   ⏳ Waiting for auto-submit attempt (which we'll block)...")
+                            await asyncio.sleep(AUTO_SUBMIT_WAIT)  # Additional wait for token propagation
                         
+                        # PRIORITY 0: Token kept from an earlier solve
+                        if reused is not None:
+                            token = {'source': f"reused-{reused.source}", 'token': reused.token}
                         # PRIORITY 1: Check if we captured token from blocked POST request
-                        if self.captured_token_from_request and len(self.captured_token_from_request) > 1000:
-                            print(f"   🎯 Using token captured from blocked POST request! (length: {len(self.captured_token_from_request)})")
-                            token = {'source': 'blocked-request', 'token': self.captured_token_from_request}
+                        elif self.state.captured_token_from_request and len(self.state.captured_token_from_request) > 1000:
+                            self.log.info(f"   🎯 Using token captured from blocked POST request! (length: {len(self.state.captured_token_from_request)})")
+                            token = {'source': 'blocked-request', 'token': self.state.captured_token_from_request}
+                        elif captured is not None:
+                            self.log.info(f"   🎯 Token pushed via {captured.source} (length: {len(captured.token)})")
+                            token = {'source': captured.source, 'token': captured.token}
                         # PRIORITY 2: Check if our observer caught the token
                         else:
-                            print("   🔍 Checking if token observer captured token...")
-                            captured_token = await page.evaluate("() => window.__captcha_token_captured")
+                            self.log.info("   🔍 Checking if token observer captured token...")
+                            captured_token = await call_helper(page, 'capturedToken')
                             
                             if captured_token and len(captured_token) > 1000:
-                                print(f"   🎯 TOKEN CAPTURED BY OBSERVER! (length: {len(captured_token)})")
+                                self.log.info(f"   🎯 TOKEN CAPTURED BY OBSERVER! (length: {len(captured_token)})")
                                 token = {'source': 'observer', 'token': captured_token}
                             # PRIORITY 3: Try direct extraction from hCaptcha API
                             else:
-                                print("   ⏳ Token not captured yet, trying direct API extraction...")
+                                self.log.info("   ⏳ Token not captured yet, trying direct API extraction...")
                                 await asyncio.sleep(2)
                                 
                                 # Try to get token directly from hCaptcha API
-                                api_token = await page.evaluate("""
-                                    () => {
-                                        if (window.hcaptcha && window.hcaptcha.getResponse) {
-                                            try {
-                                                const token = window.hcaptcha.getResponse();
-                                                if (token && token.length > 1000) {
-                                                    return token;
-                                                }
-                                            } catch(e) {
-                                                console.error('Failed to get hcaptcha response:', e);
-                                            }
-                                        }
-                                        return null;
-                                    }
-                                """)
+                                api_token = await call_helper(page, 'apiToken')
                                 
                                 if api_token and len(api_token) > 1000:
-                                    print(f"   🎯 TOKEN EXTRACTED from hCaptcha API! (length: {len(api_token)})")
+                                    self.log.info(f"   🎯 TOKEN EXTRACTED from hCaptcha API! (length: {len(api_token)})")
                                     token = {'source': 'hcaptcha-api', 'token': api_token}
                                 # PRIORITY 4: Try all textareas
                                 else:
-                                    print("   🔍 Attempting to retrieve token from page textareas...")
+                                    self.log.info("   🔍 Attempting to retrieve token from page textareas...")
                                     await asyncio.sleep(1)
                                     
-                                    token = await page.evaluate("""
-                                    () => {
-                                        // Check captured token first
-                                        if (window.__captcha_token_captured && window.__captcha_token_captured.length > 1000) {
-                                            return { source: 'observer-delayed', token: window.__captcha_token_captured };
-                                        }
-                                        
-                                        // Method 1: hCaptcha API
-                                        if (window.hcaptcha && window.hcaptcha.getResponse) {
-                                            try {
-                                                const token = window.hcaptcha.getResponse();
-                                                if (token && token.length > 100) {
-                                                    return { source: 'hcaptcha.getResponse', token: token };
-                                                }
-                                            } catch(e) {}
-                                        }
-                                        
-                                        // Method 2: Textarea
-                                        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
-                                        if (textarea && textarea.value && textarea.value.length > 100) {
-                                        return { source: 'textarea', token: textarea.value };
-                                    }
-                                    
-                                    // Method 3: All textareas (in case of dynamic creation)
-                                const allTextareas = document.querySelectorAll('textarea');
-                                for (const ta of allTextareas) {
-                                    if (ta.value && ta.value.length > 1000 && ta.value.startsWith('P')) {
-                                        return { source: 'textarea-search', token: ta.value };
-                                    }
-                                }
-                                
-                                return { source: 'none', token: null };
-                            }
-                        """)
+                                    token = await call_helper(page, 'searchToken')
                         
+                        self.state.timer.stop('token_capture')
+                        self.state.timer.start('injection')
                         if token and token.get('token'):
-                            print(f"   ✅ Found token via {token['source']} (length: {len(token['token'])})")
+                            self.log.info(f"   ✅ Found token via {token['source']} (length: {len(token['token'])})")
+                            self.token_manager.add(token['token'], token['source'], solved_at=self.state.token_solved_at)
                             
                             # ALWAYS inject the captured token (it was consumed by blocked auto-submit)
-                            print("   💉 Re-injecting captured token into textarea...")
+                            self.log.info("   💉 Re-injecting captured token into textarea...")
                             injection_success = await self.inject_captcha_token(page, token['token'])
                             
                             if injection_success:
-                                print("   ✅ Token injection successful")
+                                self.log.info("   ✅ Token injection successful")
                             else:
-                                print("   ⚠️ Initial injection failed, will retry...")
+                                self.log.warning("   ⚠️ Initial injection failed, will retry...")
                             
                             await asyncio.sleep(2)
                         else:
-                            print(f"   ⚠️ No token found in page (tried multiple methods)")
+                            self.log.warning(f"   ⚠️ No token found in page (tried multiple methods)")
                         
                         # Final verification
-                        print("   🔍 Final token verification...")
-                        token_len = await page.evaluate("() => document.querySelector('textarea[name=\"h-captcha-response\"]')?.value.length || 0")
-                        print(f"   📏 Token length in textarea: {token_len}")
+                        self.log.info("   🔍 Final token verification...")
+                        token_len = await call_helper(page, 'tokenLength')
+                        self.log.info(f"   📏 Token length in textarea: {token_len}")
                         
                         # 🚨 CRITICAL: Check if token is valid before allowing submission
                         # Note: Some tokens might be shorter but still valid
                         if token_len > 1500:  # Lowered threshold to accept captured tokens
-                            print(f"   ✅ TOKEN DETECTED ({token_len} chars)")
+                            self.log.info(f"   ✅ TOKEN DETECTED ({token_len} chars)")
                             if token_len < 3000:
-                                print(f"   ⚠️ Token is shorter than expected, but will try anyway")
-                            print("   🟢 Enabling form submission - POST requests now allowed")
-                            self.ready_to_submit = True
-                            if self.blocked_requests:
-                                print(f"   📊 Blocked {len(self.blocked_requests)} premature auto-submit attempts")
+                                self.log.warning(f"   ⚠️ Token is shorter than expected, but will try anyway")
+                            self.log.info("   🟢 Enabling form submission - POST requests now allowed")
+                            self.state.ready_to_submit = True
+                            if self.state.blocked_requests:
+                                self.log.info(f"   📊 Blocked {len(self.state.blocked_requests)} premature auto-submit attempts")
                         else:
-                            print(f"   ⚠️ Token too short ({token_len} chars) - NOT enabling submission yet")
+                            self.log.warning(f"   ⚠️ Token too short ({token_len} chars) - NOT enabling submission yet")
                             
                             # 🔥 CRITICAL FIX: If we have captured token, try MULTIPLE injection attempts
                             if token and token.get('token') and len(token['token']) > 1500:
-                                print(f"   🔄 Have valid captured token ({len(token['token'])} chars)")
-                                print(f"   🔥 Attempting aggressive re-injection (3 attempts)...")
+                                self.log.info(f"   🔄 Have valid captured token ({len(token['token'])} chars)")
+                                self.log.info(f"   🔥 Attempting aggressive re-injection (3 attempts)...")
                                 
                                 for retry in range(3):
-                                    print(f"   💉 Injection attempt {retry + 1}/3...")
+                                    self.log.info(f"   💉 Injection attempt {retry + 1}/3...")
                                     await self.inject_captcha_token(page, token['token'])
                                     await asyncio.sleep(1.5)
                                     
-                                    token_len = await page.evaluate("() => document.querySelector('textarea[name=\"h-captcha-response\"]')?.value.length || 0")
+                                    token_len = await call_helper(page, 'tokenLength')
                                     if token_len > 1500:
-                                        print(f"   ✅ Token successfully injected ({token_len} chars) on attempt {retry + 1}")
-                                        self.ready_to_submit = True
-                                        if self.blocked_requests:
-                                            print(f"   📊 Blocked {len(self.blocked_requests)} premature auto-submit attempts")
+                                        self.log.info(f"   ✅ Token successfully injected ({token_len} chars) on attempt {retry + 1}")
+                                        self.state.ready_to_submit = True
+                                        if self.state.blocked_requests:
+                                            self.log.info(f"   📊 Blocked {len(self.state.blocked_requests)} premature auto-submit attempts")
                                         break
                                     else:
-                                        print(f"   ⚠️ Attempt {retry + 1} failed (got {token_len} chars)")
+                                        self.log.warning(f"   ⚠️ Attempt {retry + 1} failed (got {token_len} chars)")
                                         
                                 if token_len <= 1500:
-                                    print(f"   ❌ All injection attempts failed - token still not in textarea")
-                                    print(f"   🔄 Will reset widget and try fresh solve...")
+                                    self.log.error(f"   ❌ All injection attempts failed - token still not in textarea")
+                                    self.log.info(f"   🔄 Will reset widget and try fresh solve...")
                         
                         # Additional wait for token to fully settle
                         await asyncio.sleep(1)
                         
                         # Verify token and form state before submission
-                        print("   🔍 Verifying form state before submission...")
+                        # Form fields were awaited in parallel with the solve - join that wait here
+                        await self._join_form_ready()
+                        self.log.info("   🔍 Verifying form state before submission...")
                         token_ready = await self.verify_token_ready(page)
+                        self.state.timer.stop('injection')
                         
                         if not token_ready:
                             # Check if we have a captured token but it's just not injecting properly
                             has_captured_token = (token and token.get('token') and len(token.get('token', '')) > 1500)
                             
                             if has_captured_token and token_len <= 1500:
-                                print("   ⚠️ Form not ready - have valid token but injection failing")
-                                print("   � BYPASSING textarea - will submit form directly with captured token!")
+                                self.log.warning("   ⚠️ Form not ready - have valid token but injection failing")
+                                self.log.info("   � BYPASSING textarea - will submit form directly with captured token!")
                                 
                                 # Get form data
-                                form_data = await page.evaluate("""
-                                    () => {
-                                        const form = document.querySelector('form');
-                                        if (!form) return null;
-                                        
-                                        const data = {};
-                                        const formData = new FormData(form);
-                                        for (let [key, value] of formData.entries()) {
-                                            data[key] = value;
-                                        }
-                                        
-                                        // Get CSRF token
-                                        const csrfInput = form.querySelector('input[name="_csrf"], input[name="csrf_token"]');
-                                        if (csrfInput) data['_csrf'] = csrfInput.value;
-                                        
-                                        return {
-                                            action: form.action,
-                                            method: form.method,
-                                            data: data
-                                        };
-                                    }
-                                """)
+                                form_data = await call_helper(page, 'formData')
                                 
                                 if form_data and form_data.get('action'):
-                                    print(f"   📋 Form action: {form_data['action']}")
-                                    print(f"   📦 Adding captured token to form data...")
+                                    self.log.info(f"   📋 Form action: {form_data['action']}")
+                                    self.log.info(f"   📦 Adding captured token to form data...")
                                     
                                     # Submit using JavaScript to bypass textarea requirement
-                                    submit_result = await page.evaluate("""
-                                        (tokenValue) => {
-                                            const form = document.querySelector('form');
-                                            if (!form) return { success: false, error: 'No form found' };
-                                            
-                                            // Ensure token textarea exists
-                                            let textarea = form.querySelector('textarea[name="h-captcha-response"]');
-                                            if (!textarea) {
-                                                textarea = document.createElement('textarea');
-                                                textarea.name = 'h-captcha-response';
-                                                textarea.style.display = 'none';
-                                                form.appendChild(textarea);
-                                            }
-                                            textarea.value = tokenValue;
-                                            
-                                            console.log('🚀 Submitting form with token:', tokenValue.length, 'chars');
-                                            
-                                            // Find and click submit button
-                                            const submitBtn = form.querySelector('button[type="submit"], input[type="submit"]');
-                                            if (submitBtn) {
-                                                submitBtn.click();
-                                                return { success: true, method: 'button-click' };
-                                            }
-                                            
-                                            // Fallback: trigger form submit
-                                            form.submit();
-                                            return { success: true, method: 'form-submit' };
-                                        }
-                                    """, token['token'])
+                                    submit_result = await call_helper(page, 'bypassSubmit', token['token'])
                                     
                                     if submit_result.get('success'):
-                                        print(f"   ✅ Form submitted via {submit_result['method']}!")
-                                        print("   ⏳ Waiting for navigation...")
+                                        self.log.info(f"   ✅ Form submitted via {submit_result['method']}!")
+                                        self.log.info("   ⏳ Waiting for navigation...")
                                         await asyncio.sleep(5)
                                         return  # Exit this attempt
                                     else:
-                                        print(f"   ❌ Form submission failed: {submit_result.get('error')}")
+                                        self.log.error(f"   ❌ Form submission failed: {submit_result.get('error')}")
                                 else:
-                                    print("   ❌ Could not get form data")
+                                    self.log.error("   ❌ Could not get form data")
                                 
-                                print("   �🔄 Fallback: Resetting widget and retrying...")
+                                self.log.info("   �🔄 Fallback: Resetting widget and retrying...")
                                 await self.reset_captcha_widget(page)
                                 captcha_solve_attempts -= 1  # Don't count this as a failed attempt
                                 await asyncio.sleep(2)
                                 continue
                             else:
-                                print("   ⚠️ Form not ready - missing token, CSRF, or authorization_id")
-                                print("   🔄 Resetting widget and retrying...")
+                                self.log.warning("   ⚠️ Form not ready - missing token, CSRF, or authorization_id")
+                                self.log.info("   🔄 Resetting widget and retrying...")
                                 await self.reset_captcha_widget(page)
                                 captcha_solve_attempts -= 1  # Don't count this as a failed attempt
                                 await asyncio.sleep(2)
                                 continue
                         
+                        # A token this close to expiry would only earn a "Captcha inválido" round trip
+                        if token and token.get('token') and self.token_manager.is_expiring(token['token']):
+                            remaining = self.token_manager.remaining(token['token'])
+                            self.log.warning(f"   ⚠️ Token has only {remaining:.0f}s of validity left - solving a fresh one")
+                            self.token_manager.mark_rejected(token['token'])
+                            await self.reset_captcha_widget(page)
+                            captcha_solve_attempts -= 1  # Don't count this as a failed attempt
+                            continue
+                        
+                        if SUBMIT_MODE == "http":
+                            submission = await self._submit_via_http(page, token.get('token') if token else None)
+                            if submission.outcome == SUBMIT_ACCEPTED:
+                                return True
+                            if submission.outcome == SUBMIT_CAPTCHA_REJECTED:
+                                if captcha_solve_attempts < max_captcha_attempts:
+                                    # The reply carried a new form (fresh _csrf) - load it and solve again
+                                    await page.goto(self.target_url, wait_until='domcontentloaded', timeout=30000)
+                                    continue
+                                self.log.error(f"   ❌ Max captcha attempts ({max_captcha_attempts}) reached")
+                                self.state.failure_class = FAILURE_CAPTCHA_REJECTED
+                                return False
+                            if submission.outcome == SUBMIT_CERTIFICATE_NOT_FOUND:
+                                self.state.failure_class = FAILURE_CERTIFICATE_NOT_RECOGNIZED
+                                return False
+                            if submission.outcome != SUBMIT_NOT_SENT:
+                                # Answered but not recognised - show it in the browser and let the loop look
+                                await page.goto(submission.url or self.target_url, wait_until='domcontentloaded', timeout=30000)
+                                continue
+                            self.log.info("   ↩️ Falling back to clicking the submit button")
+                        
                         # CRITICAL: Click submit button (don't use form.submit() - it bypasses handlers)
-                        print("   � Submitting form with verified token...")
+                        self.log.info("   � Submitting form with verified token...")
                         
+                        self.state.timer.start('submit')
                         try:
                             # Look for submit button
                             submit_selectors = [
@@ -803,52 +827,55 @@ class BrightDataFullAutomation:
                                 try:
                                     btn = page.locator(selector).first
                                     if await btn.is_visible(timeout=2000):
-                                        print(f"   🔘 Clicking submit button: {selector}")
+                                        self.log.info(f"   🔘 Clicking submit button: {selector}")
                                         
                                         # Click and wait for navigation or response
                                         async with page.expect_response(lambda r: 'login' in r.url or 'certificado' in r.url, timeout=15000) as response_info:
                                             await btn.click()
                                         
                                         response = await response_info.value
-                                        print(f"   � Response status: {response.status}")
+                                        self.log.info(f"   � Response status: {response.status}")
                                         
                                         if response.status == 400:
                                             body_text = await response.text()
                                             if 'captcha' in body_text.lower() and 'inválido' in body_text.lower():
-                                                print("   🚨 Server rejected captcha (400 Bad Request)")
+                                                self.log.warning("   🚨 Server rejected captcha (400 Bad Request)")
                                                 submitted = False
                                                 break
                                         
                                         submitted = True
-                                        print(f"   ✅ Form submitted successfully")
+                                        self.log.info(f"   ✅ Form submitted successfully")
                                         break
                                 except Exception as e:
                                     pass
                             
                             if not submitted:
-                                print("   ⚠️ Could not find or click submit button")
+                                self.log.warning("   ⚠️ Could not find or click submit button")
                                 # Don't force form.submit() - it will fail
                             
                         except Exception as e:
-                            print(f"   ⚠️ Submission error: {e}")
+                            self.log.warning(f"   ⚠️ Submission error: {e}")
+                        self.state.timer.stop('submit')
                         
                         # Wait for server to process
-                        print("   ⏳ Waiting for server validation...")
-                        await asyncio.sleep(4)
-                        
-                        # Check result
-                        page_text = await page.evaluate("() => document.body.innerText")
-                        current_url = page.url
+                        self.log.info("   ⏳ Waiting for server validation...")
+                        with self.state.timer.span('redirect'):
+                            await asyncio.sleep(SERVER_VALIDATION_WAIT)
+                            
+                            # Check result
+                            result = await take_snapshot(page)
+                        if result is None:
+                            continue
                         
                         # Success check
-                        if 'login' not in current_url.lower() or any(kw in page_text.lower() for kw in ['bem-vindo', 'sucesso', 'autenticado']):
-                            print(f"   🎉 Authentication succeeded!")
-                            print(f"   📍 URL: {current_url}")
+                        if 'login' not in result.url.lower() or any(kw in result.success_keywords for kw in ['bem-vindo', 'sucesso', 'autenticado']):
+                            self.log.info(f"   🎉 Authentication succeeded!")
+                            self.log.info(f"   📍 URL: {result.url}")
                             continue
                         
                         # Check for captcha invalid
-                        if 'Captcha inválido' in page_text or 'captcha inválido' in page_text:
-                            print("   ⚠️ 'Captcha inválido' - resetting widget and retrying...")
+                        if result.captcha_invalid:
+                            self.log.warning("   ⚠️ 'Captcha inválido' - resetting widget and retrying...")
                             
                             if captcha_solve_attempts < max_captcha_attempts:
                                 # Reset widget in-place (no page reload)
@@ -856,386 +883,590 @@ class BrightDataFullAutomation:
                                 await asyncio.sleep(2)
                                 continue
                             else:
-                                print(f"   ❌ Max captcha attempts ({max_captcha_attempts}) reached")
+                                self.log.error(f"   ❌ Max captcha attempts ({max_captcha_attempts}) reached")
+                                self.state.failure_class = FAILURE_CAPTCHA_REJECTED
                                 return False
                         else:
-                            print("   ✅ No error detected - captcha accepted")
+                            self.log.info("   ✅ No error detected - captcha accepted")
                         
                         continue
                     else:
-                        print("   ⚠️ Captcha solve failed")
+                        self.log.warning("   ⚠️ Captcha solve failed")
                         if captcha_solve_attempts < max_captcha_attempts:
-                            print(f"   🔄 Will retry if captcha appears again...")
+                            self.log.info(f"   🔄 Will retry if captcha appears again...")
                             await asyncio.sleep(3)
                             continue
                         else:
+                            self.state.failure_class = FAILURE_CAPTCHA_UNSOLVED
                             return False
             except Exception as e:
-                print(f"   ⚠️ Error during captcha detection: {e}")
+                self.log.warning(f"   ⚠️ Error during captcha detection: {e}")
                 pass
             
             # Check for any certificate selection dialog or error messages
             try:
-                page_text = await page.evaluate("() => document.body.innerText")
-                
                 # Check for captcha invalid message (without recent solve)
-                if 'Captcha inválido' in page_text or 'captcha inválido' in page_text:
+                if snapshot.captcha_invalid:
                     # Only handle if we're not already in a solve loop
                     if captcha_solve_attempts == 0 or step > 5:
-                        print("   ⚠️ 'Captcha inválido' message detected outside solve loop")
-                        print("   🔄 Resetting widget to retry...")
+                        self.log.warning("   ⚠️ 'Captcha inválido' message detected outside solve loop")
+                        self.log.info("   🔄 Resetting widget to retry...")
                         await self.reset_captcha_widget(page)
                         await asyncio.sleep(2)
                         continue
                 
                 # Check for certificate selection dialog or submit button after captcha
-                if 'certificado' in page_text.lower():
+                if snapshot.mentions_certificate:
                     # Look for "Selecione" dialog
-                    if 'selecione' in page_text.lower():
-                        print("   📜 Certificate selection dialog detected")
+                    if snapshot.certificate_selection:
+                        self.log.info("   📜 Certificate selection dialog detected")
                         try:
-                            cert_options = page.locator('button, input[type="submit"], a').filter(has_text='certificado')
-                            if await cert_options.count() > 0:
-                                await cert_options.first.click()
+                            cert_options = snapshot.buttons_with_text('certificado')
+                            if cert_options:
+                                await button_locator(page, cert_options[0]).click()
                                 await asyncio.sleep(3)
                                 continue
                         except Exception as e:
-                            print(f"   ⚠️ Error clicking certificate option: {e}")
+                            self.log.warning(f"   ⚠️ Error clicking certificate option: {e}")
                             pass
                     
                     # Look for submit/continue button after captcha solve
                     # 🚨 ONLY click if we have verified token and enabled submission
                     try:
-                        # Common button texts after captcha
-                        submit_buttons = [
-                            page.locator('button:has-text("Continuar")'),
-                            page.locator('button:has-text("Entrar")'),
-                            page.locator('button:has-text("Enviar")'),
-                            page.locator('input[type="submit"]'),
-                            page.locator('button[type="submit"]'),
-                        ]
+                        # Common button texts after captcha, then plain submit inputs/buttons
+                        submit_button = snapshot.find_button(
+                            texts=['Continuar', 'Entrar', 'Enviar'],
+                            types=['submit'],
+                        )
                         
-                        for btn_locator in submit_buttons:
-                            if await btn_locator.count() > 0 and await btn_locator.first.is_visible():
-                                btn_text = await btn_locator.first.text_content() or 'submit'
-                                
-                                # Check if we have a valid token before clicking
-                                if self.ready_to_submit:
-                                    print(f"   🔘 Found submit button: '{btn_text}' - clicking (submission enabled)...")
-                                    await btn_locator.first.click()
-                                    print(f"   ✅ Clicked, waiting for response...")
-                                    await asyncio.sleep(5)
-                                    continue
-                                else:
-                                    print(f"   ⏸️ Found submit button: '{btn_text}' - WAITING for token verification...")
+                        if submit_button:
+                            btn_text = submit_button.text or 'submit'
+                            
+                            # Check if we have a valid token before clicking
+                            if self.state.ready_to_submit:
+                                self.log.info(f"   🔘 Found submit button: '{btn_text}' - clicking (submission enabled)...")
+                                await button_locator(page, submit_button).click()
+                                self.log.info(f"   ✅ Clicked, waiting for response...")
+                                await asyncio.sleep(5)
+                                continue
+                            else:
+                                self.log.info(f"   ⏸️ Found submit button: '{btn_text}' - WAITING for token verification...")
                     except Exception as e:
-                        print(f"   ⚠️ Error checking submit buttons: {e}")
+                        self.log.warning(f"   ⚠️ Error checking submit buttons: {e}")
                         pass
                 
                 # Check if we're back at CPF login (certificate auth failed)
-                if 'digite seu cpf' in page_text.lower() or 'número do cpf' in page_text.lower():
-                    print("   ⚠️ Back at CPF login page - certificate authentication may not have completed")
+                if snapshot.cpf_login:
+                    self.log.warning("   ⚠️ Back at CPF login page - certificate authentication may not have completed")
                     
                     # Check if there are any certificate-related buttons/links we missed
                     try:
                         # Look for certificate login link again
-                        cert_links = page.locator('a:has-text("certificado"), button:has-text("certificado")')
-                        cert_count = await cert_links.count()
+                        cert_links = [b for b in snapshot.buttons_with_text('certificado') if b.tag in ('a', 'button')]
                         
-                        if cert_count > 0:
-                            print(f"   🔍 Found {cert_count} certificate-related element(s)")
-                            for i in range(cert_count):
-                                link = cert_links.nth(i)
-                                text = await link.text_content()
-                                is_visible = await link.is_visible()
-                                print(f"      Element {i}: '{text.strip()}' (visible: {is_visible})")
+                        if cert_links:
+                            self.log.info(f"   🔍 Found {len(cert_links)} visible certificate-related element(s)")
+                            for i, link in enumerate(cert_links):
+                                self.log.info(f"      Element {i}: '{link.text}'")
                             
                             # Try clicking the "Seu certificado digital" link again if visible
-                            cert_digital = page.locator('a:has-text("Seu certificado digital"), button:has-text("Seu certificado digital")')
-                            if await cert_digital.count() > 0 and await cert_digital.first.is_visible():
-                                print("   🔄 Clicking 'Seu certificado digital' again...")
-                                await cert_digital.first.click()
+                            cert_digital = [b for b in cert_links if b.has_text('Seu certificado digital')]
+                            if cert_digital:
+                                self.log.info("   🔄 Clicking 'Seu certificado digital' again...")
+                                await button_locator(page, cert_digital[0]).click()
                                 await asyncio.sleep(3)
                                 continue
                     except Exception as e:
-                        print(f"   ⚠️ Error checking certificate elements: {e}")
+                        self.log.warning(f"   ⚠️ Error checking certificate elements: {e}")
                 
                 # Check for success indicators
-                success_keywords = ['sucesso', 'bem-vindo', 'dashboard', 'autenticado', 'logado']
-                if any(keyword in page_text.lower() for keyword in success_keywords):
-                    print("   🎉 Success indicators found in page text!")
+                if snapshot.success_keywords:
+                    self.log.info("   🎉 Success indicators found in page text!")
                     return True
                 
                 # Check if we're on a different page (successful redirect)
-                if page.url != TARGET_URL and 'login' not in page.url.lower() and 'certificado' not in page.url.lower():
-                    print(f"   🎉 Redirected to new page: {page.url}")
+                if snapshot.url != self.target_url and 'login' not in snapshot.url.lower() and 'certificado' not in snapshot.url.lower():
+                    self.log.info(f"   🎉 Redirected to new page: {snapshot.url}")
                     return True
                 
             except Exception as e:
-                print(f"   ⚠️ Error checking page content: {e}")
+                self.log.warning(f"   ⚠️ Error checking page content: {e}")
                 pass
             
             # Check current status before waiting
-            try:
-                current_url = page.url
-                print(f"   📍 Current URL: {current_url}")
-            except:
-                pass
+            self.log.info(f"   📍 Current URL: {snapshot.url}")
             
             # Wait a bit and check again
             await asyncio.sleep(2)
         
-        print("\n   ℹ️ Reached maximum steps")
+        self.log.info("\n   ℹ️ Reached maximum steps")
         # Do a final check
         try:
-            page_text = await page.evaluate("() => document.body.innerText")
-            final_url = page.url
+            final = await take_snapshot(page)
+            if final is None:
+                # Usually a navigation in flight - look once more before giving up
+                await asyncio.sleep(1)
+                final = await take_snapshot(page)
+            if final is None:
+                self.log.warning("   ⚠️ Could not read the final page - not reporting success")
+                self.state.failure_class = FAILURE_PAGE_ERROR
+                return False
             
-            print(f"   📍 Final URL: {final_url}")
+            self.log.info(f"   📍 Final URL: {final.url}")
             
-            if 'Captcha inválido' in page_text or 'captcha inválido' in page_text:
-                print("   ❌ Still showing 'Captcha inválido'")
+            if final.captcha_invalid:
+                self.log.error("   ❌ Still showing 'Captcha inválido'")
+                self.state.failure_class = FAILURE_CAPTCHA_REJECTED
                 return False
             
             # Check if still on login page with CPF form
-            if 'digite seu cpf' in page_text.lower() and 'login' in final_url:
-                print("   ⚠️ Still on CPF login page - certificate authentication incomplete")
-                print("   💡 The certificate may need to be selected from browser or OS dialog")
+            if final.cpf_login and 'login' in final.url:
+                self.log.warning("   ⚠️ Still on CPF login page - certificate authentication incomplete")
+                self.log.info("   💡 The certificate may need to be selected from browser or OS dialog")
+                self.state.failure_class = FAILURE_CERTIFICATE_NOT_RECOGNIZED
                 return False
             
-            print("   ✅ No error messages detected")
+            self.log.info("   ✅ No error messages detected")
             return True
         except Exception as e:
-            print(f"   ⚠️ Error in final check: {e}")
+            self.log.warning(f"   ⚠️ Error in final check: {e}")
             return True
     
     async def run(self):
+        """Run the full login; returns a LoginResult (truthy on success)"""
         async with async_playwright() as playwright:
+            if HEDGE_ENABLED and not self.interactive:
+                return await run_hedged(self, playwright)
+            return await self.run_with_playwright(playwright)
+    
+    def hedge_twin(self):
+        """Independent non-interactive session with the same certificate and settings, for hedging"""
+        return BrightDataFullAutomation(
+            certificate_path=self.certificate_path,
+            certificate_password=self.certificate_password,
+            session_id=f"{self.session_id}-hedge",
+            interactive=False,
+            wait_calibrator=self.wait_calibrator,
+            adaptive_waits=self.adaptive_waits,
+            # Own browser: a shared pool may have no free slot, and that is what we are racing
+            browser_pool=None,
+            session_cache=self.session_cache,
+            certificate_registry=self.certificate_registry,
+            metrics=self.metrics,
+            target_url=self.target_url,
+            services_url=self.services_url,
+            cdp_session_factory=self.cdp_session_factory,
+        )
+    
+    async def _connect_browser(self, playwright):
+        """Lease a warm browser from the pool (or connect directly) and open a fresh page"""
+        try:
+            if self._pool is not None:
+                self._lease = await self._pool.acquire()
+                self._browser = self._lease.browser
+                context, page = await self._pool.open_page(self._lease)
+            else:
+                self._browser = await playwright.chromium.connect_over_cdp(bright_data_endpoint_url())
+                context = self._browser.contexts[0]
+                page = await context.new_page()
+        except Exception:
+            self.cdp_health.record_failure()
+            raise
+        self.cdp_health.record_success()
+        try:
+            # In-page helpers (window.__sa) parsed once per document; calls send only their name and arguments
+            await install_helpers(context)
+        except Exception as e:
+            self.log.warning(f"   ⚠️ Could not install page helpers ({e}) - they will be installed on first use")
+        return self._browser, context, page
+    
+    async def _restore_cached_session(self, context, page):
+        """Reuse a cached authenticated session for this certificate; True if it is still valid"""
+        if self.session_cache is None or self.certificate_fingerprint is None:
+            return False
+        storage_state = self.session_cache.get(self.certificate_fingerprint)
+        if storage_state is None:
+            return False
+        
+        self.log.info("⚡ Cached session found for this certificate - probing...")
+        await apply_storage_state(context, page, storage_state)
+        if not await probe_session(page):
+            self.log.warning("   ⚠️ Cached session is no longer valid - doing a full login")
+            self.session_cache.invalidate(self.certificate_fingerprint)
+            await context.clear_cookies()
+            return False
+        
+        self.log.info(f"   ✅ Session restored - skipped navigation, captcha and certificate injection")
+        self.log.info(f"   🌐 URL: {page.url}")
+        return True
+    
+    async def _save_session(self, final_url, storage_state):
+        """Store the authenticated cookies/local storage for later runs with the same certificate"""
+        if self.session_cache is None or self.certificate_fingerprint is None or storage_state is None:
+            return
+        try:
+            self.session_cache.put(self.certificate_fingerprint, storage_state, final_url)
+            self.log.info("   💾 Authenticated session cached for reuse")
+        except Exception as e:
+            self.log.warning(f"   ⚠️ Could not cache session: {e}")
+    
+    async def _release_browser(self):
+        """Return the leased browser to the pool, or close a directly connected one"""
+        lease, browser = self._lease, self._browser
+        # Background work of the pipelined flow and event handlers must not outlive the page
+        for task in (self.state.solve_task, self.state.form_ready_task, self.state.certificate_task):
+            if task is not None and not task.done():
+                task.cancel()
+        await self.state.events.close()
+        cdp_session, self.cdp_session = getattr(self, 'cdp_session', None), None
+        if isinstance(cdp_session, CDPPipeline):
+            cdp_session.log_summary()
+        self._lease = None
+        self._browser = None
+        try:
+            if lease is not None:
+                await self._pool.release(lease, discard=not lease.browser.is_connected())
+            elif browser is not None:
+                await browser.close()
+        except Exception as e:
+            self.log.warning(f"   ⚠️ Error releasing browser: {e}")
+    
+    async def run_with_playwright(self, playwright):
+        """Run the login flow on an already started Playwright driver and return a LoginResult"""
+        # Per-attempt state lives on self.state, so one instance = one session
+        if self._running:
+            raise RuntimeError("Automation instance is already running - create one instance per session")
+        self._running = True
+        session_id_var.set(self.session_id)
+        result = LoginResult(self.session_id)
+        start_time = time.monotonic()
+        own_pool = None
+        self._pool = self.browser_pool
+        if self._pool is None and BROWSER_POOL_ENABLED:
+            # Private single-browser pool so retries reuse the warm connection
+            self._pool = own_pool = CDPBrowserPool(playwright, size=1)
+        try:
             for attempt in range(3):
-                browser = None
-                # Reset submission flag for each attempt
-                self.ready_to_submit = False
-                self.blocked_requests = []
-                self.captured_token_from_request = None
-                self.form_submitted = False
-                self.first_submission_delayed = False
+                # Fresh per-attempt state (submission flags, captured token, ...)
+                self.state = LoginSessionState(self.metrics)
+                result.attempts = attempt + 1
                 
                 try:
-                    print("\n" + "="*70)
-                    print(f"🎉 FULL AUTOMATION - ATTEMPT {attempt + 1}/3 🎉")
-                    print("="*70)
-                    print("✅ Automatic hCaptcha solving (Bright Data)")
-                    print("✅ Client certificate injection (Browser.addCertificate)")
-                    print("✅ Token verification before submission (>1000 chars)")
-                    print("✅ Widget reset on failure (no page reload)")
-                    print("✅ Enterprise hCaptcha config extraction (sitekey/rqdata)")
-                    print("✅ CSRF/authorization_id validation before submit")
-                    print("✅ Native button click (no form.submit() bypass)")
-                    print("="*70 + "\n")
+                    self.log.info("\n" + "="*70)
+                    self.log.info(f"🎉 FULL AUTOMATION - ATTEMPT {attempt + 1}/3 🎉")
+                    self.log.info("="*70)
+                    self.log.info("✅ Automatic hCaptcha solving (Bright Data)")
+                    self.log.info("✅ Client certificate injection (Browser.addCertificate)")
+                    self.log.info("✅ Token verification before submission (>1000 chars)")
+                    self.log.info("✅ Widget reset on failure (no page reload)")
+                    self.log.info("✅ Enterprise hCaptcha config extraction (sitekey/rqdata)")
+                    self.log.info("✅ CSRF/authorization_id validation before submit")
+                    self.log.info("✅ Native button click (no form.submit() bypass)")
+                    self.log.info("="*70 + "\n")
                     
-                    if not os.path.exists(CERTIFICATE_PATH):
-                        print(f"❌ Certificate not found: {CERTIFICATE_PATH}")
-                        return
+                    self.log.info("📜 Loading certificate...")
+                    try:
+                        # Cached after the first load; checked locally before any browser is touched
+                        certificate = await self.certificate_registry.get(self.certificate_path, self.certificate_password)
+                    except CertificateError as e:
+                        self.log.error(f"❌ {e}")
+                        if e.reason == 'bad_password':
+                            self.log.info("💡 Check CERTIFICATE_PASSWORD in your .env file")
+                        elif e.reason in ('expired', 'not_yet_valid'):
+                            self.log.info("💡 You need to obtain a new certificate")
+                        return result.fail(FAILURE_CERTIFICATE_INVALID, f"{e.reason}: {e}")
                     
-                    print("📜 Loading certificate...")
-                    with open(CERTIFICATE_PATH, 'rb') as f:
-                        cert_data = f.read()
+                    cert_base64 = certificate.base64
+                    self.certificate_fingerprint = certificate.fingerprint
                     
-                    cert_base64 = base64.b64encode(cert_data).decode('utf-8')
+                    self.log.info(f"   ✅ Loaded: {self.certificate_path}")
+                    self.log.info(f"   Size: {certificate.size} bytes")
+                    if certificate.validated:
+                        self.log.info(f"   Subject: {certificate.subject}")
+                        self.log.info(f"   Valid until: {certificate.not_after:%Y-%m-%d}")
                     
-                    print(f"   ✅ Loaded: {CERTIFICATE_PATH}")
-                    print(f"   Size: {len(cert_data)} bytes\n")
+                    # A degraded Bright Data would only turn this login into paid failures. The
+                    # connect below is the CDP probe; the solver claims its own probe later
+                    for health, claim in ((self.captcha_health, False), (self.cdp_health, True)):
+                        if not await health.wait_until_available(CIRCUIT_MAX_WAIT, claim=claim):
+                            self.log.error(f"❌ Bright Data {health.name} circuit open for over {CIRCUIT_MAX_WAIT:g}s - not starting")
+                            return result.fail(FAILURE_UPSTREAM_UNAVAILABLE, f"{health.name} circuit open")
                     
-                    print("🌐 Connecting to Bright Data...")
-                    auth = f"{BRIGHT_DATA_USERNAME}:{BRIGHT_DATA_PASSWORD}"
-                    endpoint_url = f"wss://{auth}@brd.superproxy.io:9222"
+                    self.log.info("🌐 Connecting to Bright Data...")
+                    with self.state.timer.span('connect'):
+                        browser, context, page = await self._connect_browser(playwright)
                     
-                    browser = await playwright.chromium.connect_over_cdp(endpoint_url)
-                    context = browser.contexts[0]
-                    page = await context.new_page()
+                    if await self._restore_cached_session(context, page):
+                        result.status = STATUS_SESSION_REUSED
+                        result.final_url = page.url
+                        result.storage_state = await context.storage_state()
+                        if self.interactive:
+                            flush_logging()
+                            print("\n🔍 Browser will stay open. Press Enter to close...")
+                            input()
+                        await self._release_browser()
+                        return result
                     
-                    cdp_session = await context.new_cdp_session(page)
+                    if self.cdp_session_factory is not None:
+                        cdp_session = await self.cdp_session_factory(context, page)
+                    else:
+                        cdp_session = await context.new_cdp_session(page)
+                    # Independent setup commands (certificate, solver configuration, network) share one round trip
+                    cdp_session = CDPPipeline(cdp_session)
                     self.cdp_session = cdp_session  # Store for later use
-                    captcha_solver = BrightDataCaptchaSolver(cdp_session)
+                    # On the wire now, checked below where the flow needs the certificate
+                    certificate_task = asyncio.ensure_future(
+                        self.verify_certificate(cdp_session, cert_base64, self.certificate_password)
+                    )
+                    self.state.certificate_task = certificate_task
+                    # With adaptive waits the submission gate covers hCaptcha's validation time
+                    captcha_solver = create_captcha_solver(
+                        cdp_session,
+                        page=page,
+                        post_timeout_wait=SOLVE_TOKEN_GRACE if self.adaptive_waits else SOLVE_TIMEOUT_VALIDATION_WAIT,
+                    )
                     
                     # 🚨 Monitor form submissions (allowing them to proceed naturally)
-                    print("   🔧 Setting up request monitoring...")
-                    self.captured_token_from_request = None
-                    self.first_submission_delayed = False
+                    self.log.info("   🔧 Setting up request monitoring...")
                     
                     async def block_premature_submits(route):
                         request = route.request
+                        self.state.route_events += 1
                         
                         # Monitor POST requests
-                        if (request.method == "POST" and 
-                            any(pattern in request.url for pattern in ['/login', '/auth', '/certificado'])):
+                        if request.method == "POST" and is_submit_url(request.url):
                             
                             # Log the token being submitted
+                            token = ''
                             token_length = 0
-                            try:
-                                post_data = request.post_data
-                                if post_data:
-                                    import urllib.parse
-                                    data = urllib.parse.parse_qs(post_data)
-                                    token = data.get('h-captcha-response', [''])[0]
-                                    token_length = len(token)
-                                    if token and token_length > 1000:
-                                        # 🎯 CAPTURE the token from this request!
-                                        if not self.captured_token_from_request:
-                                            print(f"   🎯 CAPTURING token from POST request ({token_length} chars)")
-                                            self.captured_token_from_request = token
-                                        self.form_submitted = True
-                                        self.ready_to_submit = True
-                            except Exception as e:
-                                pass
+                            data = self.state.events.post_form(request)
+                            token = data.get('h-captcha-response', [''])[0]
+                            token_length = len(token)
+                            if token and token_length > 1000:
+                                # 🎯 CAPTURE the token from this request!
+                                if not self.state.captured_token_from_request:
+                                    self.log.info(f"   🎯 CAPTURING token from POST request ({token_length} chars)")
+                                    self.state.captured_token_from_request = token
+                                self.state.form_submitted = True
+                                self.state.ready_to_submit = True
                             
                             # CRITICAL: Delay first submission to allow hCaptcha server validation
-                            if not self.first_submission_delayed and token_length > 1000:
-                                print(f"   ⏸️ DELAYING first POST to allow hCaptcha backend validation...")
-                                print(f"   📤 Token length: {token_length} chars")
-                                print(f"   ⏳ Waiting {CAPTCHA_SUBMIT_DELAY} seconds for hCaptcha to validate token on their servers...")
-                                await asyncio.sleep(CAPTCHA_SUBMIT_DELAY)  # Configurable from .env
-                                self.first_submission_delayed = True
-                                print(f"   ✅ Delay complete - ALLOWING POST to {request.url.split('/')[-1]}")
+                            if not self.state.first_submission_delayed and token_length > 1000:
+                                self.log.info(f"   ⏸️ DELAYING first POST to allow hCaptcha backend validation...")
+                                self.log.info(f"   📤 Token length: {token_length} chars")
+                                if self.state.token_solved_at is None:
+                                    # Auto-submit fired before solve_with_retry returned - token is brand new
+                                    self.state.token_solved_at = time.monotonic()
+                                if self.adaptive_waits:
+                                    target_age = self.wait_calibrator.recommend_delay()
+                                    token_age = time.monotonic() - self.state.token_solved_at
+                                    remaining = max(0.0, target_age - token_age)
+                                    self.log.info(f"   ⏳ Holding until token is {target_age:.1f}s old ({remaining:.1f}s left, calibrated)")
+                                    await asyncio.sleep(remaining)
+                                else:
+                                    self.log.info(f"   ⏳ Waiting {CAPTCHA_SUBMIT_DELAY} seconds for hCaptcha to validate token on their servers...")
+                                    await asyncio.sleep(CAPTCHA_SUBMIT_DELAY)  # Configurable from .env
+                                self.state.submitted_token_age = time.monotonic() - self.state.token_solved_at
+                                self.state.first_submission_delayed = True
+                                self.log.info(f"   ✅ Delay complete - ALLOWING POST to {request.url.split('/')[-1]}")
                             elif token_length > 1000:
-                                print(f"   ✅ ALLOWING POST to {request.url.split('/')[-1]} (token: {token_length} chars)")
+                                self.log.info(f"   ✅ ALLOWING POST to {request.url.split('/')[-1]} (token: {token_length} chars)")
+                            
+                            if token_length > 1000:
+                                managed = self.token_manager.get(token)
+                                if managed is not None and self.token_manager.remaining(token) <= 0:
+                                    # The server would reject it - save the round trip
+                                    self.log.warning("   ⚠️ Token expired before submission - dropping the POST")
+                                    managed.rejected = True
+                                    await route.abort()
+                                    return
+                                # hCaptcha tokens are single use - never offer this one for reuse
+                                self.token_manager.mark_submitted(token)
                         
                         # Allow all other requests
                         await route.continue_()
                     
-                    await page.route("**/*", block_premature_submits)
-                    print("   ✅ Request monitoring active - submissions will be ALLOWED")
+                    if INTERCEPT_MODE == "all":
+                        await page.route("**/*", block_premature_submits)
+                    else:
+                        # Driver-side URL matching: only form endpoints reach Python
+                        await page.route(SUBMIT_ROUTE_REGEX, block_premature_submits)
+                    self.log.info(f"   ✅ Request monitoring active ({INTERCEPT_MODE}) - submissions will be ALLOWED")
+                    
+                    # Don't pay proxy bytes for fonts, media and trackers
+                    await apply_block_profile(page, cdp_session)
+                    
+                    if TOKEN_CAPTURE_MODE == "push":
+                        # Token is pushed to Python the moment hCaptcha sets it, on every document
+                        self.state.token_capture = TokenCapture(logger=self.log)
+                        await self.state.token_capture.install(page)
                     
                     # Set up event handlers for debugging
-                    print("   🔧 Setting up event handlers...")
+                    self.log.info("   🔧 Setting up event handlers...")
                     
                     # Handle dialogs (certificate selection, alerts, etc.)
                     async def handle_dialog(dialog):
-                        print(f"   🔔 DIALOG: type={dialog.type}, message={dialog.message}")
+                        self.log.info(f"   🔔 DIALOG: type={dialog.type}, message={dialog.message}")
                         await dialog.accept()
-                        print(f"   ✅ Dialog accepted")
+                        self.log.info(f"   ✅ Dialog accepted")
                     
                     page.on("dialog", handle_dialog)
                     
-                    # Monitor console messages
-                    page.on("console", lambda msg: print(f"   🖥️ Console [{msg.type}]: {msg.text}"))
+                    # Per-event diagnostics are only attached when DEBUG is on - when
+                    # disabled they cost nothing on the event loop
+                    verbose = debug_enabled()
+                    if verbose:
+                        # Monitor console messages
+                        page.on("console", lambda msg: self.log.debug(f"   🖥️ Console [{msg.type}]: {msg.text}"))
+                        
+                        # Monitor navigation events
+                        page.on("framenavigated", lambda frame: self.log.debug(f"   🧭 Navigation: {frame.url}") if frame == page.main_frame else None)
                     
                     # Monitor page errors
-                    page.on("pageerror", lambda err: print(f"   ❌ Page Error: {err}"))
-                    
-                    # Monitor navigation events
-                    page.on("framenavigated", lambda frame: print(f"   🧭 Navigation: {frame.url}") if frame == page.main_frame else None)
+                    page.on("pageerror", lambda err: self.log.error(f"   ❌ Page Error: {err}"))
                     
                     # Monitor failed requests
                     def handle_request_failed(request):
                         if '400' in str(request.failure) or 'failed' in str(request.failure).lower():
-                            print(f"   🚫 Request FAILED: {request.method} {request.url}")
-                            print(f"      Failure: {request.failure}")
+                            self.log.warning(f"   🚫 Request FAILED: {request.method} {request.url}")
+                            self.log.warning(f"      Failure: {request.failure}")
                     
                     page.on("requestfailed", handle_request_failed)
                     
                     # Monitor POST requests to login endpoint
                     async def handle_request(request):
-                        if request.method == "POST" and 'login' in request.url:
-                            print(f"   📤 POST to {request.url}")
-                            try:
-                                post_data = request.post_data
-                                if post_data:
-                                    # Parse form data
-                                    import urllib.parse
-                                    data = urllib.parse.parse_qs(post_data)
-                                    # Show presence of key fields
-                                    has_token = 'h-captcha-response' in data and len(data.get('h-captcha-response', [''])[0]) > 1000
-                                    has_csrf = '_csrf' in data
-                                    has_authz = 'authorization_id' in data
-                                    print(f"      Token: {'✓' if has_token else '✗'} (len={len(data.get('h-captcha-response', [''])[0])})")
-                                    print(f"      CSRF: {'✓' if has_csrf else '✗'}")
-                                    print(f"      AuthZ: {'✓' if has_authz else '✗'}")
-                            except Exception as e:
-                                pass
+                        self.log.debug(f"   📤 POST to {request.url}")
+                        data = self.state.events.post_form(request)
+                        if data:
+                            # Show presence of key fields
+                            has_token = 'h-captcha-response' in data and len(data.get('h-captcha-response', [''])[0]) > 1000
+                            has_csrf = '_csrf' in data
+                            has_authz = 'authorization_id' in data
+                            self.log.debug(f"      Token: {'✓' if has_token else '✗'} (len={len(data.get('h-captcha-response', [''])[0])})")
+                            self.log.debug(f"      CSRF: {'✓' if has_csrf else '✗'}")
+                            self.log.debug(f"      AuthZ: {'✓' if has_authz else '✗'}")
                     
-                    page.on("request", lambda req: asyncio.create_task(handle_request(req)))
+                    if verbose:
+                        self.state.events.on(page, "request", handle_request,
+                                             predicate=lambda req: req.method == "POST" and 'login' in req.url)
                     
                     # Track validation failures
-                    validation_state = {"failed": False, "reason": "", "timestamp": 0}
+                    validation_state = self.state.validation_state
                     
                     # Monitor responses for debugging
                     async def handle_response(response):
                         if response.status >= 400:
                             # Special handling for different error types
                             if response.status == 502:
-                                print(f"   ⚠️ HTTP 502 (Bad Gateway): {response.url}")
-                                print(f"      This is a temporary server issue - resource may load on retry")
+                                self.log.warning(f"   ⚠️ HTTP 502 (Bad Gateway): {response.url}")
+                                self.log.info(f"      This is a temporary server issue - resource may load on retry")
                             elif response.status == 400:
-                                print(f"   ⚠️ HTTP 400 (Bad Request): {response.url}")
+                                self.log.warning(f"   ⚠️ HTTP 400 (Bad Request): {response.url}")
                                 # Try to get response body for 400 errors
                                 try:
                                     body = await response.text()
                                     if body:
-                                        print(f"      Response body: {body[:500]}")
+                                        self.log.info(f"      Response body: {body[:500]}")
                                         # Check if this is captcha validation failure
                                         if 'captcha' in body.lower() and ('inválido' in body.lower() or 'invalid' in body.lower()):
+                                            rejected_token = self.state.events.post_form(response.request).get('h-captcha-response', [''])[0]
+                                            self.token_manager.mark_rejected(rejected_token)
                                             import time
                                             validation_state["failed"] = True
                                             validation_state["reason"] = "Server rejected captcha with 400 error"
                                             validation_state["timestamp"] = time.time()
-                                            print(f"   🚨 DETECTED: Server rejected captcha solution!")
-                                            print(f"   💡 Possible causes:")
-                                            print(f"      - Token submitted too quickly (before hCaptcha backend validated)")
-                                            print(f"      - Missing required form fields (CSRF, authorization_id)")
-                                            print(f"      - Token expired before submission")
+                                            self.log.warning(f"   🚨 DETECTED: Server rejected captcha solution!")
+                                            self.log.info(f"   💡 Possible causes:")
+                                            self.log.info(f"      - Token submitted too quickly (before hCaptcha backend validated)")
+                                            self.log.info(f"      - Missing required form fields (CSRF, authorization_id)")
+                                            self.log.info(f"      - Token expired before submission")
                                 except Exception as e:
                                     pass
                             else:
-                                print(f"   ⚠️ HTTP {response.status}: {response.url}")
+                                self.log.warning(f"   ⚠️ HTTP {response.status}: {response.url}")
+                        
+                        await self.record_wait_outcome(response)
                     
-                    page.on("response", lambda response: asyncio.create_task(handle_response(response)))
+                    # Only error responses and form POST replies need the async handler
+                    self.state.events.on(page, "response", handle_response,
+                                         predicate=lambda response: response.status >= 400 or is_submit_url(response.url))
                     
-                    print("   ✅ Connected\n")
+                    self.log.info("   ✅ Connected\n")
                     
-                    print("🔐 Verifying and injecting certificate...")
-                    cert_valid = await self.verify_certificate(cdp_session, cert_base64, CERTIFICATE_PASSWORD)
+                    self.log.info("🔐 Verifying and injecting certificate...")
+                    with self.state.timer.span('certificate_injection'):
+                        cert_valid = await certificate_task
                     
                     if not cert_valid:
-                        print("\n❌ Certificate verification failed - cannot proceed")
-                        print("💡 Please check:")
-                        print("   - Certificate file is not corrupted")
-                        print("   - CERTIFICATE_PASSWORD is correct in .env file")
-                        print("   - Certificate has not expired")
-                        await browser.close()
+                        self.log.error("\n❌ Certificate verification failed - cannot proceed")
+                        self.log.info("💡 Please check:")
+                        self.log.info("   - Certificate file is not corrupted")
+                        self.log.info("   - CERTIFICATE_PASSWORD is correct in .env file")
+                        self.log.info("   - Certificate has not expired")
+                        result.fail(FAILURE_CERTIFICATE_REJECTED, "Browser.addCertificate failed")
+                        await self._release_browser()
                         continue
                     
-                    print()
                     
-                    print(f"📍 Navigating to {TARGET_URL}...")
-                    await page.goto(TARGET_URL, wait_until='domcontentloaded', timeout=30000)
-                    print(f"   ✅ Page loaded")
+                    if PIPELINED_SOLVE:
+                        # Solve starts when the hCaptcha frame loads, concurrently with the waits below
+                        page.on("framenavigated", lambda frame: self._maybe_start_early_solve(frame, captcha_solver))
+                        self.state.timer.start('captcha_detection')
+                    
+                    self.log.info(f"📍 Navigating to {self.target_url}...")
+                    with self.state.timer.span('navigation'):
+                        await page.goto(self.target_url, wait_until='domcontentloaded', timeout=30000)
+                    self.log.info(f"   ✅ Page loaded")
+                    
+                    if PIPELINED_SOLVE:
+                        # Joined right before submit (handle_page_elements -> _join_form_ready)
+                        self.state.form_ready_task = asyncio.ensure_future(
+                            page.wait_for_function(FORM_READY_PREDICATE, timeout=15000)
+                        )
+                        self.state.form_ready_task.add_done_callback(_ignore_task_result)
                     
                     # Wait for page to be fully interactive (with fallback)
-                    print("   ⏳ Waiting for page to be fully interactive...")
+                    self.log.info("   ⏳ Waiting for page to be fully interactive...")
                     try:
-                        await page.wait_for_load_state('networkidle', timeout=15000)
-                        print("   ✅ Page reached networkidle state")
+                        with self.state.timer.span('networkidle'):
+                            await self._wait_for_network_idle(page, timeout=15000)
+                        self.log.info("   ✅ Page reached networkidle state")
                     except Exception as e:
-                        print(f"   ⚠️ Networkidle timeout (normal for some pages) - continuing...")
+                        self.log.warning(f"   ⚠️ Networkidle timeout (normal for some pages) - continuing...")
                     
-                    # Additional wait to ensure all scripts are loaded
-                    print("   ⏳ Ensuring scripts are loaded...")
-                    await asyncio.sleep(3)
-                    print("   ✅ Page is ready\n")
+                    # Runs until handle_page_elements first sees the captcha
+                    if not self.state.early_solve_started:
+                        self.state.timer.start('captcha_detection')
+                    
+                    # Additional wait to ensure all scripts are loaded (the state machine's
+                    # landing state waits for the captcha itself)
+                    if PAGE_FLOW_MODE == "polling":
+                        self.log.info("   ⏳ Ensuring scripts are loaded...")
+                        if self.state.early_solve_started:
+                            self.log.info("   ⚡ Captcha is already loaded and being solved")
+                        elif CAPTCHA_DETECTION_MODE == "event":
+                            # Same 3s upper bound, but returns as soon as the captcha is on screen
+                            await self.wait_for_captcha_with_debug(page, max_wait_seconds=3)
+                        else:
+                            await asyncio.sleep(3)
+                        self.log.info("   ✅ Page is ready\n")
                     
                     # Wait and handle any elements that appear
-                    success = await self.handle_page_elements(page, captcha_solver)
+                    if PAGE_FLOW_MODE == "polling":
+                        success = await self.handle_page_elements(page, captcha_solver)
+                    else:
+                        success = await LoginStateMachine(self, page, captcha_solver).run()
                     
                     if not success:
-                        print("\n❌ Page handling failed or captcha invalid")
+                        self.log.error("\n❌ Page handling failed or captcha invalid")
                         await self.debug_page_state(page)
-                        await browser.close()
+                        result.fail(self.state.failure_class or FAILURE_PAGE_ERROR, "Page handling failed")
+                        await self._release_browser()
                         await asyncio.sleep(2)
                         continue
                     
                     # Get final page content and status
-                    print("\n🔍 Checking final page status...")
+                    self.log.info("\n🔍 Checking final page status...")
                     page_text = await page.evaluate("() => document.body.innerText")
                     current_url = page.url
                     
@@ -1243,101 +1474,134 @@ class BrightDataFullAutomation:
                     error_found = False
                     
                     if 'certificado digital não encontrado' in page_text.lower():
-                        print("❌ Certificate not recognized by website")
+                        self.log.error("❌ Certificate not recognized by website")
                         error_found = True
+                        result.fail(FAILURE_CERTIFICATE_NOT_RECOGNIZED, "Certificado digital não encontrado")
                     
                     if 'captcha inválido' in page_text.lower():
-                        print("❌ 'Captcha inválido' still present on final page")
+                        self.log.error("❌ 'Captcha inválido' still present on final page")
+                        if not error_found:
+                            result.fail(FAILURE_CAPTCHA_REJECTED, "Captcha inválido")
                         error_found = True
                     
                     if 'erro' in page_text.lower() and 'certificado' in page_text.lower():
-                        print("⚠️ Certificate-related error detected in page text")
+                        self.log.warning("⚠️ Certificate-related error detected in page text")
+                        if not error_found:
+                            result.fail(FAILURE_PAGE_ERROR, "Certificate-related error on page")
                         error_found = True
                     
                     if error_found:
-                        print(f"\n📋 Page text sample (first 500 chars):")
-                        print(page_text[:500])
-                        await browser.close()
+                        self.log.info(f"\n📋 Page text sample (first 500 chars):")
+                        self.log.info(page_text[:500])
+                        await self._release_browser()
                         continue
                     
                     # Success analysis
-                    print("="*70)
-                    print("✅✅✅ SUCCESS! ✅✅✅")
-                    print("="*70)
-                    print(f"🌐 URL: {current_url}")
+                    self.log.info("="*70)
+                    self.log.info("✅✅✅ SUCCESS! ✅✅✅")
+                    self.log.info("="*70)
+                    self.log.info(f"🌐 URL: {current_url}")
+                    self.log.info(f"📊 Requests routed through Python: {self.state.route_events}")
+                    timings = self.state.timer.durations()
+                    self.log.info("⏱️  Phases: " + ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in timings.items()))
                     
                     try:
                         page_title = await page.title()
-                        print(f"📄 Title: {page_title}")
+                        self.log.info(f"📄 Title: {page_title}")
                     except:
-                        print(f"📄 Title: [Unable to retrieve]")
+                        self.log.info(f"📄 Title: [Unable to retrieve]")
                     
                     # Determine authentication status
                     if 'login' not in current_url.lower() and 'acesso.gov.br/login' not in current_url:
-                        print("\n🎉 FULLY AUTHENTICATED AND REDIRECTED!")
+                        self.log.info("\n🎉 FULLY AUTHENTICATED AND REDIRECTED!")
                     elif 'x509' not in current_url and 'certificado' not in current_url:
-                        print("\n✅ Authentication appears successful")
+                        self.log.info("\n✅ Authentication appears successful")
                     else:
-                        print("\n✅ Process completed (verify authentication manually)")
+                        self.log.info("\n✅ Process completed (verify authentication manually)")
                     
                     # Check for success keywords
                     success_keywords = ['sucesso', 'bem-vindo', 'dashboard', 'autenticado']
                     found_success = [kw for kw in success_keywords if kw in page_text.lower()]
                     if found_success:
-                        print(f"🎯 Success keywords found: {', '.join(found_success)}")
+                        self.log.info(f"🎯 Success keywords found: {', '.join(found_success)}")
                     
-                    print("\n📋 Page content preview (first 600 chars):")
-                    print(page_text[:600])
-                    print("\n" + "="*70)
+                    self.log.info("\n📋 Page content preview (first 600 chars):")
+                    self.log.info(page_text[:600])
+                    self.log.info("\n" + "="*70)
                     
                     # Navigate to servicos page after successful captcha solve
-                    print("\n🌐 Navigating to https://servicos.acesso.gov.br ...")
+                    self.log.info(f"\n🌐 Navigating to {self.services_url} ...")
                     try:
-                        await page.goto("https://servicos.acesso.gov.br", wait_until='domcontentloaded', timeout=30000)
+                        await page.goto(self.services_url, wait_until='domcontentloaded', timeout=30000)
                         await asyncio.sleep(3)
                         
                         final_url = page.url
                         final_text = await page.evaluate("() => document.body.innerText")
                         
-                        print(f"   ✅ Navigated to: {final_url}")
+                        self.log.info(f"   ✅ Navigated to: {final_url}")
                         
                         # Check if we successfully accessed the services page
                         if 'servicos' in final_url.lower():
-                            print("\n🎉 SUCCESSFULLY ACCESSED SERVICES PAGE!")
+                            self.log.info("\n🎉 SUCCESSFULLY ACCESSED SERVICES PAGE!")
                         else:
-                            print(f"\n⚠️ Redirected to: {final_url}")
+                            self.log.warning(f"\n⚠️ Redirected to: {final_url}")
                         
-                        print("\n📋 Services page preview (first 600 chars):")
-                        print(final_text[:600])
+                        self.log.info("\n📋 Services page preview (first 600 chars):")
+                        self.log.info(final_text[:600])
                     except Exception as nav_error:
-                        print(f"\n⚠️ Navigation to services page failed: {nav_error}")
-                        print("   💡 You can manually navigate to https://servicos.acesso.gov.br")
+                        self.log.warning(f"\n⚠️ Navigation to services page failed: {nav_error}")
+                        self.log.info(f"   💡 You can manually navigate to {self.services_url}")
+                    
+                    result.status = STATUS_SUCCESS
+                    result.failure_class = result.error = None
+                    result.final_url = page.url
+                    try:
+                        result.storage_state = await context.storage_state()
+                    except Exception as e:
+                        self.log.warning(f"   ⚠️ Could not read storage state: {e}")
+                    await self._save_session(result.final_url, result.storage_state)
                     
-                    print("\n" + "="*70)
+                    self.log.info("\n" + "="*70)
                     
-                    print("\n🔍 Browser will stay open. Press Enter to close...")
-                    input()
+                    if self.interactive:
+                        flush_logging()
+                        print("\n🔍 Browser will stay open. Press Enter to close...")
+                        input()
                     
-                    await browser.close()
-                    return
+                    await self._release_browser()
+                    return result
                     
                 except Exception as e:
-                    print(f"\n❌ ERROR on attempt {attempt + 1}: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    self.log.error(f"\n❌ ERROR on attempt {attempt + 1}: {e}", exc_info=True)
+                    result.fail(FAILURE_TIMEOUT if isinstance(e, PlaywrightTimeoutError) else FAILURE_EXCEPTION, str(e))
                     
-                    if browser:
-                        try:
-                            await browser.close()
-                        except:
-                            pass
+                    await self._release_browser()
                     
                     if attempt < 2:
-                        print(f"\n⏳ Retrying immediately...\n")
-                        await asyncio.sleep(0.5)
+                        # Grows with the failures all sessions are seeing right now (jittered)
+                        delay = self.cdp_health.backoff_delay()
+                        self.log.info(f"\n⏳ Retrying in {delay:.1f}s...\n")
+                        await asyncio.sleep(delay)
                     else:
-                        print("\n❌ All 3 attempts failed")
-                        input("\nPress Enter to close...")
+                        self.log.error("\n❌ All 3 attempts failed")
+                        if self.interactive:
+                            flush_logging()
+                            input("\nPress Enter to close...")
+            
+            return result
+        finally:
+            result.timings = self.state.timer.durations()
+            result.elapsed = time.monotonic() - start_time
+            await self._release_browser()
+            if own_pool is not None:
+                await own_pool.close()
+            self._pool = None
+            self._running = False
+            if self.metrics is not None:
+                if result.status == STATUS_SUCCESS:
+                    # Login latency history for the hedging policy
+                    self.metrics.observe(LOGIN_PHASE, result.elapsed)
+                self.metrics.export()
 
 
 async def main():
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from typing import List, Optional
+from src.config import (
+    BRIGHT_DATA_USERNAME, BRIGHT_DATA_PASSWORD,
+    BROWSER_POOL_SIZE, BROWSER_POOL_MAX_IDLE, BROWSER_POOL_MAX_AGE, BROWSER_POOL_HEALTH_CHECK_AFTER,
+)
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def bright_data_endpoint_url() -> str:
+    """CDP websocket endpoint of the Bright Data browser"""
+    auth = f"{BRIGHT_DATA_USERNAME}:{BRIGHT_DATA_PASSWORD}"
+    return f"wss://{auth}@brd.superproxy.io:9222"
+
+
+class PooledBrowser:
+    """A connected CDP browser plus its bookkeeping while it lives in the pool"""
+    def __init__(self, browser):
+        self.browser = browser
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        # Context/page handed out for the current lease
+        self.context = None
+        self.page = None
+        self.owns_context = False
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    @property
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+
+class CDPBrowserPool:
+    """Keep warm connect_over_cdp connections and hand out fresh pages for each login.
+
+    Browsers are evicted when disconnected, idle longer than max_idle or older
+    than max_age. Idle browsers are pinged with Browser.getVersion before reuse
+    once they have been idle for health_check_after seconds.
+    """
+    def __init__(self, playwright, endpoint_url: Optional[str] = None, size: int = BROWSER_POOL_SIZE,
+                 max_idle: float = BROWSER_POOL_MAX_IDLE, max_age: float = BROWSER_POOL_MAX_AGE,
+                 health_check_after: float = BROWSER_POOL_HEALTH_CHECK_AFTER):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.playwright = playwright
+        self.endpoint_url = endpoint_url or bright_data_endpoint_url()
+        self.size = size
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.health_check_after = health_check_after
+        self._idle: List[PooledBrowser] = []
+        self._total = 0
+        self._condition = asyncio.Condition()
+        self._closed = False
+
+    async def _connect(self) -> PooledBrowser:
+        start_time = time.monotonic()
+        browser = await self.playwright.chromium.connect_over_cdp(self.endpoint_url)
+        log.info(f"   🔌 Pool: new CDP connection in {time.monotonic() - start_time:.1f}s")
+        return PooledBrowser(browser)
+
+    async def warm_up(self, count: Optional[int] = None):
+        """Open up to count connections ahead of time (all concurrently)"""
+        async with self._condition:
+            count = min(count or self.size, self.size - self._total)
+            self._total += count
+        if count <= 0:
+            return
+        results = await asyncio.gather(*[self._connect() for _ in range(count)], return_exceptions=True)
+        async with self._condition:
+            for result in results:
+                if isinstance(result, PooledBrowser):
+                    self._idle.append(result)
+                else:
+                    self._total -= 1
+                    log.warning(f"   ⚠️ Pool: warm-up connection failed: {result}")
+            self._condition.notify_all()
+
+    def _expired(self, pooled: PooledBrowser) -> bool:
+        return (not pooled.browser.is_connected()
+                or pooled.age > self.max_age
+                or pooled.idle_for > self.max_idle)
+
+    async def _healthy(self, pooled: PooledBrowser) -> bool:
+        if self._expired(pooled):
+            return False
+        if pooled.idle_for < self.health_check_after:
+            return True
+        try:
+            session = await pooled.browser.new_browser_cdp_session()
+            try:
+                await asyncio.wait_for(session.send('Browser.getVersion'), timeout=3)
+            finally:
+                await session.detach()
+            return True
+        except Exception as e:
+            log.warning(f"   ⚠️ Pool: health check failed: {e}")
+            return False
+
+    async def _discard(self, pooled: PooledBrowser):
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+
+    async def acquire(self) -> PooledBrowser:
+        """Get a healthy browser, connecting a new one if the pool has room, else wait for a release"""
+        while True:
+            candidate = None
+            connect = False
+            async with self._condition:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._total < self.size:
+                    self._total += 1
+                    connect = True
+                else:
+                    await self._condition.wait()
+                    continue
+
+            if connect:
+                try:
+                    pooled = await self._connect()
+                except Exception:
+                    async with self._condition:
+                        self._total -= 1
+                        self._condition.notify()
+                    raise
+                pooled.uses += 1
+                return pooled
+
+            if await self._healthy(candidate):
+                candidate.uses += 1
+                log.info(f"   ♻️ Pool: reusing warm browser (use #{candidate.uses}, age {candidate.age:.0f}s)")
+                return candidate
+
+            await self._discard(candidate)
+            async with self._condition:
+                self._total -= 1
+
+    async def open_page(self, pooled: PooledBrowser):
+        """Fresh context + page on a leased browser; falls back to the default context"""
+        try:
+            pooled.context = await pooled.browser.new_context()
+            pooled.owns_context = True
+        except Exception:
+            # Some remote browsers expose a single context only - start it clean
+            pooled.context = pooled.browser.contexts[0]
+            pooled.owns_context = False
+            await pooled.context.clear_cookies()
+        pooled.page = await pooled.context.new_page()
+        return pooled.context, pooled.page
+
+    async def release(self, pooled: PooledBrowser, discard: bool = False):
+        """Close the lease's page/context and return the browser to the pool"""
+        try:
+            if pooled.page is not None:
+                await pooled.page.close()
+            if pooled.context is not None and pooled.owns_context:
+                await pooled.context.close()
+        except Exception:
+            discard = True
+        pooled.page = None
+        pooled.context = None
+        pooled.last_used = time.monotonic()
+
+        if discard or self._closed or self._expired(pooled):
+            await self._discard(pooled)
+            async with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            return
+
+        async with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    async def close(self):
+        async with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        await asyncio.gather(*[self._discard(p) for p in idle])
@@ -1,104 +1,407 @@
+import abc
 import time
 import asyncio
-from typing import Optional
+import hashlib
+import json
+from typing import List, Optional, Sequence
+from src.config import (
+    SOLVE_TIMEOUT_VALIDATION_WAIT, CIRCUIT_MAX_WAIT, CAPTCHA_SOLVER_BACKENDS, MOCK_SOLVE_LATENCY, MOCK_SOLVER_IN_RACE, ADAPTIVE_SOLVE_TIMEOUT,
+)
+from src.cdp_pipeline import CDPPipeline
+from src.solve_stats import STATUS_TIMEOUT, get_solve_stats, is_solved
+from src.upstream_health import UPSTREAM_CAPTCHA, get_upstream_health
+from src.logger import get_logger
 
+log = get_logger(__name__)
 
-class BrightDataCaptchaSolver:
-    def __init__(self, cdp_session):
-        self.cdp_session = cdp_session
-        # Try to configure Bright Data to disable all auto-behavior
-        asyncio.create_task(self._configure_solver())
-    
-    async def _configure_solver(self):
-        """Configure Bright Data solver to disable auto-submit"""
+
+# In-page predicate: any hCaptcha iframe present
+CAPTCHA_PRESENT_EXPRESSION = """
+    !!Array.from(document.querySelectorAll('iframe')).find(f =>
+        ((f.getAttribute('src') || '') + ' ' + (f.getAttribute('title') || '')).toLowerCase().includes('hcaptcha'))
+"""
+
+# In-page predicate: a full-length hCaptcha token is in the response field
+TOKEN_PRESENT_EXPRESSION = """
+    (document.querySelector('textarea[name="h-captcha-response"]')?.value || '').length > 1000
+"""
+
+TOKEN_INJECTION_SCRIPT = """
+    (token => {
+        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        if (textarea) textarea.value = token;
+        return !!textarea;
+    })(%s)
+"""
+
+
+def _log_configured(task: asyncio.Task):
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        log.warning(f"   ⚠️ Could not configure Bright Data: {task.exception()}")
+    else:
+        log.info("   🔧 Configured Bright Data: autoSubmit=False")
+
+
+class SolveResult:
+    """Outcome of one solve: the backend's status and, when the backend hands it over, the token"""
+    def __init__(self, status: str, backend: str, elapsed: float = 0.0, token: Optional[str] = None,
+                 token_present: Optional[bool] = None):
+        self.status = status
+        self.backend = backend
+        self.elapsed = elapsed
+        self.token = token
+        self.token_present = token_present  # Checked in the page (timeouts only)
+
+    @property
+    def ok(self) -> bool:
+        # Backends that only put the token in the page report token=None
+        return is_solved(self.status, self.token_present) and (self.token is None or len(self.token) > 1000)
+
+    def __repr__(self):
+        return f"<SolveResult {self.backend}: {self.status} in {self.elapsed:.1f}s>"
+
+
+class CaptchaSolverBackend(abc.ABC):
+    """Captcha solver interface: detect(), solve(), status() and cancel().
+
+    solve_with_retry() and solve_hcaptcha() are shared by every backend; a
+    backend with a health tracker is skipped while its circuit is open, and
+    one with solve stats records every outcome and sizes its timeouts from them.
+    """
+    name = 'backend'
+
+    def __init__(self, health=None, stats=None):
+        self.health = health
+        self.stats = stats
+        self._status = 'idle'
+        self._task: Optional[asyncio.Task] = None
+
+    @abc.abstractmethod
+    async def detect(self, timeout: float = 10) -> bool:
+        """True once the backend sees a captcha on the page (within timeout seconds)"""
+
+    @abc.abstractmethod
+    async def solve(self, detect_timeout: int = 40000) -> SolveResult:
+        """Detect and solve the page's captcha"""
+
+    def status(self) -> str:
+        """'idle', 'solving', 'cancelled' or the last solve status"""
+        return self._status
+
+    async def cancel(self):
+        """Stop waiting for a solve in flight"""
+        task = self._task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def run_solve(self, detect_timeout: int = 40000) -> SolveResult:
+        """solve() as a cancellable task; a cancel() turns into a 'cancelled' result"""
+        self._status = 'solving'
+        start_time = time.monotonic()
+        self._task = asyncio.ensure_future(self.solve(detect_timeout))
         try:
-            # Try various configuration options to disable auto-submit
-            await self.cdp_session.send('Captcha.configure', {
-                'autoSubmit': False,
-                'autoDetect': True  # Still detect, just don't submit
-            })
-            print("   🔧 Configured Bright Data: autoSubmit=False")
-        except Exception as e:
-            print(f"   ⚠️ Could not configure Bright Data: {e}")
+            result = await asyncio.shield(self._task)
+        except asyncio.CancelledError:
+            if not self._task.cancelled():
+                # We were cancelled, not the solve: stop it as well
+                self._task.cancel()
+                raise
+            if self.health is not None:
+                # A cancelled solve says nothing about the upstream
+                self.health.release_probe()
+            result = SolveResult('cancelled', self.name, time.monotonic() - start_time)
+        finally:
+            self._task = None
+        self._status = result.status
+        if self.stats is not None and result.status != 'cancelled':
+            self.stats.record(result.status, result.elapsed, self.name, detect_timeout,
+                              token_present=result.token_present)
+        return result
+
+    async def solve_hcaptcha(self, detect_timeout: int = 40000) -> bool:
+        return (await self.run_solve(detect_timeout)).ok
+
+    async def solve_with_retry(self, max_retries: int = 3, retry_delay: float = 4, max_wait: float = CIRCUIT_MAX_WAIT):
+        log.info(f"\n🤖 CAPTCHA SOLVER ({self.name})")
+        log.info(f"   Max attempts: {max_retries}")
+        log.info(f"   Retry delay: {retry_delay}s+ (backs off while the solver keeps failing)")
+
+        for attempt in range(max_retries):
+            # Don't spend a paid solve while the upstream is known to be failing
+            if self.health is not None and not await self.health.wait_until_available(max_wait):
+                log.error(f"   ❌ Captcha solver circuit still open after {max_wait:g}s - giving up")
+                return False
+
+            log.info(f"\n📍 Solve Attempt {attempt + 1}/{max_retries}")
+
+            # Increase timeout for later attempts - sized from past solve times when known
+            timeout = self.stats.detect_timeout(self.name, attempt) if self.stats is not None else 25000 + (attempt * 5000)
+
+            success = await self.solve_hcaptcha(detect_timeout=timeout)
+
+            if success:
+                log.info(f"\n✅ SUCCESS! Captcha handled by {self.name}")
+                return True
+
+            if attempt < max_retries - 1:
+                # At least retry_delay, more as failures pile up across all sessions (jittered)
+                if self.stats is not None:
+                    retry_delay = self.stats.retry_delay(self.name, retry_delay)
+                delay = max(retry_delay, self.health.backoff_delay()) if self.health is not None else retry_delay
+                log.info(f"   ⏳ Waiting {delay:.1f}s before retry...")
+                await asyncio.sleep(delay)
+
+        log.error(f"\n❌ {self.name} unable to solve captcha after {max_retries} attempts")
+        return False
+
+
+class BrightDataCaptchaSolver(CaptchaSolverBackend):
+    """Bright Data's CDP Captcha domain - the token is written into the page by the remote browser"""
+    name = 'brightdata'
+
+    def __init__(self, cdp_session, post_timeout_wait: float = SOLVE_TIMEOUT_VALIDATION_WAIT, health=None,
+                 stats=None):
+        # Captcha domain health shared by every session (failure rate, circuit, backoff)
+        super().__init__(health or get_upstream_health(UPSTREAM_CAPTCHA),
+                         stats or (get_solve_stats() if ADAPTIVE_SOLVE_TIMEOUT else None))
+        # Through a pipeline so Captcha.waitForSolve can be ordered after Captcha.configure
+        self.cdp_session = cdp_session if isinstance(cdp_session, CDPPipeline) else CDPPipeline(cdp_session)
+        # Seconds to wait for the token to show up after a waitForSolve timeout
+        self.post_timeout_wait = post_timeout_wait
+        # Try to configure Bright Data to disable all auto-behavior - on the wire now
+        self._configure_solver()
+
+    def _configure_solver(self):
+        """Configure Bright Data solver to disable auto-submit (every waitForSolve waits for the reply)"""
+        configure = self.cdp_session.start('Captcha.configure', {
+            'autoSubmit': False,
+            'autoDetect': True  # Still detect, just don't submit
+        })
+        configure.add_done_callback(_log_configured)
+
+    async def detect(self, timeout: float = 10) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                reply = await self.cdp_session.send('Runtime.evaluate', {'expression': CAPTCHA_PRESENT_EXPRESSION})
+                if reply.get('result', {}).get('value'):
+                    return True
+            except Exception as e:
+                log.debug(f"   Captcha detection probe failed: {e}")
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.25)
 
-    async def solve_hcaptcha(self, detect_timeout: int = 40000):
+    async def _wait_for_token(self, timeout: float) -> bool:
+        """True once a full token is in the page, checked for up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                reply = await self.cdp_session.send('Runtime.evaluate', {'expression': TOKEN_PRESENT_EXPRESSION})
+                if reply.get('result', {}).get('value'):
+                    return True
+            except Exception as e:
+                log.debug(f"   Token probe failed: {e}")
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.5)
+
+    async def solve(self, detect_timeout: int = 40000) -> SolveResult:
+        start_time = time.monotonic()
         try:
-            print(f"🤖 Bright Data: Detecting and solving hCaptcha...")
-            print(f"   Timeout: {detect_timeout/1000}s")
-            print(f"   🚫 Auto-submit disabled - manual control")
-            
-            start_time = time.time()
-            
+            log.info(f"🤖 Bright Data: Detecting and solving hCaptcha...")
+            log.info(f"   Timeout: {detect_timeout/1000}s")
+            log.info(f"   🚫 Auto-submit disabled - manual control")
+
             # Use asyncio.wait_for to add a hard timeout to prevent hanging
             # Since we're blocking the submission, waitForSolve might hang indefinitely
             try:
                 result = await asyncio.wait_for(
+                    # Captcha.configure must have been applied first (no wait once its reply is in)
                     self.cdp_session.send('Captcha.waitForSolve', {
                         'detectTimeout': detect_timeout,
                         'autoSubmit': False  # CRITICAL: Prevent auto-submission
-                    }),
+                    }, after=('Captcha.configure',)),
                     timeout=(detect_timeout / 1000) + 10  # Add 10s buffer beyond detect timeout
                 )
-                
-                elapsed = time.time() - start_time
+
+                elapsed = time.monotonic() - start_time
                 status = result.get('status', 'unknown')
-                print(f"   Status: {status} (took {elapsed:.1f}s)")
-                
+                log.info(f"   Status: {status} (took {elapsed:.1f}s)")
+
+                if status in ('solve_finished', 'solve_skipped'):
+                    self.health.record_success()
+                elif status == 'not_detected':
+                    # About the page, not the solver
+                    self.health.release_probe()
+                else:
+                    self.health.record_failure()
+
                 if status == 'solve_finished':
-                    print(f"   ✅ hCaptcha solved successfully by Bright Data!")
-                    print(f"   ⏳ Token should be available...")
+                    log.info(f"   ✅ hCaptcha solved successfully by Bright Data!")
+                    log.info(f"   ⏳ Token should be available...")
                     await asyncio.sleep(2)
-                    return True
+                    return SolveResult(status, self.name, elapsed)
                 elif status == 'solve_skipped':
-                    print(f"   ℹ️ Captcha solve skipped (may already be solved or not present)")
-                    return True
+                    log.info(f"   ℹ️ Captcha solve skipped (may already be solved or not present)")
                 elif status == 'not_detected':
-                    print(f"   ⚠️ Captcha not detected by Bright Data")
-                    print(f"   💡 Tip: Ensure captcha iframe is visible and loaded")
-                    return False
+                    log.warning(f"   ⚠️ Captcha not detected by Bright Data")
+                    log.info(f"   💡 Tip: Ensure captcha iframe is visible and loaded")
                 elif status == 'solve_failed':
-                    print(f"   ❌ Captcha solve failed")
-                    return False
+                    log.error(f"   ❌ Captcha solve failed")
                 else:
-                    print(f"   ⚠️ Unexpected status: {status}")
-                    print(f"   📋 Full result: {result}")
-                    return False
-                    
+                    log.warning(f"   ⚠️ Unexpected status: {status}")
+                    log.debug(f"   📋 Full result: {result}")
+                return SolveResult(status, self.name, time.monotonic() - start_time)
+
             except asyncio.TimeoutError:
-                elapsed = time.time() - start_time
-                print(f"   ⏰ Captcha solve timed out after {elapsed:.1f}s")
-                print(f"   💡 Token was generated, but we need to wait for hCaptcha server validation")
-                print(f"   ⏳ Waiting 8 seconds for hCaptcha backend to validate the token...")
-                await asyncio.sleep(8)  # Increased from 5 to 8 seconds
-                print(f"   ✅ Validation wait complete - assuming token is now valid")
-                return True
-                
+                elapsed = time.monotonic() - start_time
+                log.info(f"   ⏰ Captcha solve timed out after {elapsed:.1f}s")
+                # Look for the token instead of assuming it: the validation wait is spent polling for it
+                token_present = await self._wait_for_token(self.post_timeout_wait)
+                self.health.record(token_present)
+                if token_present:
+                    log.info(f"   ✅ Token is in the page - treating the timed-out solve as finished")
+                else:
+                    log.warning(f"   ⚠️ No token in the page after the timeout - counting it as a failed solve")
+                return SolveResult(STATUS_TIMEOUT, self.name, elapsed, token_present=token_present)
+
         except Exception as e:
-            print(f"   ❌ Error during captcha solve: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-
-    async def solve_with_retry(self, max_retries: int = 3, retry_delay: int = 4):
-        print(f"\n🤖 BRIGHT DATA CAPTCHA SOLVER (CDP)")
-        print(f"   Max attempts: {max_retries}")
-        print(f"   Retry delay: {retry_delay}s")
-        
-        for attempt in range(max_retries):
-            print(f"\n📍 Solve Attempt {attempt + 1}/{max_retries}")
-            
-            # Increase timeout for later attempts
-            timeout = 25000 + (attempt * 5000)  # 25s, 30s, 35s...
-            
-            success = await self.solve_hcaptcha(detect_timeout=timeout)
-            
-            if success:
-                print(f"\n✅ SUCCESS! Captcha handled by Bright Data")
+            log.error(f"   ❌ Error during captcha solve: {e}", exc_info=True)
+            self.health.record_failure()
+            return SolveResult('error', self.name, time.monotonic() - start_time)
+
+
+class MockCaptchaSolver(CaptchaSolverBackend):
+    """Local, deterministic backend for offline runs and solver benchmarks.
+
+    Every solve takes `latency` seconds and reports the next status of
+    `outcomes` (cycled). Finished solves produce a token derived from `seed`
+    and the solve count, stamped 'P1_<issued ms>_' like benchmarks.stub_sso
+    expects, and write it into the page when a page or CDP session is given.
+    """
+    name = 'mock'
+
+    def __init__(self, latency: float = MOCK_SOLVE_LATENCY, outcomes: Sequence[str] = ('solve_finished',),
+                 page=None, cdp_session=None, seed: int = 0, token_length: int = 3200):
+        super().__init__()
+        self.latency = latency
+        self.outcomes = list(outcomes)
+        self.page = page
+        self.cdp_session = cdp_session
+        self.seed = seed
+        self.token_length = token_length
+        self.solves = 0
+
+    def make_token(self) -> str:
+        prefix = f"P1_{int(time.time() * 1000)}_"
+        digest = hashlib.sha256(f"{self.seed}:{self.solves}".encode('utf-8')).hexdigest()
+        body = (digest * (self.token_length // len(digest) + 1))[:self.token_length - len(prefix)]
+        return prefix + body
+
+    async def detect(self, timeout: float = 10) -> bool:
+        if self.page is None and self.cdp_session is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while True:
+            if await self._evaluate(CAPTCHA_PRESENT_EXPRESSION):
                 return True
-            
-            if attempt < max_retries - 1:
-                print(f"   ⏳ Waiting {retry_delay}s before retry...")
-                await asyncio.sleep(retry_delay)
-        
-        print(f"\n❌ Bright Data unable to solve captcha after {max_retries} attempts")
-        return False
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.25)
+
+    async def solve(self, detect_timeout: int = 40000) -> SolveResult:
+        start_time = time.monotonic()
+        status = self.outcomes[self.solves % len(self.outcomes)]
+        self.solves += 1
+        await asyncio.sleep(min(self.latency, detect_timeout / 1000))
+        token = None
+        if status == 'solve_finished':
+            token = self.make_token()
+            await self._evaluate(TOKEN_INJECTION_SCRIPT % json.dumps(token))
+        log.info(f"   🧪 Mock solver: {status} after {self.latency:g}s")
+        return SolveResult(status, self.name, time.monotonic() - start_time, token)
+
+    async def _evaluate(self, expression: str):
+        try:
+            if self.page is not None:
+                return await self.page.evaluate(expression)
+            if self.cdp_session is not None:
+                reply = await self.cdp_session.send('Runtime.evaluate', {'expression': expression})
+                return reply.get('result', {}).get('value')
+        except Exception as e:
+            log.debug(f"   Mock solver page access failed: {e}")
+        return None
+
+
+class RacingCaptchaSolver(CaptchaSolverBackend):
+    """Runs several backends at once and keeps the first valid solve; the others are cancelled.
+
+    Backends whose circuit is open are left out of the race. A cancelled
+    remote solve may still finish upstream - only our wait for it stops.
+    """
+    name = 'race'
+
+    def __init__(self, backends: List[CaptchaSolverBackend]):
+        super().__init__()
+        if not backends:
+            raise ValueError("RacingCaptchaSolver needs at least one backend")
+        self.backends = backends
+        self.name = 'race(' + ','.join(b.name for b in backends) + ')'
+        self.winner: Optional[CaptchaSolverBackend] = None
+
+    async def detect(self, timeout: float = 10) -> bool:
+        results = await asyncio.gather(*[b.detect(timeout) for b in self.backends], return_exceptions=True)
+        return any(r is True for r in results)
+
+    async def solve(self, detect_timeout: int = 40000) -> SolveResult:
+        start_time = time.monotonic()
+        runners = [b for b in self.backends if b.health is None or b.health.allow()]
+        if not runners:
+            return SolveResult('circuit_open', self.name)
+        tasks = {asyncio.ensure_future(b.run_solve(detect_timeout)): b for b in runners}
+        last = None
+        try:
+            for finished in asyncio.as_completed(list(tasks)):
+                try:
+                    last = await finished
+                except Exception as e:
+                    log.warning(f"   ⚠️ Solver backend failed: {e}")
+                    continue
+                if last.ok:
+                    self.winner = next(b for b in runners if b.name == last.backend)
+                    log.info(f"   🏁 {last.backend} won the solve race in {last.elapsed:.1f}s")
+                    return SolveResult(last.status, last.backend, time.monotonic() - start_time, last.token)
+            return SolveResult(last.status if last else 'error', self.name, time.monotonic() - start_time)
+        finally:
+            await asyncio.gather(*[b.cancel() for b in runners], return_exceptions=True)
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def cancel(self):
+        await super().cancel()
+        await asyncio.gather(*[b.cancel() for b in self.backends], return_exceptions=True)
+
+
+def create_captcha_solver(cdp_session, page=None, backends: str = CAPTCHA_SOLVER_BACKENDS,
+                          post_timeout_wait: float = SOLVE_TIMEOUT_VALIDATION_WAIT,
+                          allow_mock_in_race: bool = MOCK_SOLVER_IN_RACE) -> CaptchaSolverBackend:
+    """Solver for a session from a comma-separated backend list ('brightdata', 'mock'); several = race"""
+    names = [n.strip().lower() for n in backends.split(',') if n.strip()]
+    if len(names) > 1 and 'mock' in names and not allow_mock_in_race:
+        # Its instant fake token would beat the real solver on every login
+        raise ValueError(f"The mock captcha solver cannot race real backends ('{backends}'); "
+                         f"set MOCK_SOLVER_IN_RACE=1 for tests or benchmarks")
+    built = []
+    for name in names:
+        if name == 'brightdata':
+            built.append(BrightDataCaptchaSolver(cdp_session, post_timeout_wait=post_timeout_wait))
+        elif name == 'mock':
+            built.append(MockCaptchaSolver(page=page))
+        else:
+            raise ValueError(f"Unknown captcha solver backend '{name}' (expected brightdata or mock)")
+    if not built:
+        raise ValueError("CAPTCHA_SOLVER_BACKENDS is empty")
+    return built[0] if len(built) == 1 else RacingCaptchaSolver(built)
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+class MethodStats:
+    """Call count, error count and latency of one CDP method"""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, ok: bool):
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if not ok:
+            self.errors += 1
+
+
+class CDPPipeline:
+    """CDP session wrapper that lets independent commands share one round trip.
+
+    start() puts a command on the wire without waiting for its reply; commands
+    are written in call order. `after` names earlier methods whose replies must
+    have arrived first (e.g. Captcha.waitForSolve after Captcha.configure).
+    Every command's latency and errors are counted per method. Anything else
+    (on(), detach(), ...) goes to the wrapped session, so the pipeline can be
+    passed wherever a CDP session is expected.
+    """
+    def __init__(self, session):
+        self.session = session
+        self.methods: Dict[str, MethodStats] = {}
+        self._last: Dict[str, asyncio.Task] = {}
+
+    def start(self, method: str, params: Optional[dict] = None, after: Iterable[str] = ()) -> asyncio.Task:
+        """Issue a command now and return the task holding its reply"""
+        dependencies = [self._last[m] for m in after if m in self._last]
+        task = asyncio.ensure_future(self._send(method, params or {}, dependencies))
+        self._last[method] = task
+        return task
+
+    async def send(self, method: str, params: Optional[dict] = None, after: Iterable[str] = ()):
+        return await self.start(method, params, after)
+
+    async def _send(self, method: str, params: dict, dependencies: List[asyncio.Task]):
+        if dependencies:
+            # Only ordering matters here: a failed dependency still lets this command go out
+            await asyncio.wait(dependencies)
+        start_time = time.monotonic()
+        ok = False
+        try:
+            reply = await self.session.send(method, params)
+            ok = True
+            return reply
+        finally:
+            self.methods.setdefault(method, MethodStats()).observe(time.monotonic() - start_time, ok)
+
+    def log_summary(self):
+        if not self.methods:
+            return
+        parts = [f"{method} {stats.calls}x {stats.total / stats.calls * 1000:.0f}ms"
+                 + (f" ({stats.errors} failed)" if stats.errors else '')
+                 for method, stats in sorted(self.methods.items())]
+        log.info(f"   📡 CDP: {', '.join(parts)}")
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
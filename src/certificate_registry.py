@@ -0,0 +1,213 @@
+import asyncio
+import base64
+import datetime
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+from src.logger import get_logger
+
+try:
+    from cryptography.hazmat.primitives.serialization import pkcs12, Encoding, PublicFormat
+except ImportError:  # Local validation is skipped without the cryptography package
+    pkcs12 = None
+
+log = get_logger(__name__)
+
+
+class CertificateError(Exception):
+    """A certificate that must not be sent to the browser.
+
+    reason is one of: not_found, bad_password, expired, not_yet_valid,
+    broken_chain, key_mismatch, malformed.
+    """
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class LoadedCertificate:
+    """A parsed .pfx file ready for Browser.addCertificate"""
+    def __init__(self, path: str, mtime: float, data: bytes):
+        self.path = path
+        self.mtime = mtime
+        self.size = len(data)
+        self.base64 = base64.b64encode(data).decode('utf-8')
+        # Same key the session cache uses
+        self.fingerprint = hashlib.sha256(data).hexdigest()
+        self.subject: Optional[str] = None
+        self.not_after: Optional[datetime.datetime] = None
+        self.validated = False
+
+    def __repr__(self):
+        return f"<LoadedCertificate {os.path.basename(self.path)} subject={self.subject} not_after={self.not_after}>"
+
+
+def _validity_window(cert) -> Tuple[datetime.datetime, datetime.datetime]:
+    # cryptography >= 42 exposes timezone-aware properties; older versions return naive UTC
+    if hasattr(cert, 'not_valid_after_utc'):
+        return cert.not_valid_before_utc, cert.not_valid_after_utc
+    return (cert.not_valid_before.replace(tzinfo=datetime.timezone.utc),
+            cert.not_valid_after.replace(tzinfo=datetime.timezone.utc))
+
+
+def _public_key_der(public_key) -> bytes:
+    return public_key.public_bytes(Encoding.DER, PublicFormat.SubjectPublicKeyInfo)
+
+
+def _check_chain(leaf, additional: List) -> None:
+    """Every certificate shipped in the bundle must be in date and signed by the next one we have"""
+    by_subject = {c.subject: c for c in additional}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    current = leaf
+    seen = set()
+    while current.issuer in by_subject and current.issuer != current.subject:
+        issuer = by_subject[current.issuer]
+        if issuer.subject in seen:
+            break
+        seen.add(issuer.subject)
+        not_before, not_after = _validity_window(issuer)
+        if not (not_before <= now <= not_after):
+            raise CertificateError('broken_chain', f"Chain certificate {issuer.subject.rfc4514_string()} is not valid now")
+        if hasattr(current, 'verify_directly_issued_by'):
+            try:
+                current.verify_directly_issued_by(issuer)
+            except Exception as e:
+                raise CertificateError('broken_chain', f"Certificate not signed by {issuer.subject.rfc4514_string()}: {e}")
+        current = issuer
+
+
+def load_certificate(path: str, password: Optional[str]) -> LoadedCertificate:
+    """Read, encode and validate a .pfx file (blocking - run in a worker thread)"""
+    if not path or not os.path.exists(path):
+        raise CertificateError('not_found', f"Certificate not found: {path}")
+
+    mtime = os.path.getmtime(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    loaded = LoadedCertificate(path, mtime, data)
+
+    if pkcs12 is None:
+        return loaded
+
+    try:
+        key, cert, additional = pkcs12.load_key_and_certificates(
+            data, password.encode('utf-8') if password else None
+        )
+    except ValueError as e:
+        message = str(e).lower()
+        if 'password' in message or 'decrypt' in message or 'mac' in message:
+            # OpenSSL cannot tell a wrong password from a damaged MAC
+            raise CertificateError('bad_password', "Certificate password is incorrect (or the file is corrupted)")
+        raise CertificateError('malformed', f"Certificate file is invalid or corrupted: {e}")
+
+    if cert is None:
+        raise CertificateError('malformed', "PFX file contains no certificate")
+
+    not_before, not_after = _validity_window(cert)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if now > not_after:
+        raise CertificateError('expired', f"Certificate expired on {not_after:%Y-%m-%d}")
+    if now < not_before:
+        raise CertificateError('not_yet_valid', f"Certificate is only valid from {not_before:%Y-%m-%d}")
+
+    if key is not None and _public_key_der(key.public_key()) != _public_key_der(cert.public_key()):
+        raise CertificateError('key_mismatch', "Private key does not match the certificate")
+
+    _check_chain(cert, list(additional or []))
+
+    loaded.subject = cert.subject.rfc4514_string()
+    loaded.not_after = not_after
+    loaded.validated = True
+    return loaded
+
+
+class CertificateRegistry:
+    """Load many .pfx files once and keep their encoded payloads in memory.
+
+    Entries are keyed by (path, password) and invalidated when the file's
+    mtime changes. Failures are cached the same way, so a bad certificate
+    is rejected again without re-reading the file.
+    """
+    def __init__(self):
+        self._entries: Dict[Tuple[str, Optional[str]], Tuple[float, object]] = {}
+        # In-flight loads, so concurrent sessions for one certificate and password parse it once
+        self._loading: Dict[Tuple[str, Optional[str]], asyncio.Future] = {}
+        self._warned_no_crypto = False
+
+    def _cached(self, path: str, password: Optional[str]):
+        entry = self._entries.get((path, password))
+        if entry is None:
+            return None
+        mtime, value = entry
+        try:
+            current_mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if current_mtime != mtime:
+            return None
+        return value
+
+    async def get(self, path: str, password: Optional[str]) -> LoadedCertificate:
+        """Return the validated certificate or raise CertificateError"""
+        value = self._cached(path, password)
+        if value is None:
+            key = (path, password)
+            task = self._loading.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._load(path, password))
+                self._loading[key] = task
+                task.add_done_callback(lambda _: self._loading.pop(key, None))
+            value = await task
+
+        if isinstance(value, CertificateError):
+            # Fresh instance so cached failures don't accumulate tracebacks
+            raise CertificateError(value.reason, str(value))
+        return value
+
+    async def _load(self, path: str, password: Optional[str]):
+        if pkcs12 is None and not self._warned_no_crypto:
+            log.warning("   ⚠️ 'cryptography' not installed - certificates are only checked by the browser")
+            self._warned_no_crypto = True
+
+        # The mtime from before the read: a file replaced during the load is loaded again next time
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        loop = asyncio.get_event_loop()
+        try:
+            value = await loop.run_in_executor(None, load_certificate, path, password)
+            mtime = value.mtime
+        except CertificateError as e:
+            value = e
+        if mtime is not None:
+            self._entries[(path, password)] = (mtime, value)
+        return value
+
+    async def preload(self, certificates: List[Tuple[str, Optional[str]]]) -> Dict[Tuple[str, Optional[str]], Optional[CertificateError]]:
+        """Validate many (path, password) pairs concurrently; maps (path, password) -> error (None when valid)"""
+        async def check(path, password):
+            try:
+                await self.get(path, password)
+                return (path, password), None
+            except CertificateError as e:
+                return (path, password), e
+        return dict(await asyncio.gather(*[check(path, password) for path, password in certificates]))
+
+    def list_directory(self, directory: str) -> List[str]:
+        """Paths of the .pfx/.p12 files of a directory (nothing is loaded until get)"""
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(('.pfx', '.p12'))
+        )
+
+
+_default_registry = None
+
+
+def get_certificate_registry() -> CertificateRegistry:
+    """Process-wide registry shared by all sessions"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = CertificateRegistry()
+    return _default_registry
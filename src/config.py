@@ -8,7 +8,9 @@ BRIGHT_DATA_PASSWORD = os.getenv("BRIGHT_DATA_PASSWORD")
 CERTIFICATE_PATH = os.getenv("CERTIFICATE_PATH")
 CERTIFICATE_PASSWORD = os.getenv("CERTIFICATE_PASSWORD")
 
-TARGET_URL = "https://sso.acesso.gov.br/login"
+# Overridable so the flow can run against the offline stand-in (benchmarks/stub_sso.py)
+TARGET_URL = os.getenv("TARGET_URL", "https://sso.acesso.gov.br/login")
+SERVICES_URL = os.getenv("SERVICES_URL", "https://servicos.acesso.gov.br")
 TIMEOUT = 30000
 
 # Timing configuration for captcha validation
@@ -16,3 +18,131 @@ TIMEOUT = 30000
 # Only adjust if you experience consistent failures
 CAPTCHA_POST_SOLVE_WAIT = int(os.getenv("CAPTCHA_POST_SOLVE_WAIT", "10"))  # Seconds to wait after captcha solve
 CAPTCHA_SUBMIT_DELAY = int(os.getenv("CAPTCHA_SUBMIT_DELAY", "8"))  # Seconds to wait before form submission
+
+# Concurrent login engine
+# Maximum number of login sessions driven at the same time (one remote browser each)
+MAX_CONCURRENT_SESSIONS = int(os.getenv("MAX_CONCURRENT_SESSIONS", "4"))
+
+# Captcha detection mode: "event" waits with a single in-page predicate,
+# "poll" keeps the original 500ms locator polling loop
+CAPTCHA_DETECTION_MODE = os.getenv("CAPTCHA_DETECTION_MODE", "event").lower()
+
+# Local data directory for caches and timing history
+SA_DATA_DIR = os.getenv("SA_DATA_DIR", ".sa_data")
+
+# Adaptive wait calibration
+# When enabled, the fixed post-solve waits are replaced by a single token-age gate
+# at submission time, learned from past "Captcha inválido" outcomes
+ADAPTIVE_WAITS = os.getenv("ADAPTIVE_WAITS", "1") == "1"
+WAIT_CALIBRATION_STORE = os.getenv("WAIT_CALIBRATION_STORE", os.path.join(SA_DATA_DIR, "wait_calibration.jsonl"))
+WAIT_TARGET_SUCCESS_RATE = float(os.getenv("WAIT_TARGET_SUCCESS_RATE", "0.95"))  # Share of submissions that must be accepted
+WAIT_MIN_DELAY = float(os.getenv("WAIT_MIN_DELAY", "2"))  # Never submit a token younger than this (seconds)
+
+# Remaining fixed waits (seconds) - previously hard-coded
+AUTO_SUBMIT_WAIT = float(os.getenv("AUTO_SUBMIT_WAIT", "5"))  # Wait for Bright Data's auto-submit attempt after solving
+SERVER_VALIDATION_WAIT = float(os.getenv("SERVER_VALIDATION_WAIT", "4"))  # Wait after clicking submit
+SOLVE_TIMEOUT_VALIDATION_WAIT = float(os.getenv("SOLVE_TIMEOUT_VALIDATION_WAIT", "8"))  # Wait after a waitForSolve timeout
+SOLVE_TOKEN_GRACE = float(os.getenv("SOLVE_TOKEN_GRACE", "2"))  # With adaptive waits: seconds to poll for the token after a timeout
+
+# Bright Data CDP connection pool
+# Keeps remote browsers connected between attempts/logins instead of reconnecting each time
+BROWSER_POOL_ENABLED = os.getenv("BROWSER_POOL_ENABLED", "1") == "1"
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))  # Warm connections kept per pool
+BROWSER_POOL_MAX_IDLE = float(os.getenv("BROWSER_POOL_MAX_IDLE", "60"))  # Seconds an idle browser is kept
+BROWSER_POOL_MAX_AGE = float(os.getenv("BROWSER_POOL_MAX_AGE", "600"))  # Seconds before a browser is recycled
+BROWSER_POOL_HEALTH_CHECK_AFTER = float(os.getenv("BROWSER_POOL_HEALTH_CHECK_AFTER", "10"))  # Ping idle browsers older than this
+
+# Authenticated session cache
+# Reuse cookies/local storage of a recent successful login for the same certificate
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "1") == "1"
+SESSION_CACHE_DIR = os.getenv("SESSION_CACHE_DIR", os.path.join(SA_DATA_DIR, "sessions"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "1800"))  # Seconds a cached session is trusted
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "200"))
+SESSION_PROBE_URL = os.getenv("SESSION_PROBE_URL", SERVICES_URL)
+
+# Network interception and resource blocking
+# "scoped" only routes /login, /auth and /certificado through Python, "all" routes every request
+INTERCEPT_MODE = os.getenv("INTERCEPT_MODE", "scoped").lower()
+# "none", "lean" (fonts, media, trackers) or "strict" (lean + gov.br images)
+RESOURCE_BLOCK_PROFILE = os.getenv("RESOURCE_BLOCK_PROFILE", "lean").lower()
+EXTRA_BLOCKED_URLS = os.getenv("EXTRA_BLOCKED_URLS", "")  # Comma-separated extra patterns, '*' wildcards
+
+# Per-phase latency metrics
+# Histograms are merged across runs and written after every login (empty path disables that export)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_JSON_PATH = os.getenv("METRICS_JSON_PATH", os.path.join(SA_DATA_DIR, "metrics.json"))
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", os.path.join(SA_DATA_DIR, "sa_login.prom"))
+
+# Logging
+# SA_ENV=production makes the default level WARNING (quiet); LOG_LEVEL always wins when set.
+# DEBUG additionally attaches the per-event browser listeners (console, navigation, requests).
+SA_ENV = os.getenv("SA_ENV", "development").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING" if SA_ENV == "production" else "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" (emoji console) or "json"
+
+# Token capture: "push" reports the hCaptcha token to Python through a page binding the moment
+# it is set, "poll" keeps the original in-page 100ms polling + body-wide MutationObserver
+TOKEN_CAPTURE_MODE = os.getenv("TOKEN_CAPTURE_MODE", "push").lower()
+
+# Captcha token lifecycle
+# Unsubmitted tokens are reused on widget resets/retries while they have more than the margin left
+TOKEN_REUSE = os.getenv("TOKEN_REUSE", "1") == "1"
+TOKEN_MAX_AGE = float(os.getenv("TOKEN_MAX_AGE", "120"))  # hCaptcha token validity (seconds)
+TOKEN_EXPIRY_MARGIN = float(os.getenv("TOKEN_EXPIRY_MARGIN", "15"))  # Never submit a token with less validity left
+
+# Pipelined login: start Captcha.waitForSolve as soon as the hCaptcha frame attaches, while the
+# page is still loading, and wait for form fields in parallel - both are joined at submit time
+PIPELINED_SOLVE = os.getenv("PIPELINED_SOLVE", "1") == "1"
+
+# Hedged logins: when a non-interactive login runs longer than HEDGE_PERCENTILE of the recorded
+# login latencies, a second independent session is started and the first to succeed wins
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # Below this, HEDGE_DEFAULT_DELAY is used
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "90"))  # Seconds
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))  # Max extra sessions per login (0.1 = 10%)
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "1"))  # Hedges allowed before the budget accrues
+
+# Form submission: "http" POSTs the login form with one in-page fetch() and classifies the reply
+# (falls back to clicking when no request could be sent), "dom" always clicks the submit button
+SUBMIT_MODE = os.getenv("SUBMIT_MODE", "http").lower()
+HTTP_SUBMIT_TIMEOUT = float(os.getenv("HTTP_SUBMIT_TIMEOUT", "45"))  # Seconds, includes the token-age gate
+
+# Login page flow: "state_machine" moves through explicit states on page events (per-state timeouts),
+# "polling" keeps the original 15-step snapshot loop
+PAGE_FLOW_MODE = os.getenv("PAGE_FLOW_MODE", "state_machine").lower()
+
+# Most async page-event handlers (request/response listeners) running at once per session
+EVENT_MAX_TASKS = int(os.getenv("EVENT_MAX_TASKS", "32"))
+
+# Upstream health (Bright Data CDP endpoint and Captcha domain), shared by all sessions:
+# the circuit opens when HEALTH_FAILURE_THRESHOLD of the calls in the last HEALTH_WINDOW seconds failed
+HEALTH_WINDOW = float(os.getenv("HEALTH_WINDOW", "300"))
+HEALTH_MIN_CALLS = int(os.getenv("HEALTH_MIN_CALLS", "5"))
+HEALTH_FAILURE_THRESHOLD = float(os.getenv("HEALTH_FAILURE_THRESHOLD", "0.5"))
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", "0.5"))  # Seconds; doubles per consecutive failure, jittered
+BACKOFF_MAX = float(os.getenv("BACKOFF_MAX", "60"))
+CIRCUIT_OPEN_BASE = float(os.getenv("CIRCUIT_OPEN_BASE", "15"))  # First open period (seconds), doubles per trip
+CIRCUIT_MAX_WAIT = float(os.getenv("CIRCUIT_MAX_WAIT", "120"))  # Longest a session waits on an open circuit
+CIRCUIT_PROBE_TIMEOUT = float(os.getenv("CIRCUIT_PROBE_TIMEOUT", "120"))  # Another probe if one never reports
+
+# Captcha solver backends: "brightdata" (CDP Captcha domain), "mock" (local, deterministic - offline runs only);
+# a comma-separated list races them and keeps the first valid token
+CAPTCHA_SOLVER_BACKENDS = os.getenv("CAPTCHA_SOLVER_BACKENDS", "brightdata").lower()
+MOCK_SOLVE_LATENCY = float(os.getenv("MOCK_SOLVE_LATENCY", "1"))  # Seconds per mock solve
+# The mock always wins a race with a token the real server rejects - only allowed in one for tests/benchmarks
+MOCK_SOLVER_IN_RACE = os.getenv("MOCK_SOLVER_IN_RACE", "0") == "1"
+
+# Adaptive solve timeout: waitForSolve's detect timeout and the retry delay follow the recorded solve
+# times (SOLVE_TIMEOUT_PERCENTILE of successful solves, clamped to SOLVE_TIMEOUT_MIN..MAX seconds)
+ADAPTIVE_SOLVE_TIMEOUT = os.getenv("ADAPTIVE_SOLVE_TIMEOUT", "1") == "1"
+SOLVE_STATS_STORE = os.getenv("SOLVE_STATS_STORE", os.path.join(SA_DATA_DIR, "solve_stats.jsonl"))
+SOLVE_STATS_MIN_SAMPLES = int(os.getenv("SOLVE_STATS_MIN_SAMPLES", "10"))  # Below this, the fixed 25s/30s/35s schedule
+SOLVE_TIMEOUT_PERCENTILE = float(os.getenv("SOLVE_TIMEOUT_PERCENTILE", "0.95"))
+SOLVE_TIMEOUT_MIN = float(os.getenv("SOLVE_TIMEOUT_MIN", "15"))
+SOLVE_TIMEOUT_MAX = float(os.getenv("SOLVE_TIMEOUT_MAX", "60"))
+
+# Batch login jobs (batch.py): SQLite job queue + result table, and attempts per job for retryable failures
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", os.path.join(SA_DATA_DIR, "jobs.sqlite3"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))  # Seconds before a retry, doubling per attempt
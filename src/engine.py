@@ -0,0 +1,208 @@
+from playwright.async_api import async_playwright
+import asyncio
+import time
+from typing import Dict, List, Optional
+from src.config import MAX_CONCURRENT_SESSIONS, CERTIFICATE_PASSWORD, BROWSER_POOL_ENABLED, METRICS_ENABLED, HEDGE_ENABLED
+from src.automation import BrightDataFullAutomation
+from src.browser_pool import CDPBrowserPool
+from src.certificate_registry import get_certificate_registry
+from src.hedging import run_hedged
+from src.metrics import get_metrics
+from src.result import LoginResult, FAILURE_CERTIFICATE_INVALID, FAILURE_EXCEPTION
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+# Longest an idle queue worker sleeps before looking again (retries requeued meanwhile by other workers)
+JOB_POLL_INTERVAL = 5.0
+
+
+class LoginJob:
+    """One login to perform: which certificate to use, where to log in and how to label the session"""
+    def __init__(self, certificate_path: str, certificate_password: Optional[str] = None, session_id: Optional[str] = None,
+                 target_url: Optional[str] = None):
+        self.certificate_path = certificate_path
+        self.certificate_password = certificate_password or CERTIFICATE_PASSWORD
+        self.session_id = session_id
+        self.target_url = target_url
+
+
+class SessionResult:
+    """Outcome of a single session run by the engine"""
+    def __init__(self, session_id: str, certificate_path: str):
+        self.session_id = session_id
+        self.certificate_path = certificate_path
+        self.success = False
+        self.error: Optional[str] = None
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        # Seconds per phase of the last attempt
+        self.timings: Dict[str, float] = {}
+        # Full LoginResult (final URL, storage state, failure class) when the session ran
+        self.login: Optional[LoginResult] = None
+
+    @property
+    def failure_class(self) -> Optional[str]:
+        if self.success:
+            return None
+        if self.login is not None:
+            return self.login.failure_class
+        return FAILURE_CERTIFICATE_INVALID if (self.error or '').startswith('certificate_') else FAILURE_EXCEPTION
+
+    def to_dict(self) -> dict:
+        return {
+            'session_id': self.session_id,
+            'success': self.success,
+            'status': self.login.status if self.login else None,
+            'failure_class': self.failure_class,
+            'error': self.login.error if self.login and self.login.error else self.error,
+            'final_url': self.login.final_url if self.login else None,
+            'attempts': self.login.attempts if self.login else 0,
+            'hedge_started': self.login.hedge_started if self.login else False,
+            'hedged': self.login.hedged if self.login else False,
+            'elapsed': round(self.elapsed, 3),
+            'timings': {phase: round(seconds, 3) for phase, seconds in self.timings.items()},
+            'started_at': self.started_at or None,
+        }
+
+    def __repr__(self):
+        status = "ok" if self.success else f"failed ({self.error or 'login not completed'})"
+        return f"<SessionResult {self.session_id}: {status} in {self.elapsed:.1f}s>"
+
+
+class ConcurrentLoginEngine:
+    """Run many independent login sessions under one event loop.
+
+    Every session gets its own BrightDataFullAutomation instance, so its
+    per-attempt state, page, routes and listeners are never shared.
+    """
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_SESSIONS, use_pool: bool = BROWSER_POOL_ENABLED):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        # One warm CDP connection per concurrent slot, reused by back-to-back sessions
+        self.use_pool = use_pool
+
+    async def run(self, jobs: List[LoginJob]) -> List[SessionResult]:
+        """Run all jobs, at most max_concurrency at a time; results keep the job order"""
+        log.info(f"\n🚀 CONCURRENT LOGIN ENGINE - {len(jobs)} session(s), concurrency {self.max_concurrency}")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        start_time = time.monotonic()
+
+        # Reject bad certificates locally before any remote browser is paid for
+        registry = get_certificate_registry()
+        errors = await registry.preload([(job.certificate_path, job.certificate_password) for job in jobs])
+        rejected = {key: error for key, error in errors.items() if error is not None}
+        for (path, _), error in rejected.items():
+            log.error(f"   ❌ {path}: {error}")
+
+        async with async_playwright() as playwright:
+            pool = CDPBrowserPool(playwright, size=self.max_concurrency) if self.use_pool else None
+            try:
+                if pool is not None:
+                    await pool.warm_up(min(len(jobs), self.max_concurrency))
+                results = await asyncio.gather(*[
+                    self._run_session(playwright, semaphore, job, index, pool, rejected)
+                    for index, job in enumerate(jobs)
+                ])
+            finally:
+                if pool is not None:
+                    await pool.close()
+
+        elapsed = time.monotonic() - start_time
+        succeeded = sum(1 for r in results if r.success)
+        log.info(f"\n📊 Engine finished: {succeeded}/{len(results)} succeeded in {elapsed:.1f}s")
+        if elapsed > 0:
+            log.info(f"   Throughput: {len(results) / elapsed * 3600:.0f} logins/hour")
+        if METRICS_ENABLED:
+            get_metrics().log_summary()
+        return list(results)
+
+    async def run_queue(self, queue, batch: str) -> dict:
+        """Work through a JobQueue batch with max_concurrency workers; outcomes go to the queue's result table"""
+        queue.recover(batch)
+        pending = queue.pending(batch)
+        log.info(f"\n🚀 BATCH '{batch}' - {len(pending)} pending job(s), {self.max_concurrency} worker(s)")
+        start_time = time.monotonic()
+
+        registry = get_certificate_registry()
+        certificates = {(job.certificate_path, job.certificate_password) for job in pending}
+        errors = await registry.preload(list(certificates))
+        rejected = {key: error for key, error in errors.items() if error is not None}
+        for (path, _), error in rejected.items():
+            log.error(f"   ❌ {path}: {error}")
+
+        async with async_playwright() as playwright:
+            pool = CDPBrowserPool(playwright, size=self.max_concurrency) if self.use_pool else None
+            try:
+                if pool is not None and pending:
+                    await pool.warm_up(min(len(pending), self.max_concurrency))
+                await asyncio.gather(*[
+                    self._queue_worker(playwright, queue, batch, pool, rejected)
+                    for _ in range(self.max_concurrency)
+                ])
+            finally:
+                if pool is not None:
+                    await pool.close()
+
+        summary = queue.summary(batch)
+        log.info(f"\n📊 Batch '{batch}' finished in {time.monotonic() - start_time:.1f}s: {summary['statuses']}")
+        if summary['failures']:
+            log.info(f"   Failures: {summary['failures']}")
+        if METRICS_ENABLED:
+            get_metrics().log_summary()
+        return summary
+
+    async def _queue_worker(self, playwright, queue, batch: str, pool=None, rejected=None):
+        # One session at a time per worker; the worker count is the concurrency
+        semaphore = asyncio.Semaphore(1)
+        while True:
+            queued = queue.claim(batch)
+            if queued is None:
+                due = queue.next_due(batch)
+                if due is None:
+                    return
+                # Only retries still backing off are left - sleep until the first is due
+                await asyncio.sleep(min(max(due - time.time(), 0.1), JOB_POLL_INTERVAL))
+                continue
+            job = LoginJob(queued.certificate_path, queued.certificate_password, session_id=queued.session_id,
+                           target_url=queued.target_url)
+            result = await self._run_session(playwright, semaphore, job, 0, pool, rejected)
+            queue.complete(queued, result.to_dict())
+            log.info(f"   {'✅' if result.success else '❌'} Job {queued.session_id} -> {queued.status}")
+
+    async def _run_session(self, playwright, semaphore, job: LoginJob, index: int, pool=None, rejected=None) -> SessionResult:
+        session_id = job.session_id or f"session-{index + 1}"
+        result = SessionResult(session_id, job.certificate_path)
+
+        error = rejected.get((job.certificate_path, job.certificate_password)) if rejected else None
+        if error is not None:
+            result.error = f"certificate_{error.reason}"
+            return result
+
+        async with semaphore:
+            automation = BrightDataFullAutomation(
+                certificate_path=job.certificate_path,
+                certificate_password=job.certificate_password,
+                session_id=session_id,
+                interactive=False,
+                browser_pool=pool,
+                target_url=job.target_url,
+            )
+            result.started_at = time.time()
+            start_time = time.monotonic()
+            try:
+                if HEDGE_ENABLED:
+                    result.login = await run_hedged(automation, playwright)
+                else:
+                    result.login = await automation.run_with_playwright(playwright)
+                result.success = result.login.success
+                result.error = result.login.failure_class
+            except Exception as e:
+                # One broken session must never take down the others
+                result.error = str(e)
+                log.error(f"   ❌ [{session_id}] Session crashed: {e}")
+            result.elapsed = time.monotonic() - start_time
+            result.timings = result.login.timings if result.login else automation.state.timer.durations()
+
+        return result
@@ -0,0 +1,80 @@
+import asyncio
+import urllib.parse
+from typing import Callable, Dict, List, Optional, Set
+from src.config import EVENT_MAX_TASKS
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+class EventDispatcher:
+    """Bounded, supervised task group for one session's async page-event handlers.
+
+    on() installs a listener that runs a cheap synchronous predicate first and
+    only then starts a task, never more than max_tasks at once (extra events
+    are counted and dropped). Handler errors are logged, not lost, and close()
+    cancels whatever is still running. POST bodies are parsed at most once per
+    request through post_form(), shared by the route and event handlers.
+    """
+    def __init__(self, max_tasks: int = EVENT_MAX_TASKS):
+        self.max_tasks = max_tasks
+        self.dropped = 0
+        self.failed = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._post_forms: Dict[object, Dict[str, List[str]]] = {}
+        self._closed = False
+
+    def on(self, emitter, event: str, handler: Callable, predicate: Optional[Callable] = None):
+        """emitter.on(event, ...) that runs async handler(arg) only for events passing predicate(arg)"""
+        def listener(arg):
+            if predicate is None or predicate(arg):
+                self.spawn(handler, arg)
+        emitter.on(event, listener)
+
+    def spawn(self, handler: Callable, *args) -> Optional[asyncio.Task]:
+        if self._closed:
+            return None
+        if len(self._tasks) >= self.max_tasks:
+            self.dropped += 1
+            log.debug(f"   ⚠️ Event handler limit ({self.max_tasks}) reached - dropped {handler.__name__}")
+            return None
+        task = asyncio.ensure_future(handler(*args))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.failed += 1
+            log.warning(f"   ⚠️ Event handler failed: {error!r}")
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def post_form(self, request) -> Dict[str, List[str]]:
+        """The request's url-encoded POST body as parse_qs output, parsed once per request"""
+        form = self._post_forms.get(request)
+        if form is None:
+            try:
+                form = urllib.parse.parse_qs(request.post_data or '')
+            except Exception:
+                form = {}
+            self._post_forms[request] = form
+        return form
+
+    async def close(self):
+        """Stop accepting events and cancel running handlers (session teardown)"""
+        self._closed = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._post_forms.clear()
+        if self.dropped:
+            log.info(f"   📉 {self.dropped} page event(s) dropped at the handler limit")
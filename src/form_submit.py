@@ -0,0 +1,146 @@
+from typing import Optional
+from urllib.parse import urljoin
+from src.page_snapshot import SUCCESS_KEYWORDS
+from src.page_helpers import register_helper, call_helper
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# FormSubmission.outcome
+SUBMIT_ACCEPTED = 'accepted'
+SUBMIT_CAPTCHA_REJECTED = 'captcha_rejected'
+SUBMIT_CERTIFICATE_NOT_FOUND = 'certificate_not_found'
+SUBMIT_UNKNOWN = 'unknown'
+SUBMIT_NOT_SENT = 'not_sent'  # No request left the page - the DOM submit path is still safe
+
+# Reads the login form and POSTs it with fetch() from inside the page. The request
+# goes through the remote browser (proxy, client certificate, cookies, page.route
+# gate) exactly like a button click would, and Set-Cookie is applied to the browser.
+# Redirects are not followed: after a login the SSO redirects to another origin,
+# which a followed fetch would turn into a CORS error. A redirect reply comes back
+# as an opaque redirect (no status or Location visible to the page); submit_form
+# reads the real status and Location from the browser's network events instead.
+# Once fetch() was called the POST may have gone out, so errors count as sent -
+# its token must not be submitted again.
+SUBMIT_SCRIPT = """
+    async ([token, timeoutMs, bodyLimit]) => {
+        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        const form = (textarea && textarea.form) || document.querySelector('form');
+        if (!form) return { sent: false, error: 'No form found' };
+
+        const body = new URLSearchParams();
+        for (const [name, value] of new FormData(form).entries()) {
+            if (typeof value !== 'string') continue;
+            const isResponseField = name === 'h-captcha-response' || name === 'g-recaptcha-response';
+            body.append(name, isResponseField && token ? token : value);
+        }
+        if (token && !body.has('h-captcha-response')) body.append('h-captcha-response', token);
+
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), timeoutMs);
+        let response;
+        try {
+            response = await fetch(form.action, {
+                method: 'POST', body: body, credentials: 'include', redirect: 'manual', signal: controller.signal,
+            });
+        } catch (e) {
+            return { sent: true, action: form.action, error: String(e) };
+        } finally {
+            clearTimeout(timer);
+        }
+        if (response.type === 'opaqueredirect' || (response.status >= 300 && response.status < 400)) {
+            const location = response.headers.get('location');
+            return {
+                sent: true, action: form.action, status: response.status,
+                url: location ? new URL(location, form.action).href : null,
+                redirected: true, opaqueRedirect: true, body: '',
+            };
+        }
+        const text = await response.text();
+        return {
+            sent: true, action: form.action, status: response.status, url: response.url,
+            redirected: response.redirected, body: text.substring(0, bodyLimit),
+        };
+    }
+"""
+register_helper('post', SUBMIT_SCRIPT)
+
+
+def is_login_url(url: str) -> bool:
+    """True for the SSO login page (where a failed or expired login ends up)"""
+    return 'login' in (url or '').lower()
+
+
+def classify_submission(status: int, url: str, body: str, redirected: bool) -> str:
+    """Login outcome from the final status, URL and body of the form POST"""
+    lower = (body or '').lower()
+    if 'captcha inválido' in lower or ('captcha' in lower and 'invalid' in lower):
+        return SUBMIT_CAPTCHA_REJECTED
+    if 'certificado digital não encontrado' in lower:
+        return SUBMIT_CERTIFICATE_NOT_FOUND
+    if status < 400 and redirected and not is_login_url(url):
+        return SUBMIT_ACCEPTED
+    if status < 300 and any(keyword in lower for keyword in SUCCESS_KEYWORDS):
+        return SUBMIT_ACCEPTED
+    return SUBMIT_UNKNOWN
+
+
+class FormSubmission:
+    """Result of submit_form(): whether the POST went out and what the server answered"""
+    def __init__(self, sent: bool, action: Optional[str] = None, status: Optional[int] = None,
+                 url: Optional[str] = None, redirected: bool = False, body: str = '', error: Optional[str] = None,
+                 opaque_redirect: bool = False):
+        self.sent = sent
+        self.action = action
+        self.status = status
+        self.url = url
+        self.redirected = redirected
+        self.body = body
+        self.error = error
+        # The reply was a redirect the page could not look into (url is its Location when known)
+        self.opaque_redirect = opaque_redirect
+        if not sent:
+            self.outcome = SUBMIT_NOT_SENT
+        elif opaque_redirect:
+            # Accepted only when the redirect is known to lead away from the login page
+            self.outcome = SUBMIT_ACCEPTED if url and not is_login_url(url) else SUBMIT_UNKNOWN
+        elif status is None:
+            self.outcome = SUBMIT_UNKNOWN
+        else:
+            self.outcome = classify_submission(status, url or '', body, redirected)
+
+    def __repr__(self):
+        return f"<FormSubmission {self.outcome} status={self.status} url={self.url}>"
+
+
+async def submit_form(page, token: Optional[str] = None, timeout: float = 45, body_limit: int = 20000) -> FormSubmission:
+    """POST the login form in one HTTP exchange; token overrides the captcha response fields"""
+    # The page only sees an opaque redirect - the browser's response event has the real status and Location
+    posts = []
+
+    def on_response(response):
+        if response.request.method == 'POST':
+            posts.append(response)
+
+    page.on('response', on_response)
+    try:
+        reply = await call_helper(page, 'post', [token, int(timeout * 1000), body_limit])
+    except Exception as e:
+        # The page navigated away or the evaluate failed - nothing is known to have been sent
+        log.warning(f"   ⚠️ HTTP submit failed: {e}")
+        return FormSubmission(False, error=str(e))
+    finally:
+        page.remove_listener('response', on_response)
+
+    status, url = reply.get('status'), reply.get('url')
+    if reply.get('opaqueRedirect') and url is None:
+        response = next((r for r in posts if r.url == reply.get('action')), None)
+        location = response.headers.get('location') if response is not None else None
+        if location:
+            status, url = response.status, urljoin(response.url, location)
+    return FormSubmission(
+        reply.get('sent', False), action=reply.get('action'), status=status, url=url,
+        redirected=reply.get('redirected', False), body=reply.get('body') or '', error=reply.get('error'),
+        opaque_redirect=reply.get('opaqueRedirect', False),
+    )
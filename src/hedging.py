@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Optional
+from src.config import (
+    HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_DEFAULT_DELAY, HEDGE_BUDGET, HEDGE_BUDGET_BURST, METRICS_ENABLED,
+)
+from src.metrics import get_metrics
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# Metrics phase holding the end-to-end latency of successful logins
+LOGIN_PHASE = 'login'
+
+
+class HedgePolicy:
+    """How long a login may run before a hedge is started: a percentile of recorded login latencies"""
+    def __init__(self, metrics=None, percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES,
+                 default_delay: float = HEDGE_DEFAULT_DELAY):
+        self.metrics = metrics or (get_metrics() if METRICS_ENABLED else None)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+
+    def delay(self) -> float:
+        histogram = self.metrics.histograms.get(LOGIN_PHASE) if self.metrics is not None else None
+        if histogram is None or len(histogram.samples) < self.min_samples:
+            return self.default_delay
+        return histogram.quantile(self.percentile)
+
+
+class HedgeBudget:
+    """Caps extra spend: every login deposits `ratio` credits (up to `burst`), every hedge costs one"""
+    def __init__(self, ratio: float = HEDGE_BUDGET, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = burst
+        self.logins = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_login(self):
+        with self._lock:
+            self.logins += 1
+            self.credits = min(self.burst, self.credits + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.credits < 1:
+                return False
+            self.credits -= 1
+            self.hedges += 1
+            return True
+
+
+_default_budget = None
+
+
+def get_hedge_budget() -> HedgeBudget:
+    """Process-wide budget shared by all sessions"""
+    global _default_budget
+    if _default_budget is None:
+        _default_budget = HedgeBudget()
+    return _default_budget
+
+
+async def run_hedged(automation, playwright, policy: Optional[HedgePolicy] = None,
+                     budget: Optional[HedgeBudget] = None):
+    """Run automation; past the policy delay start automation.hedge_twin() too and keep the first success.
+
+    The other session is cancelled, which releases its browser. Returns the winner's
+    LoginResult, or the primary's when both fail; hedged is True only when the hedge won.
+    """
+    policy = policy or HedgePolicy(automation.metrics)
+    budget = budget or get_hedge_budget()
+    budget.record_login()
+
+    primary = asyncio.ensure_future(automation.run_with_playwright(playwright))
+    tasks = [primary]
+    try:
+        delay = policy.delay()
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if not budget.try_acquire():
+            log.info(f"   💸 Login slower than {delay:.1f}s but the hedge budget is spent - not hedging")
+            return await primary
+
+        twin = automation.hedge_twin()
+        log.info(f"   🪁 Login slower than {delay:.1f}s (p{policy.percentile * 100:g}) - "
+                 f"starting hedge session {twin.session_id}")
+        hedge = asyncio.ensure_future(twin.run_with_playwright(playwright))
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and task.result().success:
+                    result = task.result()
+                    result.hedge_started = True
+                    result.hedged = task is hedge
+                    log.info(f"   🏁 {'Hedge' if task is hedge else 'Original'} session won the race")
+                    return result
+        log.warning("   ⚠️ Neither the login nor its hedge succeeded")
+        result = primary.result()
+        result.hedge_started = True
+        return result
+    finally:
+        # The loser is cancelled and allowed to run its cleanup (browser release) before returning
+        losers = [task for task in tasks if not task.done()]
+        for task in losers:
+            task.cancel()
+        await asyncio.gather(*losers, return_exceptions=True)
@@ -0,0 +1,235 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from src.config import JOB_QUEUE_DB, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF, CERTIFICATE_PASSWORD
+from src.result import FAILURE_EXCEPTION, FAILURE_TIMEOUT, FAILURE_UPSTREAM_UNAVAILABLE
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# QueuedJob.status
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_EXPIRED = 'expired'  # Deadline passed before a worker got to it
+
+# Failures worth another attempt (up to JOB_MAX_ATTEMPTS); the rest will fail the same way again
+RETRYABLE_FAILURES = (FAILURE_UPSTREAM_UNAVAILABLE, FAILURE_TIMEOUT, FAILURE_EXCEPTION)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch TEXT NOT NULL,
+        certificate_path TEXT NOT NULL,
+        password_env TEXT,
+        target_url TEXT,
+        deadline REAL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        not_before REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (batch, status, deadline);
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id INTEGER NOT NULL REFERENCES jobs (id),
+        batch TEXT NOT NULL,
+        session_id TEXT,
+        success INTEGER NOT NULL,
+        status TEXT,
+        failure_class TEXT,
+        error TEXT,
+        final_url TEXT,
+        attempts INTEGER,
+        hedged INTEGER,
+        elapsed REAL,
+        timings TEXT,
+        started_at REAL,
+        finished_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS results_job ON results (job_id);
+    CREATE INDEX IF NOT EXISTS results_batch_failure ON results (batch, failure_class);
+"""
+
+
+class QueuedJob:
+    """A row of the jobs table: certificate, target flow (login URL) and deadline (latest start, epoch seconds)"""
+    def __init__(self, id: int, batch: str, certificate_path: str, password_env: Optional[str],
+                 target_url: Optional[str], deadline: Optional[float], status: str, attempts: int,
+                 not_before: Optional[float] = None):
+        self.id = id
+        self.batch = batch
+        self.certificate_path = certificate_path
+        self.password_env = password_env
+        self.target_url = target_url
+        self.deadline = deadline
+        self.status = status
+        self.attempts = attempts
+        self.not_before = not_before  # A retried job waits until then (epoch seconds)
+
+    @property
+    def certificate_password(self) -> Optional[str]:
+        # Passwords stay out of the database: a job names the environment variable holding it
+        return os.getenv(self.password_env) if self.password_env else CERTIFICATE_PASSWORD
+
+    @property
+    def session_id(self) -> str:
+        return f"{self.batch}-{self.id}"
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return self.deadline is not None and (now or time.time()) > self.deadline
+
+    def __repr__(self):
+        return f"<QueuedJob {self.session_id}: {self.status} ({self.certificate_path})>"
+
+
+class JobQueue:
+    """Durable login job queue and result table in one SQLite file.
+
+    Jobs are claimed earliest deadline first; a retried job only becomes due
+    after a backoff that doubles per attempt. Every state change is committed
+    before the next job starts, so an interrupted batch resumes with
+    recover(): jobs that were running go back to pending, finished ones are
+    never redone. Each finished login adds a row to the results table.
+    """
+    def __init__(self, path: str = JOB_QUEUE_DB, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 retry_backoff: float = JOB_RETRY_BACKOFF):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        # Queues created before retries were delayed lack the column
+        columns = {row['name'] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        if 'not_before' not in columns:
+            with self.db:
+                self.db.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+
+    def close(self):
+        self.db.close()
+
+    def add(self, batch: str, certificate_path: str, target_url: Optional[str] = None,
+            deadline: Optional[float] = None, password_env: Optional[str] = None) -> int:
+        now = time.time()
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO jobs (batch, certificate_path, password_env, target_url, deadline, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (batch, certificate_path, password_env, target_url, deadline, now, now),
+            )
+        return cursor.lastrowid
+
+    def recover(self, batch: str) -> int:
+        """Put jobs left running by an interrupted batch back in the queue; returns how many"""
+        with self.db:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE batch = ? AND status = ?",
+                (JOB_PENDING, time.time(), batch, JOB_RUNNING),
+            )
+        if cursor.rowcount:
+            log.info(f"   ♻️ {cursor.rowcount} interrupted job(s) of batch '{batch}' back in the queue")
+        return cursor.rowcount
+
+    def claim(self, batch: str) -> Optional[QueuedJob]:
+        """Next due pending job (earliest deadline first), marked running; expired ones are closed on the way"""
+        while True:
+            with self.db:
+                row = self.db.execute(
+                    "SELECT * FROM jobs WHERE batch = ? AND status = ? AND (not_before IS NULL OR not_before <= ?)"
+                    " ORDER BY deadline IS NULL, deadline, id LIMIT 1",
+                    (batch, JOB_PENDING, time.time()),
+                ).fetchone()
+                if row is None:
+                    return None
+                job = self._job(row)
+                if job.expired():
+                    self._set_status(job, JOB_EXPIRED)
+                    self._insert_result(job, {'success': False, 'failure_class': JOB_EXPIRED,
+                                              'error': "Deadline passed before the job started"})
+                    log.warning(f"   ⌛ Job {job.session_id} expired before it could start")
+                    continue
+                job.attempts += 1
+                self.db.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, updated_at = ? WHERE id = ?",
+                    (JOB_RUNNING, job.attempts, time.time(), job.id),
+                )
+                job.status = JOB_RUNNING
+                return job
+
+    def next_due(self, batch: str) -> Optional[float]:
+        """When the earliest waiting retry becomes due (epoch seconds); None if no job is pending"""
+        row = self.db.execute(
+            "SELECT COUNT(*), MIN(COALESCE(not_before, 0)) FROM jobs WHERE batch = ? AND status = ?",
+            (batch, JOB_PENDING),
+        ).fetchone()
+        return row[1] if row[0] else None
+
+    def complete(self, job: QueuedJob, outcome: dict):
+        """Store a finished login (SessionResult-like dict) and close or requeue the job"""
+        with self.db:
+            self._insert_result(job, outcome)
+            if outcome.get('success'):
+                status = JOB_DONE
+            elif outcome.get('failure_class') in RETRYABLE_FAILURES and job.attempts < self.max_attempts:
+                status = JOB_PENDING
+                # An upstream outage or timeout rarely clears up at once: back off 1x, 2x, 4x...
+                job.not_before = time.time() + self.retry_backoff * 2 ** (job.attempts - 1)
+                self.db.execute("UPDATE jobs SET not_before = ? WHERE id = ?", (job.not_before, job.id))
+            else:
+                status = JOB_FAILED
+            self._set_status(job, status)
+
+    def _set_status(self, job: QueuedJob, status: str):
+        job.status = status
+        self.db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job.id))
+
+    def _insert_result(self, job: QueuedJob, outcome: dict):
+        self.db.execute(
+            "INSERT INTO results (job_id, batch, session_id, success, status, failure_class, error, final_url,"
+            " attempts, hedged, elapsed, timings, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.batch, outcome.get('session_id', job.session_id), int(bool(outcome.get('success'))),
+             outcome.get('status'), outcome.get('failure_class'), outcome.get('error'), outcome.get('final_url'),
+             outcome.get('attempts'), int(bool(outcome.get('hedged'))), outcome.get('elapsed'),
+             json.dumps(outcome.get('timings') or {}), outcome.get('started_at'), time.time()),
+        )
+
+    @staticmethod
+    def _job(row) -> QueuedJob:
+        return QueuedJob(row['id'], row['batch'], row['certificate_path'], row['password_env'], row['target_url'],
+                         row['deadline'], row['status'], row['attempts'], row['not_before'])
+
+    def pending(self, batch: str) -> List[QueuedJob]:
+        rows = self.db.execute("SELECT * FROM jobs WHERE batch = ? AND status = ?", (batch, JOB_PENDING)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def summary(self, batch: str) -> Dict[str, object]:
+        """Job counts per status and the failure classes of the latest result of each failed job"""
+        statuses = dict(self.db.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE batch = ? GROUP BY status", (batch,)
+        ).fetchall())
+        failures = dict(self.db.execute(
+            "SELECT r.failure_class, COUNT(*) FROM results r JOIN jobs j ON j.id = r.job_id"
+            " WHERE r.batch = ? AND j.status IN (?, ?)"
+            " AND r.id = (SELECT MAX(id) FROM results WHERE job_id = r.job_id) GROUP BY r.failure_class",
+            (batch, JOB_FAILED, JOB_EXPIRED),
+        ).fetchall())
+        elapsed = self.db.execute(
+            "SELECT AVG(elapsed), MAX(elapsed) FROM results WHERE batch = ? AND success = 1", (batch,)
+        ).fetchone()
+        return {
+            'jobs': sum(statuses.values()),
+            'statuses': statuses,
+            'failures': failures,
+            'mean_success_seconds': round(elapsed[0], 1) if elapsed[0] is not None else None,
+            'max_success_seconds': round(elapsed[1], 1) if elapsed[1] is not None else None,
+        }
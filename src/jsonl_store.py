@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from typing import List
+
+
+class JsonlStore:
+    """Append-only JSON-lines file that keeps only the most recent records.
+
+    Used for the small local histories (wait calibration, solve stats, ...)
+    that drive adaptive timing decisions.
+    """
+    def __init__(self, path: str, max_records: int = 5000):
+        self.path = path
+        self.max_records = max_records
+        self._records = None
+
+    def load(self) -> List[dict]:
+        """Return cached records, reading the file on first use"""
+        if self._records is None:
+            records = []
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            # A torn last line after a crash should not poison the history
+                            continue
+            self._records = records[-self.max_records:]
+        return self._records
+
+    def append(self, record: dict) -> dict:
+        record.setdefault('ts', time.time())
+        records = self.load()
+        records.append(record)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if len(records) > self.max_records * 2:
+            # Compact: rewrite only the retained window
+            del records[:-self.max_records]
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for r in records:
+                    f.write(json.dumps(r, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+        else:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return record
+
+    def recent(self, limit: int = None) -> List[dict]:
+        records = self.load()
+        window = records[-self.max_records:]
+        return window[-limit:] if limit else window
@@ -0,0 +1,119 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Optional
+from src.config import LOG_LEVEL, LOG_FORMAT
+
+
+# Session of the task currently running (set by run_with_playwright); "-" outside a session
+session_id_var = contextvars.ContextVar('sa_session_id', default='-')
+
+_ROOT = 'sa'
+_listener = None
+
+
+class _SessionFilter(logging.Filter):
+    """Stamp every record with a session id (explicit extra wins over the context variable)"""
+    def filter(self, record):
+        if not hasattr(record, 'session_id'):
+            record.session_id = session_id_var.get()
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """The familiar emoji console output, prefixed with the session when more than one may run"""
+    def format(self, record):
+        message = super().format(record)
+        if record.session_id in ('-', 'main'):
+            return message
+        # Keep leading blank lines in front of the prefix
+        stripped = message.lstrip('\n')
+        return '\n' * (len(message) - len(stripped)) + f"[{record.session_id}] {stripped}"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line for log shippers"""
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'session': record.session_id,
+            'msg': record.getMessage().strip(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SessionLogger(logging.LoggerAdapter):
+    """Logger bound to one session id - used where callbacks run outside the session's task"""
+    def process(self, msg, kwargs):
+        extra = kwargs.setdefault('extra', {})
+        extra.setdefault('session_id', self.extra['session_id'])
+        return msg, kwargs
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Route all 'sa.*' loggers through a queue drained by a background thread.
+
+    Callers on the event loop only pay for an in-memory enqueue; terminal or
+    file I/O happens on the listener thread. Records go to stderr so stdout
+    stays clean for machine-readable output (--service JSON, batch status).
+    Called once by each entry point; safe to call more than once.
+    """
+    global _listener
+    root = logging.getLogger(_ROOT)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue() if hasattr(queue, 'SimpleQueue') else queue.Queue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_SessionFilter())
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter('%(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str, session_id: Optional[str] = None):
+    """Logger under the 'sa' hierarchy; bound to session_id when given (output starts with setup_logging)"""
+    logger = logging.getLogger(f"{_ROOT}.{name.rsplit('.', 1)[-1]}")
+    if session_id is not None:
+        return SessionLogger(logger, {'session_id': session_id})
+    return logger
+
+
+def debug_enabled() -> bool:
+    """True when DEBUG records would be emitted (decides whether chatty listeners are attached)"""
+    return logging.getLogger(_ROOT).isEnabledFor(logging.DEBUG)
+
+
+def flush_logging(timeout: float = 1.0):
+    """Best effort wait until queued records are written (e.g. before an input() prompt)"""
+    if _listener is None:
+        return
+    deadline = time.monotonic() + timeout
+    while not _listener.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
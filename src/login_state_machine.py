@@ -0,0 +1,336 @@
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+from src.config import AUTO_SUBMIT_WAIT, CAPTCHA_POST_SOLVE_WAIT, SUBMIT_MODE, TOKEN_REUSE
+from src.form_submit import (
+    SUBMIT_ACCEPTED, SUBMIT_CAPTCHA_REJECTED, SUBMIT_CERTIFICATE_NOT_FOUND, SUBMIT_NOT_SENT,
+)
+from src.network_profile import is_submit_url
+from src.page_snapshot import SUCCESS_KEYWORDS, take_snapshot, button_locator
+from src.page_helpers import call_helper
+from src.result import (
+    FAILURE_CAPTCHA_REJECTED, FAILURE_CAPTCHA_UNSOLVED, FAILURE_CERTIFICATE_NOT_RECOGNIZED, FAILURE_PAGE_ERROR,
+    FAILURE_TIMEOUT,
+)
+
+
+# Login page states
+LANDING = 'landing'
+CERT_CHOICE = 'cert_choice'
+CAPTCHA = 'captcha'
+TOKEN_READY = 'token_ready'
+SUBMITTED = 'submitted'
+AUTHENTICATED = 'authenticated'
+FAILED = 'failed'
+
+FINAL_STATES = (AUTHENTICATED, FAILED)
+
+# Seconds a state may last before the login is given up
+DEFAULT_STATE_TIMEOUTS = {
+    LANDING: 30,
+    CERT_CHOICE: 20,
+    CAPTCHA: 150,
+    TOKEN_READY: 60,
+    SUBMITTED: 45,
+}
+
+# Evaluated in the page until it returns a state name: resolves on the first
+# render that shows the captcha, the certificate choice or a logged-in page.
+LANDING_PREDICATE = """
+    ([loginUrl, successKeywords]) => {
+        for (const iframe of document.querySelectorAll('iframe')) {
+            const src = (iframe.getAttribute('src') || '').toLowerCase();
+            const title = (iframe.getAttribute('title') || '').toLowerCase();
+            if (!src.includes('hcaptcha') && !title.includes('hcaptcha')) continue;
+            const rect = iframe.getBoundingClientRect();
+            if (rect.width > 0 && rect.height > 0) return 'captcha';
+        }
+        const text = document.body ? (document.body.innerText || '').toLowerCase() : '';
+        if (text.includes('certificado') && text.includes('selecione')) return 'cert_choice';
+        const url = location.href.toLowerCase();
+        const offLogin = location.href !== loginUrl && !url.includes('login') && !url.includes('certificado');
+        if (offLogin || successKeywords.some(kw => text.includes(kw))) return 'authenticated';
+        return false;
+    }
+"""
+
+# Resolves with the token once hCaptcha has put one in the page
+TOKEN_PREDICATE = """
+    () => {
+        try {
+            const token = window.hcaptcha && window.hcaptcha.getResponse && window.hcaptcha.getResponse();
+            if (token && token.length > 1000) return token;
+        } catch (e) {}
+        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        if (textarea && textarea.value && textarea.value.length > 1000) return textarea.value;
+        return window.__captcha_token_captured || false;
+    }
+"""
+
+SUBMIT_SELECTORS = [
+    'button[type="submit"]',
+    'input[type="submit"]',
+    'form button:not([type="button"])',
+    'button.govbr-button',
+    'button:has-text("Entrar")',
+    'button:has-text("Continuar")',
+]
+
+
+class LoginStateMachine:
+    """Drives the login page through explicit states instead of a polling loop.
+
+    landing -> [cert_choice ->] captcha -> token_ready -> submitted -> authenticated | failed
+
+    Every state waits on an event (in-page predicate, captcha solve, token
+    binding, submit response or navigation) with its own timeout, and its
+    duration is recorded as a 'state_<name>' phase.
+    """
+    def __init__(self, automation, page, captcha_solver, timeouts: Optional[Dict[str, float]] = None,
+                 max_captcha_attempts: int = 3, max_transitions: int = 30):
+        self.automation = automation
+        self.page = page
+        self.captcha_solver = captcha_solver
+        self.timeouts = dict(DEFAULT_STATE_TIMEOUTS, **(timeouts or {}))
+        self.max_captcha_attempts = max_captcha_attempts
+        # Guards against cycles such as landing <-> cert_choice on a page that never changes
+        self.max_transitions = max_transitions
+        self.log = automation.log
+        self.state = LANDING
+        # (state, seconds spent in it) in visiting order
+        self.history: List[Tuple[str, float]] = []
+        self.captcha_attempts = 0
+        self.token: Optional[str] = None
+        self._submit_response = None
+
+    @property
+    def session(self):
+        return self.automation.state
+
+    async def run(self) -> bool:
+        """Run until authenticated or failed; True when authenticated"""
+        handlers = {
+            LANDING: self._landing,
+            CERT_CHOICE: self._cert_choice,
+            CAPTCHA: self._captcha,
+            TOKEN_READY: self._token_ready,
+            SUBMITTED: self._submitted,
+        }
+        while self.state not in FINAL_STATES:
+            if len(self.history) >= self.max_transitions:
+                self.log.error(f"   ❌ Gave up after {len(self.history)} state transitions")
+                self.state = self._fail(FAILURE_PAGE_ERROR)
+                break
+            state = self.state
+            started = time.monotonic()
+            with self.session.timer.span(f'state_{state}'):
+                try:
+                    next_state = await asyncio.wait_for(handlers[state](), timeout=self.timeouts[state])
+                except asyncio.TimeoutError:
+                    self.log.error(f"   ⏰ No progress in state '{state}' after {self.timeouts[state]:g}s")
+                    next_state = self._fail(FAILURE_TIMEOUT)
+            elapsed = time.monotonic() - started
+            self.history.append((state, elapsed))
+            self.log.info(f"   🔀 {state} -> {next_state} ({elapsed:.1f}s)")
+            self.state = next_state
+        self._cancel_submit_response()
+        return self.state == AUTHENTICATED
+
+    def _fail(self, failure_class: str) -> str:
+        self.session.failure_class = failure_class
+        return FAILED
+
+    async def _landing(self) -> str:
+        """Wait for the first render that shows the captcha, the certificate choice or a logged-in page"""
+        while True:
+            try:
+                handle = await self.page.wait_for_function(
+                    LANDING_PREDICATE, arg=[self.automation.target_url, SUCCESS_KEYWORDS],
+                    timeout=self.timeouts[LANDING] * 1000,
+                )
+                return await handle.json_value()
+            except PlaywrightTimeoutError:
+                raise asyncio.TimeoutError()
+            except PlaywrightError as e:
+                if 'context was destroyed' not in str(e) and 'navigat' not in str(e):
+                    raise
+                # Execution context destroyed by a navigation - look at the new document
+                await self.page.wait_for_load_state('domcontentloaded')
+
+    async def _cert_choice(self) -> str:
+        """Pick the certificate option, then wait for the page it leads to"""
+        snapshot = await take_snapshot(self.page)
+        options = snapshot.buttons_with_text('certificado') if snapshot else []
+        if not options:
+            return LANDING
+        self.log.info("   📜 Certificate selection - choosing the certificate option")
+        async with self.page.expect_event('framenavigated', predicate=lambda frame: frame == self.page.main_frame):
+            await button_locator(self.page, options[0]).click()
+        return LANDING
+
+    async def _captcha(self) -> str:
+        """Get a solved, unsubmitted token: reuse one, join the early solve, or solve now"""
+        if self.captcha_attempts >= self.max_captcha_attempts:
+            self.log.error(f"   ❌ Max captcha attempts ({self.max_captcha_attempts}) reached")
+            return self._fail(FAILURE_CAPTCHA_UNSOLVED if self.token is None else FAILURE_CAPTCHA_REJECTED)
+        self.captcha_attempts += 1
+        self.log.info(f"   🤖 hCaptcha attempt {self.captcha_attempts}/{self.max_captcha_attempts}")
+        session = self.session
+        session.timer.stop('captcha_detection')
+        early_solve, session.solve_task = session.solve_task, None
+        session.early_solve_started = True
+        await self.automation.extract_captcha_config(self.page)
+
+        manager = self.automation.token_manager
+        reused = manager.fresh() if TOKEN_REUSE and early_solve is None else None
+        if reused is not None:
+            self.log.info(f"   ♻️ Reusing unsubmitted token from {reused.source} (age {reused.age:.1f}s)")
+            self.token = reused.token
+            session.token_solved_at = reused.solved_at
+            return TOKEN_READY
+
+        if early_solve is not None:
+            self.log.info("   ⚡ Joining the solve started when the captcha frame attached...")
+            try:
+                success = await early_solve
+            except Exception as e:
+                self.log.warning(f"   ⚠️ Early solve failed: {e}")
+                success = False
+            solved_at = session.solve_finished_at
+        else:
+            if session.token_capture is not None:
+                session.token_capture.reset()
+            with session.timer.span('solve'):
+                success = await self.captcha_solver.solve_with_retry(max_retries=2)
+            solved_at = time.monotonic()
+        if not success:
+            self.log.warning("   ⚠️ Captcha solve failed")
+            await self.automation.reset_captcha_widget(self.page)
+            return CAPTCHA
+
+        session.token_solved_at = solved_at or time.monotonic()
+        if not self.automation.adaptive_waits:
+            self.log.info(f"   ⏳ Waiting {CAPTCHA_POST_SOLVE_WAIT} seconds for hCaptcha to validate the token...")
+            await asyncio.sleep(CAPTCHA_POST_SOLVE_WAIT)
+
+        with session.timer.span('token_capture'):
+            token, source = await self._await_token()
+        if token is None:
+            self.log.warning("   ⚠️ Solve reported success but no token reached the page")
+            await self.automation.reset_captcha_widget(self.page)
+            return CAPTCHA
+        self.log.info(f"   🎯 Token via {source} ({len(token)} chars)")
+        manager.add(token, source, session.token_solved_at)
+        self.token = token
+        return TOKEN_READY
+
+    async def _await_token(self):
+        """(token, source) from the request gate, the page binding or the page itself; (None, None) if absent"""
+        session = self.session
+        if session.captured_token_from_request and len(session.captured_token_from_request) > 1000:
+            return session.captured_token_from_request, 'blocked-request'
+        if session.token_capture is not None:
+            captured = await session.token_capture.wait(AUTO_SUBMIT_WAIT)
+            if captured is not None:
+                return captured.token, captured.source
+        try:
+            handle = await self.page.wait_for_function(TOKEN_PREDICATE, timeout=AUTO_SUBMIT_WAIT * 1000)
+            return await handle.json_value(), 'page'
+        except Exception:
+            return None, None
+
+    async def _token_ready(self) -> str:
+        """Put the token in the form, check the form and send it"""
+        session = self.session
+        manager = self.automation.token_manager
+        if manager.is_expiring(self.token):
+            self.log.warning(f"   ⚠️ Token has only {manager.remaining(self.token):.0f}s left - solving a fresh one")
+            manager.mark_rejected(self.token)
+            await self.automation.reset_captcha_widget(self.page)
+            return CAPTCHA
+
+        with session.timer.span('injection'):
+            in_page = await call_helper(self.page, 'token')
+            if in_page != self.token:
+                await self.automation.inject_captcha_token(self.page, self.token)
+            await self.automation._join_form_ready()
+            ready = await self.automation.verify_token_ready(self.page)
+        if not ready:
+            self.log.warning("   ⚠️ Form not ready - missing token or CSRF")
+            await self.automation.reset_captcha_widget(self.page)
+            return CAPTCHA
+        session.ready_to_submit = True
+
+        if SUBMIT_MODE == "http":
+            return await self._submit_http()
+        return await self._submit_dom()
+
+    async def _submit_http(self) -> str:
+        submission = await self.automation._submit_via_http(self.page, self.token)
+        if submission.outcome == SUBMIT_ACCEPTED:
+            return AUTHENTICATED
+        if submission.outcome == SUBMIT_CAPTCHA_REJECTED:
+            # The reply carried a new form (fresh _csrf) - load it and solve again
+            await self.page.goto(self.automation.target_url, wait_until='domcontentloaded', timeout=30000)
+            return LANDING
+        if submission.outcome == SUBMIT_CERTIFICATE_NOT_FOUND:
+            return self._fail(FAILURE_CERTIFICATE_NOT_RECOGNIZED)
+        if submission.outcome != SUBMIT_NOT_SENT:
+            await self.page.goto(submission.url or self.automation.target_url, wait_until='domcontentloaded', timeout=30000)
+            return LANDING
+        self.log.info("   ↩️ Falling back to clicking the submit button")
+        return await self._submit_dom()
+
+    async def _submit_dom(self) -> str:
+        """Click submit; the SUBMITTED state waits for the server's reply"""
+        self._cancel_submit_response()
+        self._submit_response = asyncio.ensure_future(self.page.wait_for_event(
+            'response', predicate=lambda r: r.request.method == 'POST' and is_submit_url(r.url),
+            timeout=self.timeouts[SUBMITTED] * 1000,
+        ))
+        # Retrieved here if the click never happens and nobody awaits it
+        self._submit_response.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self.session.timer.start('submit')
+        for selector in SUBMIT_SELECTORS:
+            button = self.page.locator(selector).first
+            try:
+                if await button.is_visible():
+                    self.log.info(f"   🔘 Clicking submit button: {selector}")
+                    await button.click()
+                    return SUBMITTED
+            except Exception:
+                continue
+        self.session.timer.cancel('submit')
+        self._cancel_submit_response()
+        self.log.warning("   ⚠️ Could not find or click submit button")
+        return self._fail(FAILURE_PAGE_ERROR)
+
+    async def _submitted(self) -> str:
+        """Wait for the POST reply and the page it leads to, then classify"""
+        session = self.session
+        response, self._submit_response = await self._submit_response, None
+        session.timer.stop('submit')
+        self.log.info(f"   📬 Response status: {response.status}")
+        with session.timer.span('redirect'):
+            await self.page.wait_for_load_state('domcontentloaded')
+            snapshot = await take_snapshot(self.page)
+        if snapshot is None:
+            return LANDING
+        if snapshot.captcha_invalid:
+            self.log.warning("   ⚠️ 'Captcha inválido' - resetting widget and solving again")
+            self.automation.token_manager.mark_rejected(self.token)
+            await self.automation.reset_captcha_widget(self.page)
+            return CAPTCHA
+        if snapshot.certificate_not_found:
+            return self._fail(FAILURE_CERTIFICATE_NOT_RECOGNIZED)
+        on_login = 'login' in snapshot.url.lower() or snapshot.url == self.automation.target_url
+        if not on_login or snapshot.success_keywords:
+            self.log.info(f"   🎉 Authentication succeeded! URL: {snapshot.url}")
+            return AUTHENTICATED
+        return LANDING
+
+    def _cancel_submit_response(self):
+        if self._submit_response is not None and not self._submit_response.done():
+            self._submit_response.cancel()
+        self._submit_response = None
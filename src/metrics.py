@@ -0,0 +1,214 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from src.config import METRICS_JSON_PATH, METRICS_PROM_PATH
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# Phases of one login attempt, in flow order
+PHASES = [
+    'connect', 'certificate_injection', 'navigation', 'networkidle', 'captcha_detection',
+    'solve', 'token_capture', 'injection', 'submit', 'redirect',
+]
+
+# Seconds - login phases range from tens of milliseconds to a minute
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a bounded window of raw samples for quantiles"""
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_samples: int = 2000):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: List[float] = []
+        self.max_samples = max_samples
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+        self.samples.append(value)
+        if len(self.samples) > self.max_samples:
+            del self.samples[:len(self.samples) - self.max_samples]
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets], self.bucket_counts)),
+            'samples': [round(s, 4) for s in self.samples],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, max_samples: int = 2000) -> 'Histogram':
+        histogram = cls(buckets=[float(b) for b in data.get('buckets', {})] or DEFAULT_BUCKETS, max_samples=max_samples)
+        if data.get('buckets'):
+            histogram.bucket_counts = list(data['buckets'].values())
+        histogram.count = data.get('count', 0)
+        histogram.sum = data.get('sum', 0.0)
+        histogram.samples = list(data.get('samples', []))[-max_samples:]
+        return histogram
+
+
+class MetricsRegistry:
+    """Per-phase latency histograms, exportable as JSON and as a Prometheus textfile.
+
+    When a JSON export already exists it is loaded first, so histograms keep
+    aggregating across separate process runs.
+    """
+    def __init__(self, json_path: str = METRICS_JSON_PATH, prom_path: str = METRICS_PROM_PATH):
+        self.json_path = json_path
+        self.prom_path = prom_path
+        self.histograms: Dict[str, Histogram] = {}
+        self._load()
+
+    def _load(self):
+        if not self.json_path or not os.path.exists(self.json_path):
+            return
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for phase, histogram in data.get('phases', {}).items():
+                self.histograms[phase] = Histogram.from_dict(histogram)
+        except (OSError, ValueError) as e:
+            log.warning(f"   ⚠️ Could not load previous metrics ({e}) - starting fresh")
+
+    def observe(self, phase: str, seconds: float):
+        if phase not in self.histograms:
+            self.histograms[phase] = Histogram()
+        self.histograms[phase].observe(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            phase: {'count': h.count, 'p50': h.quantile(0.5), 'p95': h.quantile(0.95), 'p99': h.quantile(0.99)}
+            for phase, h in self.histograms.items()
+        }
+
+    @staticmethod
+    def _atomic_write(path: str, content: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def export_json(self, path: Optional[str] = None):
+        data = {
+            'updated_at': time.time(),
+            'phases': {phase: h.to_dict() for phase, h in self.histograms.items()},
+        }
+        self._atomic_write(path or self.json_path, json.dumps(data, indent=2))
+
+    def export_prometheus(self, path: Optional[str] = None):
+        """Write a node_exporter textfile-collector compatible file"""
+        lines = [
+            '# HELP sa_login_phase_seconds Duration of login phases.',
+            '# TYPE sa_login_phase_seconds histogram',
+        ]
+        for phase, h in sorted(self.histograms.items()):
+            for bound, count in zip(h.buckets, h.bucket_counts):
+                lines.append(f'sa_login_phase_seconds_bucket{{phase="{phase}",le="{bound:g}"}} {count}')
+            lines.append(f'sa_login_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {h.count}')
+            lines.append(f'sa_login_phase_seconds_sum{{phase="{phase}"}} {h.sum:.6f}')
+            lines.append(f'sa_login_phase_seconds_count{{phase="{phase}"}} {h.count}')
+
+        lines.append('# HELP sa_login_phase_quantile_seconds Recent-window quantiles of login phases.')
+        lines.append('# TYPE sa_login_phase_quantile_seconds gauge')
+        for phase, h in sorted(self.histograms.items()):
+            for q in (0.5, 0.95, 0.99):
+                value = h.quantile(q)
+                if value is not None:
+                    lines.append(f'sa_login_phase_quantile_seconds{{phase="{phase}",quantile="{q}"}} {value:.6f}')
+        self._atomic_write(path or self.prom_path, '\n'.join(lines) + '\n')
+
+    def export(self):
+        """Write both exports; never lets a metrics problem break a login"""
+        try:
+            if self.json_path:
+                self.export_json()
+            if self.prom_path:
+                self.export_prometheus()
+        except OSError as e:
+            log.warning(f"   ⚠️ Could not export metrics: {e}")
+
+    def log_summary(self):
+        log.info("\n⏱️  PHASE LATENCY (p50 / p95 / p99, seconds)")
+        ordered = [p for p in PHASES if p in self.histograms] + sorted(set(self.histograms) - set(PHASES))
+        for phase in ordered:
+            h = self.histograms[phase]
+            p50, p95, p99 = (h.quantile(q) for q in (0.5, 0.95, 0.99))
+            log.info(f"   {phase:<22} n={h.count:<4} {p50:7.2f} / {p95:7.2f} / {p99:7.2f}")
+
+
+class PhaseTimer:
+    """Monotonic spans for one login attempt, fed into a MetricsRegistry"""
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry
+        self.spans: List[tuple] = []
+        self._open: Dict[str, float] = {}
+
+    def start(self, phase: str):
+        self._open.setdefault(phase, time.monotonic())
+
+    def stop(self, phase: str) -> Optional[float]:
+        started = self._open.pop(phase, None)
+        if started is None:
+            return None
+        return self._record(phase, started, time.monotonic())
+
+    def cancel(self, phase: str):
+        self._open.pop(phase, None)
+
+    @contextmanager
+    def span(self, phase: str):
+        """with timer.span('solve'): await ... - recorded even if the body raises"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record(phase, started, time.monotonic())
+
+    def _record(self, phase: str, started: float, ended: float) -> float:
+        elapsed = ended - started
+        self.spans.append((phase, started, ended))
+        if self.registry is not None:
+            self.registry.observe(phase, elapsed)
+        return elapsed
+
+    def durations(self) -> Dict[str, float]:
+        """Total seconds per phase for this attempt (repeated phases are summed)"""
+        totals: Dict[str, float] = {}
+        for phase, started, ended in self.spans:
+            totals[phase] = totals.get(phase, 0.0) + (ended - started)
+        return totals
+
+
+_default_registry = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide registry shared by all sessions"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = MetricsRegistry()
+    return _default_registry
@@ -0,0 +1,72 @@
+import asyncio
+import re
+from typing import List
+from src.config import RESOURCE_BLOCK_PROFILE, EXTRA_BLOCKED_URLS
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# Form POSTs we inspect. Regex routes are matched by the Playwright driver,
+# so any other request never makes the round trip to Python.
+SUBMIT_URL_PATTERNS = ['/login', '/auth', '/certificado']
+SUBMIT_ROUTE_REGEX = re.compile('|'.join(re.escape(p) for p in SUBMIT_URL_PATTERNS))
+
+# Trailing '*' so versioned URLs (font.woff2?v=3) match as well
+_FONTS = ['*.woff*', '*.ttf*', '*.otf*', '*.eot*']
+_MEDIA = ['*.mp4*', '*.webm*', '*.mp3*', '*.ogg*', '*.wav*', '*.m4a*']
+_TRACKERS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*hotjar.com*', '*connect.facebook.net*', '*clarity.ms*', '*nr-data.net*',
+]
+# Only gov.br's own images: hCaptcha challenge images must keep loading
+_SITE_IMAGES = ['*gov.br/*.png*', '*gov.br/*.jpg*', '*gov.br/*.jpeg*', '*gov.br/*.gif*',
+                '*gov.br/*.svg*', '*gov.br/*.webp*', '*gov.br/*.ico*']
+
+BLOCK_PROFILES = {
+    'none': [],
+    'lean': _FONTS + _MEDIA + _TRACKERS,
+    'strict': _FONTS + _MEDIA + _TRACKERS + _SITE_IMAGES,
+}
+
+
+def is_submit_url(url: str) -> bool:
+    return any(pattern in url for pattern in SUBMIT_URL_PATTERNS)
+
+
+def wildcard_to_regex(pattern: str):
+    """CDP-style '*' wildcard pattern as a route regex (also matched driver-side)"""
+    return re.compile('^' + '.*'.join(re.escape(part) for part in pattern.split('*')) + '$')
+
+
+def blocked_url_patterns(profile: str = RESOURCE_BLOCK_PROFILE) -> List[str]:
+    if profile not in BLOCK_PROFILES:
+        raise ValueError(f"Unknown resource block profile '{profile}' (expected one of {', '.join(BLOCK_PROFILES)})")
+    extra = [p.strip() for p in EXTRA_BLOCKED_URLS.split(',') if p.strip()]
+    return BLOCK_PROFILES[profile] + extra
+
+
+async def apply_block_profile(page, cdp_session, profile: str = RESOURCE_BLOCK_PROFILE) -> int:
+    """Stop the browser from fetching resources the login flow does not need.
+
+    Network.setBlockedURLs blocks inside the browser with no per-request
+    round trip; if the remote browser refuses it, the same patterns are
+    aborted through driver-matched routes instead. Returns the pattern count.
+    """
+    patterns = blocked_url_patterns(profile)
+    if not patterns:
+        return 0
+
+    try:
+        # Written back to back (in order) - one round trip instead of two
+        await asyncio.gather(
+            cdp_session.send('Network.enable'),
+            cdp_session.send('Network.setBlockedURLs', {'urls': patterns}),
+        )
+        log.info(f"   🚫 Blocking profile '{profile}': {len(patterns)} URL patterns (browser-side)")
+    except Exception as e:
+        log.warning(f"   ⚠️ Network.setBlockedURLs unavailable ({e}) - blocking via routes")
+        for pattern in patterns:
+            await page.route(wildcard_to_regex(pattern), lambda route: route.abort())
+        log.info(f"   🚫 Blocking profile '{profile}': {len(patterns)} URL patterns (route-side)")
+    return len(patterns)
@@ -0,0 +1,430 @@
+import json
+import weakref
+from typing import Dict
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# Returned by a helper call when the page has no bundle (yet)
+MISSING = '__sa_missing__'
+
+# name -> JavaScript function source; every module registers the helpers it calls
+_helpers: Dict[str, str] = {}
+_bundle = None
+_installed = weakref.WeakSet()
+
+
+def register_helper(name: str, source: str):
+    """Add a function to the window.__sa bundle (call at import time)"""
+    global _bundle
+    _helpers[name] = source.strip()
+    _bundle = None
+
+
+def bundle_source() -> str:
+    """The whole bundle as one script: defines window.__sa in the top frame, once per document"""
+    global _bundle
+    if _bundle is None:
+        body = ',\n'.join(f"        {name}: {source}" for name, source in sorted(_helpers.items()))
+        _bundle = (
+            "(() => {\n"
+            "    if (window !== window.top || window.__sa) return;\n"
+            f"    Object.defineProperty(window, '__sa', {{ value: Object.freeze({{\n{body}\n    }}) }});\n"
+            "})();"
+        )
+    return _bundle
+
+
+async def install_helpers(context):
+    """Parse the bundle once per document of this context instead of once per call"""
+    if context in _installed:
+        return
+    await context.add_init_script(script=bundle_source())
+    _installed.add(context)
+
+
+async def call_helper(page, name: str, *args):
+    """window.__sa.<name>(*args) in the page; installs the bundle first if the document predates it"""
+    expression = f"a => window.__sa ? __sa.{name}(...a) : '{MISSING}'"
+    result = await page.evaluate(expression, list(args))
+    if result == MISSING:
+        log.debug(f"   Helper bundle missing in {page.url} - installing it in the page")
+        await page.evaluate(bundle_source())
+        result = await page.evaluate(expression, list(args))
+    return result
+
+
+async def cdp_call_helper(cdp_session, name: str, *args):
+    """call_helper() over a raw CDP session (Runtime.evaluate)"""
+    expression = f"window.__sa ? __sa.{name}(...{json.dumps(list(args))}) : '{MISSING}'"
+    params = {'expression': expression, 'returnByValue': True}
+    reply = await cdp_session.send('Runtime.evaluate', params)
+    if reply.get('result', {}).get('value') == MISSING:
+        await cdp_session.send('Runtime.evaluate', {'expression': bundle_source()})
+        reply = await cdp_session.send('Runtime.evaluate', params)
+    return reply.get('result', {}).get('value')
+
+
+# Helpers used by the login flow (automation.py)
+
+TOKEN_VALUE_SCRIPT = """
+    () => document.querySelector('textarea[name="h-captcha-response"]')?.value || ''
+"""
+
+TOKEN_LENGTH_SCRIPT = """
+    () => document.querySelector('textarea[name="h-captcha-response"]')?.value.length || 0
+"""
+
+CAPTURED_TOKEN_SCRIPT = """
+    () => window.__captcha_token_captured
+"""
+
+CAPTCHA_CONFIG_SCRIPT = """
+    () => {
+        const el = document.querySelector('.h-captcha, [data-hcaptcha-widget-id], [data-sitekey]');
+        return {
+            sitekey: el?.getAttribute('data-sitekey') || null,
+            rqdata: el?.getAttribute('data-rqdata') || null,
+            isEnterprise: !!el?.getAttribute('data-rqdata')
+        };
+    }
+"""
+
+VERIFY_SCRIPT = """
+    () => {
+        const tokenEl = document.querySelector('textarea[name="h-captcha-response"]');
+        const token = tokenEl?.value || '';
+        const csrfEl = document.querySelector('input[name="_csrf"]');
+        const csrf = csrfEl?.value || '';
+        const authzEl = document.querySelector('input[name="authorization_id"]');
+        const authz = authzEl?.value || '';
+
+        // Get all form inputs to debug
+        const form = document.querySelector('form');
+        const allInputs = form ? Array.from(form.querySelectorAll('input, textarea')).map(el => ({
+            name: el.name,
+            type: el.type || 'textarea',
+            hasValue: !!el.value,
+            valueLength: (el.value || '').length
+        })) : [];
+
+        return {
+            hasToken: token.length > 1000,
+            tokenLength: token.length,
+            hasCsrf: csrf.length > 0,
+            hasAuthz: authz.length > 0,
+            csrfValue: csrf.substring(0, 20),
+            authzValue: authz.substring(0, 20),
+            formAction: document.querySelector('form')?.action || 'none',
+            allInputs: allInputs
+        };
+    }
+"""
+
+FIND_TOKEN_SCRIPT = """
+    () => {
+        // Try multiple methods to get the token
+        let token = null;
+
+        // Method 1: Check if hcaptcha has getResponse
+        if (window.hcaptcha && window.hcaptcha.getResponse) {
+            try {
+                token = window.hcaptcha.getResponse();
+                if (token) return token;
+            } catch(e) {}
+        }
+
+        // Method 2: Check the textarea directly
+        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        if (textarea && textarea.value) {
+            return textarea.value;
+        }
+
+        // Method 3: Check g-recaptcha-response (fallback)
+        const gTextarea = document.querySelector('textarea[name="g-recaptcha-response"]');
+        if (gTextarea && gTextarea.value) {
+            return gTextarea.value;
+        }
+
+        return null;
+    }
+"""
+
+INJECT_SCRIPT = """
+    (token) => {
+        // Method 1: Direct h-captcha-response textarea (if exists)
+        let textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        if (textarea) {
+            textarea.value = token;
+            textarea.style.display = 'block';  // Make visible for debugging
+
+            // Trigger all possible events
+            textarea.dispatchEvent(new Event('input', { bubbles: true }));
+            textarea.dispatchEvent(new Event('change', { bubbles: true }));
+            textarea.dispatchEvent(new Event('blur', { bubbles: true }));
+
+            return { success: true, method: 'h-captcha-response', length: textarea.value.length };
+        }
+
+        // Method 2: Find form and create textarea in it
+        const form = document.querySelector('form');
+        if (form) {
+            // Create textarea if needed
+            textarea = document.createElement('textarea');
+            textarea.name = 'h-captcha-response';
+            textarea.style.display = 'none';
+            textarea.value = token;
+            form.appendChild(textarea);
+
+            console.log('✅ Created textarea in form, length:', token.length);
+            return { success: true, method: 'created-in-form', length: token.length };
+        }
+
+        // Method 3: Find hCaptcha container and create textarea
+        const hcaptchaDiv = document.querySelector('.h-captcha, [data-sitekey], [data-hcaptcha-widget-id]');
+        if (hcaptchaDiv) {
+            textarea = document.createElement('textarea');
+            textarea.name = 'h-captcha-response';
+            textarea.style.display = 'none';
+            textarea.value = token;
+
+            // Try to add to parent form if exists
+            let parentForm = hcaptchaDiv.closest('form');
+            if (parentForm) {
+                parentForm.appendChild(textarea);
+                console.log('✅ Created textarea in parent form');
+            } else {
+                hcaptchaDiv.appendChild(textarea);
+                console.log('✅ Created textarea in hCaptcha div');
+            }
+
+            return { success: true, method: 'created-textarea', length: token.length };
+        }
+
+        // Method 4: Try g-recaptcha-response as fallback
+        const gTextarea = document.querySelector('textarea[name="g-recaptcha-response"]');
+        if (gTextarea) {
+            gTextarea.value = token;
+            gTextarea.dispatchEvent(new Event('input', { bubbles: true }));
+            gTextarea.dispatchEvent(new Event('change', { bubbles: true }));
+            return { success: true, method: 'g-recaptcha-response', length: token.length };
+        }
+
+        return { success: false, method: 'none', error: 'No form or hCaptcha container found' };
+    }
+"""
+
+RESET_WIDGET_SCRIPT = """
+    () => {
+        if (window.hcaptcha) {
+            try {
+                // Try to reset all widgets
+                const widgets = document.querySelectorAll('[data-hcaptcha-widget-id]');
+                widgets.forEach(w => {
+                    const id = w.getAttribute('data-hcaptcha-widget-id');
+                    if (id) window.hcaptcha.reset(id);
+                });
+
+                // Fallback: reset first widget
+                if (window.hcaptcha.reset) {
+                    window.hcaptcha.reset();
+                }
+            } catch (e) {
+                console.error('Reset failed:', e);
+            }
+        }
+    }
+"""
+
+WATCH_TOKEN_SCRIPT = """
+    () => {
+        window.__captcha_token_captured = null;
+        window.__token_observer_active = true;
+
+        // Method 0: Intercept hCaptcha callback
+        if (window.hcaptcha) {
+            const originalSetResponse = window.hcaptcha.setResponse || (() => {});
+            window.hcaptcha.setResponse = function(widgetId, token) {
+                if (token && token.length > 1000) {
+                    console.log('🎯 TOKEN CAPTURED from hcaptcha.setResponse:', token.length, 'chars');
+                    window.__captcha_token_captured = token;
+                    window.__token_observer_active = false;
+                }
+                return originalSetResponse.apply(this, arguments);
+            };
+        }
+
+        // Method 1: MutationObserver on textarea
+        const observer = new MutationObserver(() => {
+            if (!window.__token_observer_active) return;
+            const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+            if (textarea && textarea.value && textarea.value.length > 1000) {
+                console.log('🎯 TOKEN CAPTURED from textarea:', textarea.value.length, 'chars');
+                window.__captcha_token_captured = textarea.value;
+                window.__token_observer_active = false;
+            }
+        });
+        observer.observe(document.body, {
+            childList: true,
+            subtree: true,
+            attributes: true,
+            attributeFilter: ['value']
+        });
+
+        // Method 2: Poll for token every 100ms
+        const pollInterval = setInterval(() => {
+            if (!window.__token_observer_active) {
+                clearInterval(pollInterval);
+                return;
+            }
+
+            // Check textarea
+            const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+            if (textarea && textarea.value && textarea.value.length > 1000) {
+                console.log('🎯 TOKEN CAPTURED (poll):', textarea.value.length, 'chars');
+                window.__captcha_token_captured = textarea.value;
+                window.__token_observer_active = false;
+                clearInterval(pollInterval);
+                return;
+            }
+
+            // Check hCaptcha API
+            if (window.hcaptcha && window.hcaptcha.getResponse) {
+                try {
+                    const token = window.hcaptcha.getResponse();
+                    if (token && token.length > 1000) {
+                        console.log('🎯 TOKEN CAPTURED from API (poll):', token.length, 'chars');
+                        window.__captcha_token_captured = token;
+                        window.__token_observer_active = false;
+                        clearInterval(pollInterval);
+                    }
+                } catch(e) {}
+            }
+        }, 100);
+
+        console.log('✅ Token observer activated (3 methods)');
+    }
+"""
+
+API_TOKEN_SCRIPT = """
+    () => {
+        if (window.hcaptcha && window.hcaptcha.getResponse) {
+            try {
+                const token = window.hcaptcha.getResponse();
+                if (token && token.length > 1000) {
+                    return token;
+                }
+            } catch(e) {
+                console.error('Failed to get hcaptcha response:', e);
+            }
+        }
+        return null;
+    }
+"""
+
+SEARCH_TOKEN_SCRIPT = """
+    () => {
+        // Check captured token first
+        if (window.__captcha_token_captured && window.__captcha_token_captured.length > 1000) {
+            return { source: 'observer-delayed', token: window.__captcha_token_captured };
+        }
+
+        // Method 1: hCaptcha API
+        if (window.hcaptcha && window.hcaptcha.getResponse) {
+            try {
+                const token = window.hcaptcha.getResponse();
+                if (token && token.length > 100) {
+                    return { source: 'hcaptcha.getResponse', token: token };
+                }
+            } catch(e) {}
+        }
+
+        // Method 2: Textarea
+        const textarea = document.querySelector('textarea[name="h-captcha-response"]');
+        if (textarea && textarea.value && textarea.value.length > 100) {
+            return { source: 'textarea', token: textarea.value };
+        }
+
+        // Method 3: All textareas (in case of dynamic creation)
+        const allTextareas = document.querySelectorAll('textarea');
+        for (const ta of allTextareas) {
+            if (ta.value && ta.value.length > 1000 && ta.value.startsWith('P')) {
+                return { source: 'textarea-search', token: ta.value };
+            }
+        }
+
+        return { source: 'none', token: null };
+    }
+"""
+
+FORM_DATA_SCRIPT = """
+    () => {
+        const form = document.querySelector('form');
+        if (!form) return null;
+
+        const data = {};
+        const formData = new FormData(form);
+        for (let [key, value] of formData.entries()) {
+            data[key] = value;
+        }
+
+        // Get CSRF token
+        const csrfInput = form.querySelector('input[name="_csrf"], input[name="csrf_token"]');
+        if (csrfInput) data['_csrf'] = csrfInput.value;
+
+        return {
+            action: form.action,
+            method: form.method,
+            data: data
+        };
+    }
+"""
+
+BYPASS_SUBMIT_SCRIPT = """
+    (tokenValue) => {
+        const form = document.querySelector('form');
+        if (!form) return { success: false, error: 'No form found' };
+
+        // Ensure token textarea exists
+        let textarea = form.querySelector('textarea[name="h-captcha-response"]');
+        if (!textarea) {
+            textarea = document.createElement('textarea');
+            textarea.name = 'h-captcha-response';
+            textarea.style.display = 'none';
+            form.appendChild(textarea);
+        }
+        textarea.value = tokenValue;
+
+        console.log('🚀 Submitting form with token:', tokenValue.length, 'chars');
+
+        // Find and click submit button
+        const submitBtn = form.querySelector('button[type="submit"], input[type="submit"]');
+        if (submitBtn) {
+            submitBtn.click();
+            return { success: true, method: 'button-click' };
+        }
+
+        // Fallback: trigger form submit
+        form.submit();
+        return { success: true, method: 'form-submit' };
+    }
+"""
+
+
+for _name, _source in [
+    ('captchaConfig', CAPTCHA_CONFIG_SCRIPT),
+    ('verify', VERIFY_SCRIPT),
+    ('findToken', FIND_TOKEN_SCRIPT),
+    ('inject', INJECT_SCRIPT),
+    ('token', TOKEN_VALUE_SCRIPT),
+    ('tokenLength', TOKEN_LENGTH_SCRIPT),
+    ('resetWidget', RESET_WIDGET_SCRIPT),
+    ('watchToken', WATCH_TOKEN_SCRIPT),
+    ('capturedToken', CAPTURED_TOKEN_SCRIPT),
+    ('apiToken', API_TOKEN_SCRIPT),
+    ('searchToken', SEARCH_TOKEN_SCRIPT),
+    ('formData', FORM_DATA_SCRIPT),
+    ('bypassSubmit', BYPASS_SUBMIT_SCRIPT),
+]:
+    register_helper(_name, _source)
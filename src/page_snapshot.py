@@ -0,0 +1,186 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+from src.page_helpers import register_helper, call_helper
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# Everything the login flow may want to click, in document order
+CLICKABLE_SELECTOR = 'button, input[type="submit"], a'
+
+# The snapshot tags each visible clickable with its PageButton.index, so the locator finds
+# exactly that element (page.locator().nth() counts differently once shadow DOM is involved)
+BUTTON_TAG_ATTRIBUTE = 'data-sa-button'
+
+SUCCESS_KEYWORDS = ['sucesso', 'bem-vindo', 'dashboard', 'autenticado', 'logado']
+
+SNAPSHOT_SCRIPT = """
+    ([clickableSelector, successKeywords, tagAttribute]) => {
+        const isVisible = (el) => {
+            const rect = el.getBoundingClientRect();
+            const style = window.getComputedStyle(el);
+            return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+        };
+        const text = document.body ? (document.body.innerText || '') : '';
+        const lower = text.toLowerCase();
+
+        const captchaFrames = [];
+        for (const iframe of document.querySelectorAll('iframe')) {
+            const src = iframe.getAttribute('src') || '';
+            const title = iframe.getAttribute('title') || '';
+            if (src.toLowerCase().includes('hcaptcha') || title.toLowerCase().includes('hcaptcha')) {
+                captchaFrames.push({ src: src, title: title, visible: isVisible(iframe) });
+            }
+        }
+
+        const buttons = [];
+        // Tags from an earlier snapshot would point at stale indexes
+        document.querySelectorAll('[' + tagAttribute + ']').forEach(el => el.removeAttribute(tagAttribute));
+        document.querySelectorAll(clickableSelector).forEach((el, index) => {
+            if (!isVisible(el)) return;
+            el.setAttribute(tagAttribute, String(index));
+            buttons.push({
+                index: index,
+                tag: el.tagName.toLowerCase(),
+                type: (el.getAttribute('type') || '').toLowerCase(),
+                text: ((el.innerText || el.value || '') + '').trim().substring(0, 100)
+            });
+        });
+
+        const form = document.querySelector('form');
+        const formFields = form ? Array.from(form.querySelectorAll('input, textarea')).map(el => ({
+            name: el.name || '',
+            type: el.type || 'textarea',
+            hasValue: !!el.value,
+            valueLength: (el.value || '').length
+        })) : [];
+
+        const certButton = document.querySelector('#login-certificate');
+
+        return {
+            url: location.href,
+            title: document.title || '',
+            certButtonVisible: !!certButton && isVisible(certButton),
+            captchaFrames: captchaFrames,
+            hcaptchaContainer: !!document.querySelector('div.h-captcha, [data-hcaptcha-widget-id]'),
+            buttons: buttons,
+            formAction: form ? form.action : null,
+            formFields: formFields,
+            captchaInvalid: lower.includes('captcha inválido'),
+            mentionsCertificate: lower.includes('certificado'),
+            certificateSelection: lower.includes('certificado') && lower.includes('selecione'),
+            certificateNotFound: lower.includes('certificado digital não encontrado'),
+            mentionsError: lower.includes('erro'),
+            cpfLogin: lower.includes('digite seu cpf') || lower.includes('número do cpf'),
+            successKeywords: successKeywords.filter(kw => lower.includes(kw)),
+            textPreview: text.substring(0, 600)
+        };
+    }
+"""
+register_helper('snapshot', SNAPSHOT_SCRIPT)
+
+
+@dataclass
+class CaptchaFrame:
+    src: str
+    title: str
+    visible: bool
+
+
+@dataclass
+class PageButton:
+    index: int
+    tag: str
+    type: str
+    text: str
+
+    def has_text(self, needle: str) -> bool:
+        return needle.lower() in self.text.lower()
+
+
+@dataclass
+class FormField:
+    name: str
+    type: str
+    has_value: bool
+    value_length: int
+
+
+@dataclass
+class PageSnapshot:
+    """Everything handle_page_elements looks at, collected in a single page.evaluate"""
+    url: str
+    title: str = ''
+    cert_button_visible: bool = False
+    captcha_frames: List[CaptchaFrame] = field(default_factory=list)
+    hcaptcha_container: bool = False
+    buttons: List[PageButton] = field(default_factory=list)
+    form_action: Optional[str] = None
+    form_fields: List[FormField] = field(default_factory=list)
+    captcha_invalid: bool = False
+    mentions_certificate: bool = False
+    certificate_selection: bool = False
+    certificate_not_found: bool = False
+    mentions_error: bool = False
+    cpf_login: bool = False
+    success_keywords: List[str] = field(default_factory=list)
+    text_preview: str = ''
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PageSnapshot':
+        return cls(
+            url=data.get('url', ''),
+            title=data.get('title', ''),
+            cert_button_visible=data.get('certButtonVisible', False),
+            captcha_frames=[CaptchaFrame(**f) for f in data.get('captchaFrames', [])],
+            hcaptcha_container=data.get('hcaptchaContainer', False),
+            buttons=[PageButton(**b) for b in data.get('buttons', [])],
+            form_action=data.get('formAction'),
+            form_fields=[
+                FormField(f['name'], f['type'], f['hasValue'], f['valueLength'])
+                for f in data.get('formFields', [])
+            ],
+            captcha_invalid=data.get('captchaInvalid', False),
+            mentions_certificate=data.get('mentionsCertificate', False),
+            certificate_selection=data.get('certificateSelection', False),
+            certificate_not_found=data.get('certificateNotFound', False),
+            mentions_error=data.get('mentionsError', False),
+            cpf_login=data.get('cpfLogin', False),
+            success_keywords=data.get('successKeywords', []),
+            text_preview=data.get('textPreview', ''),
+        )
+
+    @property
+    def captcha_visible(self) -> bool:
+        return any(f.visible for f in self.captcha_frames)
+
+    def find_button(self, texts=(), types=(), tags=('button', 'input')) -> Optional[PageButton]:
+        """First visible button whose text contains one of texts or whose type is in types (in the given priority order)"""
+        for text in texts:
+            for button in self.buttons:
+                if button.tag in tags and button.has_text(text):
+                    return button
+        for button_type in types:
+            for button in self.buttons:
+                if button.tag in tags and button.type == button_type:
+                    return button
+        return None
+
+    def buttons_with_text(self, text: str) -> List[PageButton]:
+        return [b for b in self.buttons if b.has_text(text)]
+
+
+async def take_snapshot(page) -> Optional[PageSnapshot]:
+    """Collect the page state in one round trip; None if the page could not be evaluated"""
+    try:
+        data = await call_helper(page, 'snapshot', [CLICKABLE_SELECTOR, SUCCESS_KEYWORDS, BUTTON_TAG_ATTRIBUTE])
+        return PageSnapshot.from_dict(data)
+    except Exception as e:
+        log.warning(f"   ⚠️ Could not take page snapshot: {e}")
+        return None
+
+
+def button_locator(page, button: PageButton):
+    """Locator for a button reported by the latest snapshot (by the tag it set on the element)"""
+    return page.locator(f'[{BUTTON_TAG_ATTRIBUTE}="{button.index}"]')
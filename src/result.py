@@ -0,0 +1,72 @@
+from typing import Dict, List, Optional
+
+
+# LoginResult.status
+STATUS_SUCCESS = 'success'
+STATUS_SESSION_REUSED = 'session_reused'  # Cached authenticated session still valid - no login performed
+STATUS_FAILED = 'failed'
+
+# LoginResult.failure_class - stable identifiers a worker can branch on
+FAILURE_CERTIFICATE_INVALID = 'certificate_invalid'  # Rejected locally (see error for the reason)
+FAILURE_CERTIFICATE_REJECTED = 'certificate_rejected'  # Browser.addCertificate refused it
+FAILURE_CERTIFICATE_NOT_RECOGNIZED = 'certificate_not_recognized'  # gov.br did not accept it
+FAILURE_CAPTCHA_UNSOLVED = 'captcha_unsolved'
+FAILURE_CAPTCHA_REJECTED = 'captcha_rejected'  # "Captcha inválido" after submission
+FAILURE_PAGE_ERROR = 'page_error'
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_EXCEPTION = 'exception'
+FAILURE_UPSTREAM_UNAVAILABLE = 'upstream_unavailable'  # Bright Data circuit open - login not attempted
+
+
+class LoginResult:
+    """Outcome of BrightDataFullAutomation.run(); truthy when the session is authenticated"""
+    def __init__(self, session_id: str, status: str = STATUS_FAILED):
+        self.session_id = session_id
+        self.status = status
+        self.final_url: Optional[str] = None
+        self.storage_state: Optional[dict] = None
+        # Seconds per phase of the last attempt
+        self.timings: Dict[str, float] = {}
+        self.failure_class: Optional[str] = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.elapsed = 0.0
+        # A speculative second session was started (see src/hedging.py), and whether it is the one that won
+        self.hedge_started = False
+        self.hedged = False
+
+    @property
+    def success(self) -> bool:
+        return self.status in (STATUS_SUCCESS, STATUS_SESSION_REUSED)
+
+    @property
+    def cookies(self) -> List[dict]:
+        return (self.storage_state or {}).get('cookies', [])
+
+    def __bool__(self):
+        return self.success
+
+    def fail(self, failure_class: str, error: Optional[str] = None) -> 'LoginResult':
+        self.status = STATUS_FAILED
+        self.failure_class = failure_class
+        self.error = error
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            'session_id': self.session_id,
+            'status': self.status,
+            'final_url': self.final_url,
+            'storage_state': self.storage_state,
+            'timings': {phase: round(seconds, 3) for phase, seconds in self.timings.items()},
+            'failure_class': self.failure_class,
+            'error': self.error,
+            'attempts': self.attempts,
+            'elapsed': round(self.elapsed, 3),
+            'hedge_started': self.hedge_started,
+            'hedged': self.hedged,
+        }
+
+    def __repr__(self):
+        detail = self.final_url if self.success else f"{self.failure_class}: {self.error or ''}"
+        return f"<LoginResult {self.session_id}: {self.status} ({detail}) in {self.elapsed:.1f}s>"
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+from typing import Optional
+from src.config import (
+    SESSION_CACHE_DIR, SESSION_CACHE_TTL, SESSION_CACHE_MAX_ENTRIES, SESSION_PROBE_URL,
+)
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+class SessionCache:
+    """On-disk cache of authenticated storage_state (cookies + local storage) per certificate.
+
+    Entries expire after ttl seconds; beyond max_entries the least recently
+    used ones are evicted. Files are written owner-only since they hold
+    live session cookies. index.json is rewritten whole from the in-memory
+    index, so all sessions of a process share one instance (get_session_cache).
+    """
+    def __init__(self, cache_dir: str = SESSION_CACHE_DIR, ttl: float = SESSION_CACHE_TTL,
+                 max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._index = None
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _write_json(self, path: str, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _entry_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}.json")
+
+    def _drop(self, fingerprint: str):
+        self._load_index().pop(fingerprint, None)
+        try:
+            os.remove(self._entry_path(fingerprint))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _cookies_alive(storage_state: dict, now: float) -> bool:
+        """Cheap local check: at least one cookie that is a session cookie or not yet expired"""
+        cookies = storage_state.get('cookies', [])
+        return any(c.get('expires', -1) in (-1, None) or c['expires'] > now for c in cookies)
+
+    def get(self, fingerprint: str) -> Optional[dict]:
+        """Return the cached storage_state if it is fresh and still has live cookies"""
+        index = self._load_index()
+        meta = index.get(fingerprint)
+        if not meta:
+            return None
+
+        now = time.time()
+        if meta['expires_at'] <= now:
+            self._drop(fingerprint)
+            self._write_json(self._index_path, index)
+            return None
+
+        try:
+            with open(self._entry_path(fingerprint), 'r', encoding='utf-8') as f:
+                storage_state = json.load(f)
+        except (OSError, ValueError):
+            self._drop(fingerprint)
+            self._write_json(self._index_path, index)
+            return None
+
+        if not self._cookies_alive(storage_state, now):
+            self.invalidate(fingerprint)
+            return None
+
+        meta['last_used'] = now
+        self._write_json(self._index_path, index)
+        return storage_state
+
+    def put(self, fingerprint: str, storage_state: dict, final_url: str = ''):
+        now = time.time()
+        index = self._load_index()
+        self._write_json(self._entry_path(fingerprint), storage_state)
+        index[fingerprint] = {
+            'created_at': now,
+            'last_used': now,
+            'expires_at': now + self.ttl,
+            'final_url': final_url,
+        }
+        self._evict(now)
+        self._write_json(self._index_path, index)
+
+    def invalidate(self, fingerprint: str):
+        if fingerprint in self._load_index():
+            self._drop(fingerprint)
+            self._write_json(self._index_path, self._index)
+
+    def _evict(self, now: float):
+        index = self._load_index()
+        for fingerprint in [fp for fp, meta in index.items() if meta['expires_at'] <= now]:
+            self._drop(fingerprint)
+        if len(index) > self.max_entries:
+            by_age = sorted(index.items(), key=lambda item: item[1]['last_used'])
+            for fingerprint, _ in by_age[:len(index) - self.max_entries]:
+                self._drop(fingerprint)
+
+
+_default_cache = None
+
+
+def get_session_cache() -> SessionCache:
+    """Process-wide session cache shared by all sessions"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SessionCache()
+    return _default_cache
+
+
+async def apply_storage_state(context, page, storage_state: dict):
+    """Load cookies into the context and seed local storage for the given page"""
+    cookies = storage_state.get('cookies', [])
+    if cookies:
+        await context.add_cookies(cookies)
+
+    origins = [o for o in storage_state.get('origins', []) if o.get('localStorage')]
+    if origins:
+        # Local storage can only be written from the origin itself - seed it before page scripts run.
+        # Page-scoped so nothing is left behind on a shared (not owned) browser context
+        await page.add_init_script(script="""
+            (origins => {
+                const entry = origins.find(o => o.origin === location.origin);
+                if (!entry) return;
+                for (const item of entry.localStorage) {
+                    try { localStorage.setItem(item.name, item.value); } catch (e) {}
+                }
+            })(%s)
+        """ % json.dumps(origins))
+
+
+async def probe_session(page, probe_url: str = SESSION_PROBE_URL) -> bool:
+    """Open the probe URL in the page (through the remote browser): logged in unless bounced to the SSO login"""
+    try:
+        response = await page.goto(probe_url, wait_until='domcontentloaded', timeout=30000)
+        url = page.url
+        if 'sso.acesso.gov.br' in url or 'login' in url.lower():
+            return False
+        return response is None or response.ok
+    except Exception as e:
+        log.warning(f"   ⚠️ Session probe failed: {e}")
+        return False
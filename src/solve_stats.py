@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional
+from src.config import (
+    SOLVE_STATS_STORE, SOLVE_STATS_MIN_SAMPLES, SOLVE_TIMEOUT_PERCENTILE, SOLVE_TIMEOUT_MIN, SOLVE_TIMEOUT_MAX,
+)
+from src.jsonl_store import JsonlStore
+from src.metrics import Histogram
+
+
+# Statuses whose duration is a real solve time
+SOLVED_STATUSES = ('solve_finished', 'solve_skipped')
+# waitForSolve gave up on our side; it still solved when the token turned up in the page
+STATUS_TIMEOUT = 'timeout'
+
+# Headroom over the chosen percentile, and extra per retry attempt
+TIMEOUT_HEADROOM = 1.25
+ATTEMPT_GROWTH = 0.25
+
+
+def is_solved(status: str, token_present: Optional[bool] = None) -> bool:
+    """The one rule for "this solve left a token in the page" (SolveResult.ok and the stats agree on it)"""
+    return status in SOLVED_STATUSES or (status == STATUS_TIMEOUT and bool(token_present))
+
+
+class SolveStats:
+    """Rolling history of captcha solve outcomes that sizes the solver's timeouts.
+
+    Every solve stores its status (solve_finished, solve_skipped, not_detected,
+    solve_failed, timeout, ...) and how long the backend took. The detect
+    timeout is the `percentile` solve time of successful solves plus headroom,
+    growing per retry attempt and clamped to [min_timeout, max_timeout]; the
+    retry delay follows the typical failure time. Without min_samples
+    successes the fixed schedule (25s, 30s, 35s...) is kept.
+    """
+    def __init__(self, store_path: str = SOLVE_STATS_STORE, min_samples: int = SOLVE_STATS_MIN_SAMPLES,
+                 percentile: float = SOLVE_TIMEOUT_PERCENTILE, min_timeout: float = SOLVE_TIMEOUT_MIN,
+                 max_timeout: float = SOLVE_TIMEOUT_MAX):
+        self.store = JsonlStore(store_path)
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    def record(self, status: str, elapsed: float, backend: str, detect_timeout: Optional[int] = None,
+               token_present: Optional[bool] = None):
+        """Store one solve outcome (elapsed in seconds, detect_timeout in ms)"""
+        self.store.append({
+            'status': status,
+            'elapsed': round(elapsed, 3),
+            'backend': backend,
+            'detect_timeout': detect_timeout,
+            'token_present': token_present,
+        })
+
+    def _records(self, backend: str) -> List[dict]:
+        return [r for r in self.store.recent() if r.get('backend') == backend]
+
+    def _histogram(self, backend: str, statuses) -> Histogram:
+        histogram = Histogram()
+        for r in self._records(backend):
+            if r['status'] in statuses:
+                histogram.observe(r['elapsed'])
+        return histogram
+
+    def detect_timeout(self, backend: str, attempt: int = 0) -> int:
+        """waitForSolve detectTimeout (ms) for this attempt"""
+        solved = self._histogram(backend, SOLVED_STATUSES)
+        if solved.count < self.min_samples:
+            return 25000 + attempt * 5000  # 25s, 30s, 35s...
+        seconds = solved.quantile(self.percentile) * TIMEOUT_HEADROOM * (1 + ATTEMPT_GROWTH * attempt)
+        return int(min(self.max_timeout, max(self.min_timeout, seconds)) * 1000)
+
+    def retry_delay(self, backend: str, default: float) -> float:
+        """Seconds before a retry: the median failure time, at most default.
+
+        Failures that come back fast (widget not ready, solver refused) are
+        retried quickly; slow ones keep the default pause.
+        """
+        failed = self._histogram(backend, ('solve_failed', 'not_detected'))
+        if failed.count < self.min_samples:
+            return default
+        return min(default, max(1.0, failed.quantile(0.5)))
+
+    def summary(self, backend: str) -> Dict[str, object]:
+        records = self._records(backend)
+        by_status: Dict[str, dict] = {}
+        for status in sorted({r['status'] for r in records}):
+            histogram = self._histogram(backend, (status,))
+            by_status[status] = {
+                'count': histogram.count,
+                'share': round(histogram.count / len(records), 3),
+                'p50': histogram.quantile(0.5),
+                'p95': histogram.quantile(0.95),
+            }
+        timeouts = [r for r in records if r['status'] == STATUS_TIMEOUT]
+        succeeded = sum(1 for r in records if is_solved(r['status'], r.get('token_present')))
+        return {
+            'samples': len(records),
+            'success_rate': round(succeeded / len(records), 3) if records else None,
+            'timeout_token_rate': (round(sum(1 for r in timeouts if r.get('token_present')) / len(timeouts), 3)
+                                   if timeouts else None),
+            'detect_timeout_ms': self.detect_timeout(backend),
+            'statuses': by_status,
+        }
+
+
+_default_stats = None
+
+
+def get_solve_stats() -> SolveStats:
+    """Process-wide solve history shared by all sessions"""
+    global _default_stats
+    if _default_stats is None:
+        _default_stats = SolveStats()
+    return _default_stats
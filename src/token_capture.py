@@ -0,0 +1,140 @@
+import asyncio
+import json
+import time
+from typing import Optional
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+BINDING_NAME = '__saTokenCaptured'
+
+# Installed on every document. Reports a token once, the moment hCaptcha hands
+# it over (setResponse or a write to the response textarea) - no timers, and
+# the only observer watches childList until the textarea exists.
+CAPTURE_SCRIPT = """
+    (([bindingName, minLength]) => {
+        if (window.__saTokenCaptureInstalled) return;
+        window.__saTokenCaptureInstalled = true;
+
+        let lastSent = null;
+        const push = (token, source) => {
+            if (!token || token.length < minLength || token === lastSent || !window[bindingName]) return;
+            lastSent = token;
+            window[bindingName](token, source);
+        };
+
+        const hookApi = (api) => {
+            if (!api || api.__saHooked || typeof api.setResponse !== 'function') return;
+            const original = api.setResponse;
+            api.setResponse = function(widgetId, token) {
+                push(typeof token === 'string' ? token : widgetId, 'setResponse');
+                return original.apply(this, arguments);
+            };
+            api.__saHooked = true;
+        };
+
+        // hCaptcha's script may define window.hcaptcha after us
+        let api = window.hcaptcha;
+        hookApi(api);
+        try {
+            Object.defineProperty(window, 'hcaptcha', {
+                configurable: true,
+                get: () => api,
+                set: (value) => { api = value; hookApi(value); },
+            });
+        } catch (e) {}
+
+        const valueSetter = Object.getOwnPropertyDescriptor(HTMLTextAreaElement.prototype, 'value');
+        const watchTextarea = (textarea) => {
+            if (textarea.__saWatched) return;
+            textarea.__saWatched = true;
+            // Programmatic writes (how hCaptcha fills it) do not fire input events
+            Object.defineProperty(textarea, 'value', {
+                configurable: true,
+                get() { return valueSetter.get.call(this); },
+                set(value) { valueSetter.set.call(this, value); push(value, 'textarea'); },
+            });
+            textarea.addEventListener('input', () => push(textarea.value, 'textarea'));
+            push(textarea.value, 'textarea');
+        };
+
+        const selector = 'textarea[name="h-captcha-response"]';
+        const scan = () => {
+            const textareas = document.querySelectorAll(selector);
+            textareas.forEach(watchTextarea);
+            return textareas.length > 0;
+        };
+        if (!scan()) {
+            const observer = new MutationObserver(() => { if (scan()) observer.disconnect(); });
+            const start = () => observer.observe(document.documentElement, { childList: true, subtree: true });
+            if (document.documentElement) start(); else document.addEventListener('DOMContentLoaded', start);
+        }
+    })(%s)
+"""
+
+
+class CapturedToken:
+    """An hCaptcha token and where/when it was seen"""
+    def __init__(self, token: str, source: str):
+        self.token = token
+        self.source = source
+        self.captured_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.captured_at
+
+    def __repr__(self):
+        return f"<CapturedToken {self.source} len={len(self.token)} age={self.age:.1f}s>"
+
+
+class TokenCapture:
+    """Receives captcha tokens pushed from the page through a Playwright binding.
+
+    install() once per page (before navigation); wait() resolves as soon as a
+    token arrives, and reset() forgets older tokens before a new solve.
+    """
+    def __init__(self, min_length: int = 1000, logger=None):
+        self.min_length = min_length
+        # Binding callbacks run outside the session's task - the session-bound logger keeps its id
+        self.log = logger or log
+        self.latest: Optional[CapturedToken] = None
+        self._future: Optional[asyncio.Future] = None
+        self._installed = False
+
+    async def install(self, page):
+        if self._installed:
+            return
+        await page.expose_binding(BINDING_NAME, self._on_token)
+        script = CAPTURE_SCRIPT % json.dumps([BINDING_NAME, self.min_length])
+        await page.add_init_script(script=script)
+        # Also arm the document that is already loaded (no-op on about:blank)
+        await page.evaluate(script)
+        self._installed = True
+
+    def _on_token(self, source, token, origin):
+        captured = CapturedToken(token, origin)
+        self.latest = captured
+        self.log.info(f"   🎯 Token pushed from page via {origin} ({len(token)} chars)")
+        if self._future is not None and not self._future.done():
+            self._future.set_result(captured)
+
+    def reset(self):
+        """Forget previously captured tokens (a new solve is about to start)"""
+        self.latest = None
+        # A pending future stays: whoever waits on it wants the next token anyway
+        if self._future is not None and self._future.done():
+            self._future = None
+
+    async def wait(self, timeout: float) -> Optional[CapturedToken]:
+        """The next (or already received) token, or None after timeout seconds"""
+        if self.latest is not None:
+            return self.latest
+        if self._future is None or self._future.done():
+            self._future = asyncio.get_event_loop().create_future()
+        try:
+            # Shielded so a timed-out waiter does not cancel the shared future
+            return await asyncio.wait_for(asyncio.shield(self._future), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
@@ -0,0 +1,80 @@
+import time
+from typing import Dict, Optional
+from src.config import TOKEN_MAX_AGE, TOKEN_EXPIRY_MARGIN
+
+
+class ManagedToken:
+    """An hCaptcha token stamped with when and how it was obtained"""
+    def __init__(self, token: str, source: str, solved_at: Optional[float] = None):
+        self.token = token
+        self.source = source
+        # Monotonic seconds; the solve time when known, else first sighting
+        self.solved_at = solved_at if solved_at is not None else time.monotonic()
+        self.submitted = False
+        self.rejected = False
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.solved_at
+
+    def __repr__(self):
+        flags = ' submitted' if self.submitted else ''
+        flags += ' rejected' if self.rejected else ''
+        return f"<ManagedToken {self.source} age={self.age:.1f}s{flags}>"
+
+
+class TokenManager:
+    """Track every captcha token of a session so a good one is never paid for twice.
+
+    A token may be reused (widget reset, attempt retry) while it has not been
+    sent to the server - hCaptcha tokens are single use - and still has more
+    than expiry_margin seconds of its max_age validity left.
+    """
+    def __init__(self, max_age: float = TOKEN_MAX_AGE, expiry_margin: float = TOKEN_EXPIRY_MARGIN):
+        self.max_age = max_age
+        self.expiry_margin = expiry_margin
+        self._tokens: Dict[str, ManagedToken] = {}
+
+    def add(self, token: str, source: str, solved_at: Optional[float] = None) -> ManagedToken:
+        """Register a token; seeing the same token again keeps its original stamp"""
+        managed = self._tokens.get(token)
+        if managed is None:
+            managed = ManagedToken(token, source, solved_at)
+            self._tokens[token] = managed
+        elif solved_at is not None and solved_at < managed.solved_at:
+            managed.solved_at = solved_at
+        self._prune()
+        return managed
+
+    def get(self, token: str) -> Optional[ManagedToken]:
+        return self._tokens.get(token)
+
+    def mark_submitted(self, token: str, source: str = 'post') -> ManagedToken:
+        managed = self.add(token, source)
+        managed.submitted = True
+        return managed
+
+    def mark_rejected(self, token: str):
+        managed = self._tokens.get(token)
+        if managed is not None:
+            managed.rejected = True
+
+    def remaining(self, token: str) -> float:
+        """Seconds of validity left (0 when unknown tokens are asked about)"""
+        managed = self._tokens.get(token)
+        return max(0.0, self.max_age - managed.age) if managed else 0.0
+
+    def is_expiring(self, token: str) -> bool:
+        """True when the token would likely expire before the server checks it"""
+        managed = self._tokens.get(token)
+        return managed is not None and self.max_age - managed.age <= self.expiry_margin
+
+    def fresh(self) -> Optional[ManagedToken]:
+        """Newest token that is still safe to submit, or None"""
+        candidates = [t for t in self._tokens.values()
+                      if not t.submitted and not t.rejected and not self.is_expiring(t.token)]
+        return max(candidates, key=lambda t: t.solved_at) if candidates else None
+
+    def _prune(self):
+        for token in [t for t, managed in self._tokens.items() if managed.age > self.max_age]:
+            del self._tokens[token]
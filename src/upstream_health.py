@@ -0,0 +1,160 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from src.config import (
+    HEALTH_WINDOW, HEALTH_MIN_CALLS, HEALTH_FAILURE_THRESHOLD, BACKOFF_BASE, BACKOFF_MAX, CIRCUIT_OPEN_BASE,
+    CIRCUIT_PROBE_TIMEOUT,
+)
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+
+# Upstreams every session depends on
+UPSTREAM_CDP = 'cdp'  # Bright Data browser endpoint (connect_over_cdp)
+UPSTREAM_CAPTCHA = 'captcha'  # Bright Data Captcha domain (Captcha.waitForSolve)
+
+# Circuit states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamHealth:
+    """Failure rate, circuit breaker and backoff for one upstream, shared by every session.
+
+    Outcomes are kept for `window` seconds. Once at least `min_calls` are known
+    and `failure_threshold` of them failed, the circuit opens for an
+    exponentially growing (open_base, doubled per trip), jittered period. After it, one probe call is let
+    through (half open): its success closes the circuit, its failure reopens it.
+    """
+    def __init__(self, name: str, window: float = HEALTH_WINDOW, min_calls: int = HEALTH_MIN_CALLS,
+                 failure_threshold: float = HEALTH_FAILURE_THRESHOLD, base_delay: float = BACKOFF_BASE,
+                 max_delay: float = BACKOFF_MAX, open_base: float = CIRCUIT_OPEN_BASE,
+                 probe_timeout: float = CIRCUIT_PROBE_TIMEOUT, rng: Optional[random.Random] = None):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.open_base = open_base
+        self.probe_timeout = probe_timeout
+        self.rng = rng or random.Random()
+        self.state = CLOSED
+        self.opened_until = 0.0
+        self.trips = 0  # Consecutive openings - exponent of the open period
+        self.consecutive_failures = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._probe_started: Optional[float] = None
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._prune(now)
+        self._probe_started = None
+        if ok:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                log.info(f"   💚 {self.name}: upstream recovered - circuit closed")
+            self.state = CLOSED
+            self.trips = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._tripped()):
+            self._open(now)
+
+    def record_success(self):
+        self.record(True)
+
+    def record_failure(self):
+        self.record(False)
+
+    def release_probe(self):
+        """The call said nothing about upstream health (e.g. no captcha on the page) - free the probe slot"""
+        self._probe_started = None
+
+    @property
+    def failure_rate(self) -> float:
+        self._prune(time.monotonic())
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def _tripped(self) -> bool:
+        return len(self._outcomes) >= self.min_calls and self.failure_rate >= self.failure_threshold
+
+    def _open(self, now: float):
+        self.trips += 1
+        self.state = OPEN
+        self.opened_until = now + self._jittered(self.open_base, self.trips)
+        log.warning(f"   🔴 {self.name}: failure rate {self.failure_rate:.0%} - circuit open for "
+                    f"{self.opened_until - now:.1f}s")
+
+    def _prune(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def backoff_delay(self, exponent: Optional[int] = None) -> float:
+        """base * 2^(n-1) seconds capped at max_delay, with equal jitter (half fixed, half random).
+
+        n defaults to the current run of consecutive failures, so every session
+        backs off further while the upstream keeps failing.
+        """
+        return self._jittered(self.base_delay, self.consecutive_failures if exponent is None else exponent)
+
+    def _jittered(self, base: float, n: int) -> float:
+        delay = min(self.max_delay, base * (2 ** max(0, n - 1)))
+        return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    def allow(self, claim: bool = True) -> bool:
+        """True when a call may go out now; claim takes the probe slot when half open"""
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now >= self.opened_until:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            probe_lost = self._probe_started is not None and now - self._probe_started > self.probe_timeout
+            if self._probe_started is None or probe_lost:
+                if claim:
+                    self._probe_started = now
+                return True
+        return False
+
+    async def wait_until_available(self, max_wait: float, claim: bool = True) -> bool:
+        """Wait (jittered, so sessions don't return in lockstep) until allow(claim); False after max_wait"""
+        deadline = time.monotonic() + max_wait
+        announced = False
+        while not self.allow(claim):
+            now = time.monotonic()
+            if now >= deadline:
+                return False
+            if not announced:
+                log.info(f"   ⏸️ {self.name}: circuit {self.state} - waiting before using the upstream")
+                announced = True
+            pause = max(self.opened_until - now, 0.5) + self.rng.uniform(0, self.base_delay)
+            await asyncio.sleep(min(pause, deadline - now))
+        return True
+
+    def to_dict(self) -> dict:
+        return {
+            'state': self.state,
+            'failure_rate': round(self.failure_rate, 3),
+            'calls': len(self._outcomes),
+            'consecutive_failures': self.consecutive_failures,
+            'trips': self.trips,
+        }
+
+
+_trackers: Dict[str, UpstreamHealth] = {}
+
+
+def get_upstream_health(name: str) -> UpstreamHealth:
+    """Process-wide tracker for an upstream, shared by all sessions"""
+    tracker = _trackers.get(name)
+    if tracker is None:
+        tracker = _trackers[name] = UpstreamHealth(name)
+    return tracker
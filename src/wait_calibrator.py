@@ -0,0 +1,122 @@
+import math
+import random
+from typing import List, Optional, Tuple
+from src.config import (
+    WAIT_CALIBRATION_STORE, WAIT_TARGET_SUCCESS_RATE, WAIT_MIN_DELAY,
+    CAPTCHA_POST_SOLVE_WAIT, CAPTCHA_SUBMIT_DELAY,
+)
+from src.jsonl_store import JsonlStore
+
+
+class WaitCalibrator:
+    """Learn the smallest token age at submission that the server still accepts.
+
+    Every submission records how old the hCaptcha token was and whether the
+    server answered "Captcha inválido". The recommended delay is the smallest
+    age bucket whose success rate meets the target with confidence (Wilson
+    lower bound), provided no older bucket falls short of it. Below the best
+    known bucket, a small share of runs probes one step lower so the delay
+    keeps converging downwards while data is collected.
+    """
+    def __init__(self, store_path: str = WAIT_CALIBRATION_STORE,
+                 target_success_rate: float = WAIT_TARGET_SUCCESS_RATE,
+                 default_delay: float = CAPTCHA_POST_SOLVE_WAIT + CAPTCHA_SUBMIT_DELAY,
+                 min_delay: float = WAIT_MIN_DELAY,
+                 bucket_seconds: float = 1.0, window_seconds: float = 1.0,
+                 min_samples: int = 5, confidence_z: float = 1.645, probe_step: float = 2.0,
+                 explore_rate: float = 0.2, rng: Optional[random.Random] = None):
+        self.store = JsonlStore(store_path)
+        self.target_success_rate = target_success_rate
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.bucket_seconds = bucket_seconds
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.confidence_z = confidence_z
+        self.probe_step = probe_step
+        self.explore_rate = explore_rate
+        self.rng = rng or random.Random()
+
+    def record(self, token_age: float, rejected: bool, session_id: Optional[str] = None):
+        """Store one submission outcome"""
+        self.store.append({
+            'token_age': round(token_age, 2),
+            'rejected': bool(rejected),
+            'session': session_id,
+        })
+
+    def _window(self, records: List[dict], delay: float) -> List[dict]:
+        upper = delay + self.window_seconds
+        return [r for r in records if delay <= r['token_age'] < upper]
+
+    def _counts(self, records: List[dict], delay: float) -> Tuple[int, int]:
+        window = self._window(records, delay)
+        return sum(1 for r in window if not r['rejected']), len(window)
+
+    def _lower_bound(self, accepted: int, total: int) -> float:
+        """Wilson score lower bound of the acceptance rate (5/5 is not proof of 95%)"""
+        z = self.confidence_z
+        rate = accepted / total
+        centre = rate + z * z / (2 * total)
+        margin = z * math.sqrt(rate * (1 - rate) / total + z * z / (4 * total * total))
+        return (centre - margin) / (1 + z * z / total)
+
+    def success_rate(self, delay: float) -> Optional[float]:
+        """Acceptance rate for tokens submitted at roughly this age, None without enough samples"""
+        accepted, total = self._counts(self.store.recent(), delay)
+        if total < self.min_samples:
+            return None
+        return accepted / total
+
+    def best_known_delay(self) -> Optional[float]:
+        """Smallest bucket start that meets the target, with every older bucket meeting it too"""
+        records = self.store.recent()
+        upper = max([self.default_delay] + [r['token_age'] for r in records])
+        delays = []
+        delay = self.min_delay
+        while delay <= upper:
+            delays.append(delay)
+            delay += self.bucket_seconds
+
+        best = None
+        # Walk down from the oldest ages: a bucket that falls short caps every younger one
+        for delay in reversed(delays):
+            accepted, total = self._counts(records, delay)
+            if total < self.min_samples:
+                continue
+            if accepted / total < self.target_success_rate:
+                break
+            if self._lower_bound(accepted, total) >= self.target_success_rate:
+                best = delay
+        return best
+
+    def recommend_delay(self) -> float:
+        """Token age (seconds) to wait for before submitting"""
+        best = self.best_known_delay()
+        delay = best if best is not None else self.default_delay
+
+        probe = delay - self.probe_step
+        if probe >= self.min_delay and self.success_rate(probe) is None and self.rng.random() < self.explore_rate:
+            return probe
+        return delay
+
+    def summary(self) -> dict:
+        records = self.store.recent()
+        rejected = sum(1 for r in records if r['rejected'])
+        return {
+            'samples': len(records),
+            'rejection_rate': (rejected / len(records)) if records else None,
+            'best_known_delay': self.best_known_delay(),
+            'default_delay': self.default_delay,
+        }
+
+
+_default_calibrator = None
+
+
+def get_wait_calibrator() -> WaitCalibrator:
+    """Process-wide calibrator shared by all sessions"""
+    global _default_calibrator
+    if _default_calibrator is None:
+        _default_calibrator = WaitCalibrator()
+    return _default_calibrator
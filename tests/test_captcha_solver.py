@@ -0,0 +1,18 @@
+import pytest
+from src.captcha_solver import CaptchaSolverBackend, create_captcha_solver
+
+
+def test_backend_missing_a_method_fails_on_creation():
+    class DetectOnly(CaptchaSolverBackend):
+        async def detect(self, timeout=10):
+            return True
+
+    with pytest.raises(TypeError):
+        DetectOnly()
+
+
+def test_mock_cannot_race_real_backends_by_default():
+    with pytest.raises(ValueError):
+        create_captcha_solver(None, backends='brightdata,mock')
+    with pytest.raises(ValueError):
+        create_captcha_solver(None, backends='unknown')
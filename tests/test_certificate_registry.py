@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+import os
+import pytest
+from src import certificate_registry
+from src.certificate_registry import CertificateError, CertificateRegistry, load_certificate
+
+pytest.importorskip('cryptography')
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from cryptography.hazmat.primitives.serialization import pkcs12  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+
+def write_pfx(path, password, days_valid=30, offset_days=-1):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'Test Certificate')])
+    not_before = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=offset_days)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_before).not_valid_after(not_before + datetime.timedelta(days=days_valid))
+        .sign(key, hashes.SHA256())
+    )
+    data = pkcs12.serialize_key_and_certificates(
+        b'test', key, cert, None, serialization.BestAvailableEncryption(password.encode('utf-8'))
+    )
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def reason(path, password):
+    with pytest.raises(CertificateError) as info:
+        load_certificate(path, password)
+    return info.value.reason
+
+
+def test_valid_certificate_is_loaded(tmp_path):
+    path = write_pfx(tmp_path / 'ok.pfx', 'secret')
+    loaded = load_certificate(path, 'secret')
+    assert loaded.validated
+    assert 'Test Certificate' in loaded.subject
+    assert len(loaded.fingerprint) == 64
+
+
+def test_rejections(tmp_path):
+    assert reason(str(tmp_path / 'missing.pfx'), 'secret') == 'not_found'
+    assert reason(write_pfx(tmp_path / 'ok.pfx', 'secret'), 'wrong') == 'bad_password'
+    assert reason(write_pfx(tmp_path / 'old.pfx', 'secret', days_valid=1, offset_days=-10), 'secret') == 'expired'
+    assert reason(write_pfx(tmp_path / 'new.pfx', 'secret', offset_days=5), 'secret') == 'not_yet_valid'
+
+    garbage = tmp_path / 'garbage.pfx'
+    garbage.write_bytes(b'not a pfx file')
+    assert reason(str(garbage), 'secret') in ('malformed', 'bad_password')
+
+
+def test_get_is_keyed_by_path_and_password(tmp_path):
+    path = write_pfx(tmp_path / 'ok.pfx', 'secret')
+    registry = CertificateRegistry()
+
+    async def scenario():
+        # Concurrent loads of one pair share the work; a wrong password never gets the good result
+        good, again, bad = await asyncio.gather(
+            registry.get(path, 'secret'), registry.get(path, 'secret'), registry.get(path, 'wrong'),
+            return_exceptions=True,
+        )
+        return good, again, bad
+
+    good, again, bad = asyncio.run(scenario())
+    assert good is again
+    assert isinstance(bad, CertificateError) and bad.reason == 'bad_password'
+
+
+def test_preload_maps_each_pair_to_its_error(tmp_path):
+    path = write_pfx(tmp_path / 'ok.pfx', 'secret')
+    errors = asyncio.run(CertificateRegistry().preload([(path, 'secret'), (path, 'wrong')]))
+    assert errors[(path, 'secret')] is None
+    assert errors[(path, 'wrong')].reason == 'bad_password'
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    path = write_pfx(tmp_path / 'ok.pfx', 'secret')
+    registry = CertificateRegistry()
+    first = asyncio.run(registry.get(path, 'secret'))
+
+    write_pfx(tmp_path / 'ok.pfx', 'secret')
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    second = asyncio.run(registry.get(path, 'secret'))
+    assert second is not first
+    assert second.fingerprint != first.fingerprint
+
+
+def test_file_replaced_during_load_is_reloaded(tmp_path, monkeypatch):
+    path = write_pfx(tmp_path / 'ok.pfx', 'secret')
+    original = certificate_registry.load_certificate
+
+    def load_then_replace(path, password):
+        loaded = original(path, password)
+        write_pfx(tmp_path / 'ok.pfx', 'secret')
+        os.utime(path, (loaded.mtime + 10, loaded.mtime + 10))
+        return loaded
+
+    registry = CertificateRegistry()
+    monkeypatch.setattr(certificate_registry, 'load_certificate', load_then_replace)
+    first = asyncio.run(registry.get(path, 'secret'))
+    monkeypatch.setattr(certificate_registry, 'load_certificate', original)
+    second = asyncio.run(registry.get(path, 'secret'))
+    assert second.fingerprint != first.fingerprint
+
+
+def test_list_directory_only_lists_certificates(tmp_path):
+    for name in ('b.pfx', 'a.P12', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+    assert CertificateRegistry().list_directory(str(tmp_path)) == [str(tmp_path / 'a.P12'), str(tmp_path / 'b.pfx')]
@@ -0,0 +1,108 @@
+import asyncio
+import http.client
+import re
+import time
+import urllib.parse
+import pytest
+from benchmarks.stub_sso import StubSSOServer
+from src.form_submit import (
+    FormSubmission, classify_submission, submit_form,
+    SUBMIT_ACCEPTED, SUBMIT_CAPTCHA_REJECTED, SUBMIT_CERTIFICATE_NOT_FOUND, SUBMIT_NOT_SENT, SUBMIT_UNKNOWN,
+)
+
+VALID_TOKEN = 'P1_0_' + 'x' * 1200
+
+
+@pytest.fixture
+def sso():
+    with StubSSOServer() as server:
+        yield server
+
+
+def post_login(server, token):
+    """POST the stub's login form without following redirects, like the in-page fetch does"""
+    host, port = server.base_url.split('//')[1].split(':')
+    connection = http.client.HTTPConnection(host, int(port), timeout=5)
+    connection.request('GET', '/login')
+    page = connection.getresponse().read().decode('utf-8')
+    csrf = re.search(r'name="_csrf" value="([^"]+)"', page).group(1)
+    body = urllib.parse.urlencode({'_csrf': csrf, 'h-captcha-response': token})
+    connection.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    reply = (response.status, response.getheader('Location'), response.read().decode('utf-8'))
+    connection.close()
+    return reply
+
+
+def test_accepted_login_redirects_away_from_login(sso):
+    status, location, body = post_login(sso, VALID_TOKEN)
+    url = urllib.parse.urljoin(sso.login_url, location)
+    assert classify_submission(status, url, body, True) == SUBMIT_ACCEPTED
+
+
+def test_captcha_rejection_is_recognised(sso):
+    status, _, body = post_login(sso, 'too-short')
+    assert classify_submission(status, sso.login_url, body, False) == SUBMIT_CAPTCHA_REJECTED
+
+
+def test_young_token_is_rejected(sso):
+    sso.min_token_age = 60
+    token = f"P1_{int(time.time() * 1000)}_" + 'x' * 1200
+    status, _, body = post_login(sso, token)
+    assert classify_submission(status, sso.login_url, body, False) == SUBMIT_CAPTCHA_REJECTED
+
+
+def test_classify_submission_rules():
+    assert classify_submission(200, 'https://sso/login', 'Certificado digital não encontrado', False) == \
+        SUBMIT_CERTIFICATE_NOT_FOUND
+    assert classify_submission(200, 'https://sso/login', '<h1>Bem-vindo</h1>', False) == SUBMIT_ACCEPTED
+    # Redirected back to the login page: nothing proves the login went through
+    assert classify_submission(200, 'https://sso/login?error', '', True) == SUBMIT_UNKNOWN
+    assert classify_submission(500, 'https://sso/servicos', '', True) == SUBMIT_UNKNOWN
+
+
+def test_form_submission_outcomes():
+    assert FormSubmission(False, error='No form found').outcome == SUBMIT_NOT_SENT
+    # A fetch error after dispatch: the POST may have gone out
+    assert FormSubmission(True, error='TypeError: Failed to fetch').outcome == SUBMIT_UNKNOWN
+    # Opaque redirect: nothing is known until the real Location has been read from the network
+    assert FormSubmission(True, status=0, redirected=True, opaque_redirect=True).outcome == SUBMIT_UNKNOWN
+    assert FormSubmission(True, status=302, url='https://sso/login', redirected=True,
+                          opaque_redirect=True).outcome == SUBMIT_UNKNOWN
+    assert FormSubmission(True, status=302, url='https://sso/servicos', redirected=True,
+                          opaque_redirect=True).outcome == SUBMIT_ACCEPTED
+    assert FormSubmission(True, status=400, url='https://sso/login',
+                          body='Captcha inválido').outcome == SUBMIT_CAPTCHA_REJECTED
+
+
+class RedirectPage:
+    """Just enough of a Playwright page: the in-page POST sees an opaque redirect, the network the real 302"""
+    def __init__(self, action, location):
+        self.action = action
+        self.location = location
+        self.listeners = []
+
+    def on(self, event, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, event, callback):
+        self.listeners.remove(callback)
+
+    async def evaluate(self, expression, args=None):
+        request = type('Request', (), {'method': 'POST'})()
+        response = type('Response', (), {'request': request, 'url': self.action, 'status': 302,
+                                         'headers': {'location': self.location}})()
+        for callback in list(self.listeners):
+            callback(response)
+        return {'sent': True, 'action': self.action, 'status': 0, 'url': None, 'redirected': True,
+                'opaqueRedirect': True, 'body': ''}
+
+
+def test_submit_form_reads_the_redirect_from_the_network():
+    accepted = asyncio.run(submit_form(RedirectPage('https://sso.acesso.gov.br/login', '/servicos')))
+    assert (accepted.status, accepted.url, accepted.outcome) == (302, 'https://sso.acesso.gov.br/servicos', SUBMIT_ACCEPTED)
+
+    page = RedirectPage('https://sso.acesso.gov.br/login', 'https://sso.acesso.gov.br/login?error=1')
+    bounced = asyncio.run(submit_form(page))
+    assert bounced.outcome == SUBMIT_UNKNOWN
+    assert page.listeners == []
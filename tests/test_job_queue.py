@@ -0,0 +1,139 @@
+import sqlite3
+import time
+import pytest
+from src.job_queue import JOB_DONE, JOB_EXPIRED, JOB_FAILED, JOB_PENDING, JOB_RUNNING, JobQueue
+from src.result import FAILURE_CAPTCHA_REJECTED, FAILURE_TIMEOUT
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+@pytest.fixture
+def queue(db_path):
+    queue = JobQueue(db_path, max_attempts=3, retry_backoff=60)
+    yield queue
+    queue.close()
+
+
+def test_claims_earliest_deadline_first(queue):
+    now = time.time()
+    late = queue.add('b', 'late.pfx', deadline=now + 300)
+    open_ended = queue.add('b', 'open.pfx')
+    early = queue.add('b', 'early.pfx', deadline=now + 60)
+    queue.add('other', 'other.pfx', deadline=now + 1)
+
+    claimed = [queue.claim('b').id for _ in range(3)]
+    assert claimed == [early, late, open_ended]
+    assert queue.claim('b') is None
+
+
+def test_claim_marks_running_and_counts_attempts(queue):
+    queue.add('b', 'a.pfx')
+    job = queue.claim('b')
+    assert job.status == JOB_RUNNING
+    assert job.attempts == 1
+    assert queue.pending('b') == []
+
+
+def test_expired_jobs_are_closed_instead_of_claimed(queue):
+    expired = queue.add('b', 'old.pfx', deadline=time.time() - 1)
+    fresh = queue.add('b', 'new.pfx', deadline=time.time() + 60)
+    assert queue.claim('b').id == fresh
+
+    summary = queue.summary('b')
+    assert summary['statuses'][JOB_EXPIRED] == 1
+    assert summary['failures'] == {JOB_EXPIRED: 1}
+    assert queue.db.execute("SELECT status FROM jobs WHERE id = ?", (expired,)).fetchone()[0] == JOB_EXPIRED
+
+
+def test_recover_requeues_interrupted_jobs(db_path):
+    queue = JobQueue(db_path)
+    queue.add('b', 'a.pfx')
+    done = queue.add('b', 'b.pfx')
+    first = queue.claim('b')
+    second = queue.claim('b')
+    queue.complete(second if second.id == done else first, {'success': True})
+    queue.close()
+
+    # A new process after a crash
+    queue = JobQueue(db_path)
+    assert queue.recover('b') == 1
+    job = queue.claim('b')
+    assert job.id != done
+    assert job.attempts == 2
+    assert queue.claim('b') is None
+    queue.close()
+
+
+def test_retryable_failure_waits_for_its_backoff(queue, monkeypatch):
+    queue.add('b', 'a.pfx')
+    job = queue.claim('b')
+    queue.complete(job, {'success': False, 'failure_class': FAILURE_TIMEOUT})
+    assert job.status == JOB_PENDING
+    assert queue.claim('b') is None
+    assert queue.next_due('b') == pytest.approx(job.not_before)
+    assert job.not_before - time.time() == pytest.approx(60, abs=1)
+
+    start = time.time()
+    monkeypatch.setattr('src.job_queue.time.time', lambda: start + 61)
+    retry = queue.claim('b')
+    assert retry.id == job.id and retry.attempts == 2
+
+    # The backoff doubles per attempt
+    queue.complete(retry, {'success': False, 'failure_class': FAILURE_TIMEOUT})
+    assert retry.not_before - (start + 61) == pytest.approx(120)
+
+
+def test_attempts_are_capped(queue, monkeypatch):
+    queue.add('b', 'a.pfx')
+    clock = [time.time()]
+    monkeypatch.setattr('src.job_queue.time.time', lambda: clock[0])
+    for _ in range(3):
+        job = queue.claim('b')
+        queue.complete(job, {'success': False, 'failure_class': FAILURE_TIMEOUT})
+        clock[0] += 1000
+    assert job.status == JOB_FAILED
+    assert queue.claim('b') is None
+    assert queue.next_due('b') is None
+
+
+def test_permanent_failures_are_not_retried(queue):
+    queue.add('b', 'a.pfx')
+    job = queue.claim('b')
+    queue.complete(job, {'success': False, 'failure_class': FAILURE_CAPTCHA_REJECTED, 'error': 'rejected'})
+    assert job.status == JOB_FAILED
+    assert queue.summary('b')['failures'] == {FAILURE_CAPTCHA_REJECTED: 1}
+
+
+def test_results_and_summary(queue):
+    queue.add('b', 'a.pfx')
+    job = queue.claim('b')
+    queue.complete(job, {'success': True, 'elapsed': 42.0, 'timings': {'navigate': 1.5}})
+    assert job.status == JOB_DONE
+
+    summary = queue.summary('b')
+    assert summary['jobs'] == 1
+    assert summary['statuses'] == {JOB_DONE: 1}
+    assert summary['mean_success_seconds'] == 42.0
+    row = queue.db.execute("SELECT session_id, success, timings FROM results").fetchone()
+    assert tuple(row) == ('b-1', 1, '{"navigate": 1.5}')
+
+
+def test_queue_files_without_not_before_are_migrated(db_path):
+    db = sqlite3.connect(db_path)
+    db.execute(
+        "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, batch TEXT NOT NULL, certificate_path TEXT NOT NULL,"
+        " password_env TEXT, target_url TEXT, deadline REAL, status TEXT NOT NULL DEFAULT 'pending',"
+        " attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    db.execute("INSERT INTO jobs (batch, certificate_path, created_at, updated_at) VALUES ('b', 'a.pfx', 0, 0)")
+    db.commit()
+    db.close()
+
+    queue = JobQueue(db_path)
+    job = queue.claim('b')
+    assert job.certificate_path == 'a.pfx'
+    assert job.not_before is None
+    queue.close()
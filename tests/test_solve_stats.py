@@ -0,0 +1,73 @@
+from src.captcha_solver import SolveResult
+from src.solve_stats import STATUS_TIMEOUT, SolveStats, is_solved
+
+
+def make_stats(tmp_path, **kwargs):
+    options = dict(min_samples=5, percentile=0.95, min_timeout=15, max_timeout=60)
+    options.update(kwargs)
+    return SolveStats(str(tmp_path / 'solve.jsonl'), **options)
+
+
+def test_fixed_schedule_without_history(tmp_path):
+    stats = make_stats(tmp_path)
+    assert [stats.detect_timeout('brightdata', attempt) for attempt in range(3)] == [25000, 30000, 35000]
+    assert stats.retry_delay('brightdata', 5.0) == 5.0
+
+
+def test_detect_timeout_follows_solve_times(tmp_path):
+    stats = make_stats(tmp_path)
+    for elapsed in (12, 14, 16, 18, 20):
+        stats.record('solve_finished', elapsed, 'brightdata')
+    first = stats.detect_timeout('brightdata')
+    assert 15000 <= first <= 60000
+    assert stats.detect_timeout('brightdata', attempt=1) > first
+    # Other backends keep their own history
+    assert stats.detect_timeout('mock') == 25000
+
+
+def test_detect_timeout_is_clamped(tmp_path):
+    stats = make_stats(tmp_path)
+    for _ in range(5):
+        stats.record('solve_finished', 1, 'fast')
+        stats.record('solve_finished', 100, 'slow')
+    assert stats.detect_timeout('fast') == 15000
+    assert stats.detect_timeout('slow') == 60000
+
+
+def test_fast_failures_shorten_the_retry_delay(tmp_path):
+    stats = make_stats(tmp_path)
+    for _ in range(5):
+        stats.record('not_detected', 2, 'brightdata')
+    assert stats.retry_delay('brightdata', 5.0) == 2
+    assert stats.retry_delay('brightdata', 1.5) == 1.5
+
+
+def test_timeouts_only_count_as_solved_with_a_token(tmp_path):
+    assert is_solved('solve_finished')
+    assert not is_solved(STATUS_TIMEOUT)
+    assert not is_solved(STATUS_TIMEOUT, False)
+    assert is_solved(STATUS_TIMEOUT, True)
+
+    stats = make_stats(tmp_path)
+    stats.record('solve_finished', 10, 'brightdata')
+    stats.record(STATUS_TIMEOUT, 40, 'brightdata', token_present=True)
+    stats.record(STATUS_TIMEOUT, 40, 'brightdata', token_present=False)
+    stats.record('solve_failed', 5, 'brightdata')
+    summary = stats.summary('brightdata')
+    assert summary['samples'] == 4
+    assert summary['success_rate'] == 0.5
+    assert summary['timeout_token_rate'] == 0.5
+
+
+def test_solve_result_uses_the_same_rule():
+    assert SolveResult('solve_finished', 'brightdata').ok
+    assert SolveResult(STATUS_TIMEOUT, 'brightdata', token_present=True).ok
+    assert not SolveResult(STATUS_TIMEOUT, 'brightdata', token_present=False).ok
+    assert not SolveResult('solve_finished', 'mock', token='short').ok
+
+
+def test_history_survives_a_restart(tmp_path):
+    stats = make_stats(tmp_path)
+    for _ in range(5):
+        stats.record('solve_finished', 20, 'brightdata')
+    assert make_stats(tmp_path).detect_timeout('brightdata') == stats.detect_timeout('brightdata')
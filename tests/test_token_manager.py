@@ -0,0 +1,52 @@
+import time
+from src.token_manager import TokenManager
+
+TOKEN_A = 'P1_' + 'a' * 1200
+TOKEN_B = 'P1_' + 'b' * 1200
+
+
+def test_fresh_prefers_the_newest_unsent_token():
+    manager = TokenManager(max_age=120, expiry_margin=10)
+    now = time.monotonic()
+    manager.add(TOKEN_A, 'capture', solved_at=now - 30)
+    manager.add(TOKEN_B, 'capture', solved_at=now - 5)
+    assert manager.fresh().token == TOKEN_B
+
+    manager.mark_submitted(TOKEN_B)
+    assert manager.fresh().token == TOKEN_A
+
+    manager.mark_rejected(TOKEN_A)
+    assert manager.fresh() is None
+
+
+def test_seeing_a_token_again_keeps_the_earliest_stamp():
+    manager = TokenManager(max_age=120, expiry_margin=10)
+    now = time.monotonic()
+    first = manager.add(TOKEN_A, 'capture', solved_at=now - 20)
+    again = manager.add(TOKEN_A, 'dom', solved_at=now - 2)
+    assert again is first
+    assert first.source == 'capture'
+    assert first.solved_at == now - 20
+
+    manager.add(TOKEN_A, 'dom', solved_at=now - 40)
+    assert first.solved_at == now - 40
+
+
+def test_expiring_tokens_are_not_reused():
+    manager = TokenManager(max_age=120, expiry_margin=10)
+    manager.add(TOKEN_A, 'capture', solved_at=time.monotonic() - 115)
+    assert manager.is_expiring(TOKEN_A)
+    assert 0 < manager.remaining(TOKEN_A) <= 5
+    assert manager.fresh() is None
+
+
+def test_unknown_and_stale_tokens():
+    manager = TokenManager(max_age=120, expiry_margin=10)
+    assert manager.remaining(TOKEN_A) == 0.0
+    assert not manager.is_expiring(TOKEN_A)
+
+    manager.add(TOKEN_A, 'capture', solved_at=time.monotonic() - 500)
+    manager.add(TOKEN_B, 'capture')
+    # Tokens past max_age are dropped on the next add
+    assert manager.get(TOKEN_A) is None
+    assert manager.get(TOKEN_B) is not None
@@ -0,0 +1,127 @@
+import asyncio
+import random
+import pytest
+from src import upstream_health
+from src.upstream_health import CLOSED, HALF_OPEN, OPEN, UpstreamHealth
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(upstream_health.time, 'monotonic', clock)
+    return clock
+
+
+def make_health(**kwargs):
+    options = dict(window=60, min_calls=4, failure_threshold=0.5, base_delay=1, max_delay=30, open_base=10,
+                   probe_timeout=20, rng=random.Random(0))
+    options.update(kwargs)
+    return UpstreamHealth('test', **options)
+
+
+def trip(health):
+    for _ in range(health.min_calls):
+        health.record_failure()
+
+
+def test_stays_closed_below_min_calls(clock):
+    health = make_health()
+    for _ in range(3):
+        health.record_failure()
+    assert health.state == CLOSED
+    assert health.allow()
+
+
+def test_opens_at_failure_threshold(clock):
+    health = make_health()
+    health.record_success()
+    health.record_success()
+    health.record_failure()
+    assert health.state == CLOSED
+    health.record_failure()
+    assert health.state == OPEN
+    assert 5 <= health.opened_until - clock.now <= 10
+    assert not health.allow()
+
+
+def test_half_open_lets_one_probe_through(clock):
+    health = make_health()
+    trip(health)
+    clock.now = health.opened_until
+    assert health.allow()
+    assert health.state == HALF_OPEN
+    assert not health.allow()
+    # A look without claiming does not take the slot, but the slot is still taken
+    assert not health.allow(claim=False)
+
+    health.release_probe()
+    assert health.allow()
+
+
+def test_probe_success_closes(clock):
+    health = make_health()
+    trip(health)
+    clock.now = health.opened_until
+    assert health.allow()
+    health.record_success()
+    assert health.state == CLOSED
+    assert health.trips == 0
+    assert health.allow()
+
+
+def test_probe_failure_reopens_for_longer(clock):
+    health = make_health()
+    trip(health)
+    clock.now = health.opened_until
+    assert health.allow()
+    health.record_failure()
+    assert health.state == OPEN
+    assert health.trips == 2
+    assert 10 <= health.opened_until - clock.now <= 20
+
+
+def test_lost_probe_is_replaced(clock):
+    health = make_health()
+    trip(health)
+    clock.now = health.opened_until
+    assert health.allow()
+    clock.now += 21
+    assert health.allow()
+
+
+def test_old_outcomes_leave_the_window(clock):
+    health = make_health()
+    for _ in range(3):
+        health.record_failure()
+    clock.now += 61
+    health.record_failure()
+    assert health.state == CLOSED
+    assert health.failure_rate == 1.0
+    assert health.to_dict()['calls'] == 1
+
+
+def test_backoff_grows_with_consecutive_failures(clock):
+    health = make_health(min_calls=100)
+    delays = []
+    for _ in range(6):
+        health.record_failure()
+        delays.append(health.backoff_delay())
+    for n, delay in enumerate(delays, start=1):
+        cap = min(30, 2 ** (n - 1))
+        assert cap / 2 <= delay <= cap
+    health.record_success()
+    assert health.consecutive_failures == 0
+
+
+def test_wait_until_available_gives_up_after_max_wait():
+    health = make_health(open_base=60)
+    trip(health)
+    assert not asyncio.run(health.wait_until_available(0.05))
@@ -0,0 +1,57 @@
+import random
+from src.wait_calibrator import WaitCalibrator
+
+
+def make_calibrator(tmp_path, **kwargs):
+    options = dict(target_success_rate=0.95, default_delay=18, min_delay=2, explore_rate=0.0, rng=random.Random(0))
+    options.update(kwargs)
+    return WaitCalibrator(str(tmp_path / 'wait.jsonl'), **options)
+
+
+def record(calibrator, token_age, accepted, rejected=0):
+    for _ in range(accepted):
+        calibrator.record(token_age, False)
+    for _ in range(rejected):
+        calibrator.record(token_age, True)
+
+
+def test_no_history_keeps_default_delay(tmp_path):
+    calibrator = make_calibrator(tmp_path)
+    assert calibrator.best_known_delay() is None
+    assert calibrator.recommend_delay() == 18
+
+
+def test_a_handful_of_successes_is_not_enough(tmp_path):
+    calibrator = make_calibrator(tmp_path)
+    record(calibrator, 4.5, accepted=5)
+    assert calibrator.success_rate(4) == 1.0
+    assert calibrator.best_known_delay() is None
+
+
+def test_enough_successes_lower_the_delay(tmp_path):
+    calibrator = make_calibrator(tmp_path)
+    record(calibrator, 4.5, accepted=60)
+    assert calibrator.best_known_delay() == 4
+    assert calibrator.recommend_delay() == 4
+
+
+def test_failing_older_bucket_caps_younger_ones(tmp_path):
+    calibrator = make_calibrator(tmp_path)
+    record(calibrator, 4.5, accepted=60)
+    record(calibrator, 9.5, accepted=5, rejected=5)
+    assert calibrator.best_known_delay() is None
+
+    record(calibrator, 12.5, accepted=60)
+    assert calibrator.best_known_delay() == 12
+
+
+def test_ages_beyond_default_delay_are_considered(tmp_path):
+    calibrator = make_calibrator(tmp_path)
+    record(calibrator, 25.5, accepted=60)
+    assert calibrator.best_known_delay() == 25
+
+
+def test_probe_below_best_known_delay(tmp_path):
+    calibrator = make_calibrator(tmp_path, explore_rate=1.0)
+    record(calibrator, 8.5, accepted=60)
+    assert calibrator.recommend_delay() == 6